@@ -1,6 +1,57 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Cache backends keeping values inside one process
+PROCESS_LOCAL_CACHES: tuple[str, ...] = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def check_shared_caches() -> None:
+    """Fail when caches shared by the workers are process local.
+
+    Allowed with DEBUG, as the development server runs one process.
+    """
+    if settings.DEBUG:
+        return
+    aliases: dict[str, str] = {
+        'REFERENCE_DATA["CACHE"]': settings.REFERENCE_DATA.get(
+            "CACHE",
+            "default"
+        ),
+        'DATABASE_ROUTING["STICKY_CACHE"]': settings.DATABASE_ROUTING.get(
+            "STICKY_CACHE",
+            "default"
+        ),
+    }
+    setting: str
+    alias: str
+    for setting, alias in aliases.items():
+        backend: str = settings.CACHES.get(alias, {}).get("BACKEND", "")
+        if backend in PROCESS_LOCAL_CACHES:
+            raise ImproperlyConfigured(
+                f"{setting} is the \"{alias}\" cache of {backend}, which "
+                "is not shared by the workers"
+            )
 
 
 class AbstractsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'abstracts'
+
+    def ready(self) -> None:
+        from abstracts.reference import reference_data
+
+        check_shared_caches()
+        reference_data.connect_signals()
+        if settings.SLOW_QUERIES.get("ENABLED", True):
+            from django.db.backends.signals import connection_created
+
+            from abstracts.slow_queries import slow_query_logger
+
+            connection_created.connect(
+                slow_query_logger.install,
+                dispatch_uid="abstracts.slow_queries"
+            )
@@ -0,0 +1,257 @@
+"""ASGI application serving HTTP, WebSocket and lifespan from one worker.
+
+HTTP requests and sockets are counted per worker process. Requests over
+ASGI["MAX_HTTP_IN_FLIGHT"] get 503 and sockets over ASGI["MAX_WEBSOCKETS"]
+are closed with code 1013 (try again later) before the handshake, so an
+overloaded worker sheds load instead of queueing it. The in-memory caches
+are rebuilt before the server starts accepting traffic: on lifespan startup
+when ASGI["LIFESPAN"] is set, otherwise (daphne 3 sends no lifespan events)
+when the application is built.
+
+Django 4.1 iterates streaming responses on the event loop, where iterators
+reading the database (e.g. chat transcripts) raise SynchronousOnlyOperation,
+so StreamingASGIHandler pulls their parts in the sync thread one by one.
+
+Imports project URLs, so the module must be imported after django.setup().
+"""
+import json
+import logging
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from asgiref.sync import sync_to_async
+from channels.routing import (
+    ProtocolTypeRouter,
+    URLRouter,
+)
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+from django.http import HttpResponseBase
+from django.utils.module_loading import import_string
+
+from abstracts.backends.pool import close_idle_pools
+from abstracts.metrics import (
+    asgi_http_in_flight,
+    asgi_rejected,
+)
+from auths.middleware import JWTAuthMiddleware
+from urls.urls import websocket_urlpatterns
+
+logger: logging.Logger = logging.getLogger("abstracts.asgi")
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+# Close code of sockets rejected because the worker is overloaded
+TRY_AGAIN_LATER = 1013
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGIHandler reading parts of streaming responses off the loop."""
+
+    async def send_response(
+        self,
+        response: HttpResponseBase,
+        send: Send
+    ) -> None:
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers: list[tuple[bytes, bytes]] = [
+            (
+                header.encode("ascii") if isinstance(header, str)
+                else bytes(header),
+                value.encode("latin1") if isinstance(value, str)
+                else bytes(value),
+            )
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b"Set-Cookie", cookie.output(header="").encode("ascii").strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": headers,
+        })
+        # Same thread as the view, so the parts share its connection
+        get_next: Callable = sync_to_async(next, thread_sensitive=True)
+        parts: Any = iter(response)
+        end: object = object()
+        try:
+            while True:
+                part: Any = await get_next(parts, end)
+                if part is end:
+                    break
+                chunk: bytes
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    })
+            await send({"type": "http.response.body"})
+        finally:
+            # Fires request_finished, which releases the connection, and
+            # closes files and iterators of disconnected clients
+            await sync_to_async(response.close, thread_sensitive=True)()
+
+
+class HttpLimitMiddleware:
+    """Answer 503 to HTTP requests over the in-flight limit."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: Optional[int],
+        retry_after: int
+    ) -> None:
+        self.app = app
+        self.limit = limit
+        self.retry_after = retry_after
+        self.in_flight: int = 0
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if self.limit and self.in_flight >= self.limit:
+            asgi_rejected.inc(protocol="http")
+            await self.reject(send)
+            return
+        self.in_flight += 1
+        asgi_http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            asgi_http_in_flight.dec()
+
+    async def reject(self, send: Send) -> None:
+        body: bytes = json.dumps(
+            {"response": "Сервер перегружен, повторите запрос позже"},
+            ensure_ascii=False
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class WebSocketLimitMiddleware:
+    """Close sockets over the open sockets limit before the handshake."""
+
+    def __init__(self, app: ASGIApp, limit: Optional[int]) -> None:
+        self.app = app
+        self.limit = limit
+        self.connections: int = 0
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        if self.limit and self.connections >= self.limit:
+            asgi_rejected.inc(protocol="websocket")
+            message: dict[str, Any] = await receive()
+            if message["type"] == "websocket.connect":
+                await send({
+                    "type": "websocket.close",
+                    "code": TRY_AGAIN_LATER,
+                })
+            return
+        self.connections += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.connections -= 1
+
+
+def warm_up_caches(paths: tuple[str, ...]) -> None:
+    """Rebuild the in-memory caches and release the used connections."""
+    path: str
+    for path in paths:
+        import_string(path).rebuild()
+        logger.info("Кеш %s загружен", path)
+    connections.close_all()
+
+
+class LifespanApp:
+    """Warm up the worker on startup and close connections on shutdown."""
+
+    def __init__(self, warmup_caches: tuple[str, ...]) -> None:
+        self.warmup_caches = warmup_caches
+
+    async def __call__(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send
+    ) -> None:
+        while True:
+            message: dict[str, Any] = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await sync_to_async(warm_up_caches)(self.warmup_caches)
+                except Exception as exc:
+                    logger.exception("Не удалось прогреть кеши")
+                    await send({
+                        "type": "lifespan.startup.failed",
+                        "message": str(exc),
+                    })
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await sync_to_async(connections.close_all)()
+                await sync_to_async(close_idle_pools)()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def get_project_application(
+    http_application: Optional[ASGIApp] = None
+) -> ProtocolTypeRouter:
+    """Get protocol router of the project around the Django application.
+
+    Must be called from sync code when the server sends no lifespan events,
+    as the caches are warmed up right away then.
+    """
+    if http_application is None:
+        http_application = StreamingASGIHandler()
+    config: dict[str, Any] = settings.ASGI
+    warmup_caches: tuple[str, ...] = tuple(config.get("WARMUP_CACHES", ()))
+    if not config.get("LIFESPAN", False):
+        warm_up_caches(warmup_caches)
+        warmup_caches = ()
+    return ProtocolTypeRouter({
+        "http": HttpLimitMiddleware(
+            app=http_application,
+            limit=config.get("MAX_HTTP_IN_FLIGHT"),
+            retry_after=config.get("RETRY_AFTER", 1)
+        ),
+        "websocket": WebSocketLimitMiddleware(
+            app=JWTAuthMiddleware(
+                URLRouter(websocket_urlpatterns)
+            ),
+            limit=config.get("MAX_WEBSOCKETS")
+        ),
+        "lifespan": LifespanApp(warmup_caches=warmup_caches),
+    })
@@ -0,0 +1,231 @@
+"""Thread-safe pool of database connections of one process.
+
+Idle connections are reused newest first, so rarely needed ones age out.
+A connection idle for longer than the health check interval is pinged
+before it is handed out, and connections older than the max lifetime are
+closed instead of being returned, which spreads reconnects over time and
+lets the server rebalance. Acquiring waits up to the timeout when all
+MAX_SIZE connections are in use.
+"""
+import os
+from collections import deque
+from threading import (
+    Condition,
+    Lock,
+)
+from time import (
+    monotonic,
+    perf_counter,
+)
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from abstracts.metrics import (
+    db_pool_checkout_duration,
+    db_pool_connections,
+    db_pool_events,
+)
+
+
+class PoolTimeout(Exception):
+    """No connection was released within the timeout."""
+
+
+class PooledConnection:
+    """Connection with its creation and last release time."""
+
+    __slots__ = ("connection", "created_at", "released_at")
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.created_at: float = monotonic()
+        self.released_at: float = self.created_at
+
+
+class ConnectionPool:
+    """Pool of connections opened by connect."""
+
+    def __init__(
+        self,
+        alias: str,
+        connect: Callable[[], Any],
+        check: Callable[[Any], bool],
+        reset: Callable[[Any], bool],
+        max_size: int,
+        max_lifetime: float,
+        health_check_interval: float,
+        timeout: float
+    ) -> None:
+        self.alias = alias
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.condition: Condition = Condition()
+        self.idle: deque[PooledConnection] = deque()
+        # Connections handed out, by id of the raw connection
+        self.in_use: dict[int, PooledConnection] = {}
+        self.opening: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    def update_gauges(self) -> None:
+        db_pool_connections.set(len(self.idle), alias=self.alias, state="idle")
+        db_pool_connections.set(
+            len(self.in_use),
+            alias=self.alias,
+            state="in_use"
+        )
+
+    def discard(self, pooled: PooledConnection, event: str) -> None:
+        db_pool_events.inc(alias=self.alias, event=event)
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def take_idle(self) -> Optional[PooledConnection]:
+        """Get a usable idle connection, closing stale ones."""
+        while True:
+            with self.condition:
+                if not self.idle:
+                    return None
+                pooled: PooledConnection = self.idle.pop()
+                self.opening += 1
+            try:
+                now: float = monotonic()
+                if now - pooled.created_at >= self.max_lifetime:
+                    self.discard(pooled, event="recycled")
+                    continue
+                if now - pooled.released_at >= \
+                        self.health_check_interval and \
+                        not self.check(pooled.connection):
+                    self.discard(pooled, event="health_check_failed")
+                    continue
+                with self.condition:
+                    self.in_use[id(pooled.connection)] = pooled
+                return pooled
+            finally:
+                with self.condition:
+                    self.opening -= 1
+
+    def acquire(self) -> Any:
+        """Get a connection, opening one while under MAX_SIZE."""
+        start: float = perf_counter()
+        deadline: float = monotonic() + self.timeout
+        try:
+            while True:
+                pooled: Optional[PooledConnection] = self.take_idle()
+                if pooled is not None:
+                    return pooled.connection
+                with self.condition:
+                    if self.idle:
+                        continue
+                    if self.size < self.max_size:
+                        self.opening += 1
+                        break
+                    remaining: float = deadline - monotonic()
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                        continue
+                    db_pool_events.inc(alias=self.alias, event="timeout")
+                    raise PoolTimeout(
+                        f"All {self.max_size} connections of "
+                        f"'{self.alias}' are in use"
+                    )
+            try:
+                pooled = PooledConnection(self.connect())
+            finally:
+                with self.condition:
+                    self.opening -= 1
+            db_pool_events.inc(alias=self.alias, event="created")
+            with self.condition:
+                self.in_use[id(pooled.connection)] = pooled
+            return pooled.connection
+        finally:
+            db_pool_checkout_duration.observe(
+                perf_counter() - start,
+                alias=self.alias
+            )
+            self.update_gauges()
+
+    def release(self, connection: Any) -> None:
+        """Return a connection, closing it when broken or too old."""
+        with self.condition:
+            pooled: Optional[PooledConnection] = self.in_use.pop(
+                id(connection),
+                None
+            )
+        if pooled is None:
+            # Opened before a fork or by another pool
+            connection.close()
+            return
+        if not self.reset(connection):
+            self.discard(pooled, event="reset_failed")
+        elif monotonic() - pooled.created_at >= self.max_lifetime:
+            self.discard(pooled, event="recycled")
+        else:
+            pooled.released_at = monotonic()
+            with self.condition:
+                self.idle.append(pooled)
+        with self.condition:
+            self.condition.notify()
+        self.update_gauges()
+
+    def close_idle(self) -> None:
+        """Close idle connections, e.g. on shutdown."""
+        with self.condition:
+            idle: list[PooledConnection] = list(self.idle)
+            self.idle.clear()
+        pooled: PooledConnection
+        for pooled in idle:
+            self.discard(pooled, event="closed")
+        self.update_gauges()
+
+    def get_stats(self) -> dict[str, int]:
+        with self.condition:
+            return {
+                "idle": len(self.idle),
+                "in_use": len(self.in_use),
+                "max_size": self.max_size,
+            }
+
+
+# Pools of the process by database alias
+pools: dict[str, ConnectionPool] = {}
+pools_lock: Lock = Lock()
+pools_pid: int = os.getpid()
+
+
+def get_pool(
+    alias: str,
+    create: Callable[[], ConnectionPool]
+) -> ConnectionPool:
+    """Get the pool of the alias, creating it in a new process."""
+    global pools_pid
+    with pools_lock:
+        if pools_pid != os.getpid():
+            # Connections of the parent process must not be shared
+            pools.clear()
+            pools_pid = os.getpid()
+        pool: Optional[ConnectionPool] = pools.get(alias)
+        if pool is None:
+            pool = pools[alias] = create()
+        return pool
+
+
+def close_idle_pools() -> None:
+    """Close idle connections of all pools of the process."""
+    with pools_lock:
+        current: list[ConnectionPool] = list(pools.values())
+    pool: ConnectionPool
+    for pool in current:
+        pool.close_idle()
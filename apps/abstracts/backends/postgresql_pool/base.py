@@ -0,0 +1,116 @@
+"""PostgreSQL backend taking connections from a pool of the process.
+
+Set ENGINE to "abstracts.backends.postgresql_pool" and tune the pool with
+the POOL key of the database settings (see DEFAULT_POOL). Django still
+closes connections at the end of every request, closing returns them to
+the pool, so requests skip the TCP and TLS handshakes and authentication
+with the server. Pool sizes and events are exported as db_pool_* metrics.
+"""
+from typing import Any
+
+import psycopg2.extras
+from psycopg2 import extensions
+
+from django.db.backends.postgresql.base import (
+    Database,
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+)
+
+from abstracts.backends.pool import (
+    ConnectionPool,
+    PoolTimeout,
+    get_pool,
+)
+
+DEFAULT_POOL: dict[str, float] = {
+    # Connections of one process; keep the sum over workers under the
+    # server's max_connections
+    "MAX_SIZE": 20,
+    # Seconds before a connection is closed instead of being reused
+    "MAX_LIFETIME": 1800,
+    # Idle seconds after which a connection is pinged before use
+    "HEALTH_CHECK_INTERVAL": 30,
+    # Seconds to wait for a connection when all are in use
+    "TIMEOUT": 10,
+}
+
+
+def open_connection(conn_params: dict[str, Any]) -> Any:
+    connection: Any = Database.connect(**conn_params)
+    # Same as the postgresql backend, see its get_new_connection
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection,
+        loads=lambda x: x
+    )
+    return connection
+
+
+def check_connection(connection: Any) -> bool:
+    """Return true if the server answers on the connection."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        if not connection.autocommit:
+            connection.rollback()
+        return True
+    except Database.Error:
+        return False
+
+
+def reset_connection(connection: Any) -> bool:
+    """Roll back a transaction left open, return false if it is broken."""
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+    except Database.Error:
+        return False
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    """PostgreSQL connection wrapper reusing pooled connections."""
+
+    def get_pool(self, conn_params: dict[str, Any]) -> ConnectionPool:
+        config: dict[str, float] = {
+            **DEFAULT_POOL,
+            **self.settings_dict.get("POOL", {}),
+        }
+        return get_pool(
+            alias=self.alias,
+            create=lambda: ConnectionPool(
+                alias=self.alias,
+                connect=lambda: open_connection(conn_params),
+                check=check_connection,
+                reset=reset_connection,
+                max_size=config["MAX_SIZE"],
+                max_lifetime=config["MAX_LIFETIME"],
+                health_check_interval=config["HEALTH_CHECK_INTERVAL"],
+                timeout=config["TIMEOUT"]
+            )
+        )
+
+    def get_new_connection(self, conn_params: dict[str, Any]) -> Any:
+        try:
+            connection: Any = self.get_pool(conn_params).acquire()
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+        # Pooled connections keep their session, so the level is set on
+        # reuse as well
+        options: dict[str, Any] = self.settings_dict["OPTIONS"]
+        self.isolation_level = options.get(
+            "isolation_level",
+            connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self) -> None:
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool(self.get_connection_params()).release(
+                    self.connection
+                )
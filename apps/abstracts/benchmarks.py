@@ -0,0 +1,232 @@
+"""Tools for measuring endpoint latency and SQL cost against baselines."""
+import json
+import os
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from django.db import connection
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+
+class QueryStats:
+    """Counters of the SQL work done inside a measured block."""
+
+    def __init__(self) -> None:
+        self.queries: int = 0
+        self.rows: int = 0
+        self.db_time: float = 0.0
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        self.queries = 0
+        self.rows = 0
+        self.db_time = 0.0
+
+
+class RowCountingCursor:
+    """Cursor proxy counting executed statements and fetched rows."""
+
+    def __init__(self, cursor: Any, stats: QueryStats) -> None:
+        self.cursor = cursor
+        self.stats = stats
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.cursor, attr)
+
+    def __iter__(self) -> Any:
+        row: Any
+        for row in self.cursor:
+            self.stats.rows += 1
+            yield row
+
+    def __enter__(self) -> "RowCountingCursor":
+        return self
+
+    def __exit__(self, *args: tuple[Any]) -> None:
+        self.cursor.__exit__(*args)
+
+    def _timed(self, method: Callable, *args: tuple[Any]) -> Any:
+        start: float = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.stats.queries += 1
+            self.stats.db_time += perf_counter() - start
+
+    def execute(self, sql: str, params: Any = None) -> Any:
+        return self._timed(self.cursor.execute, sql, params)
+
+    def executemany(self, sql: str, param_list: Any) -> Any:
+        return self._timed(self.cursor.executemany, sql, param_list)
+
+    def fetchone(self) -> Any:
+        row: Any = self.cursor.fetchone()
+        if row is not None:
+            self.stats.rows += 1
+        return row
+
+    def fetchmany(self, *args: tuple[Any]) -> list[Any]:
+        rows: list[Any] = self.cursor.fetchmany(*args)
+        self.stats.rows += len(rows)
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        rows: list[Any] = self.cursor.fetchall()
+        self.stats.rows += len(rows)
+        return rows
+
+
+class QueryCollector:
+    """Context manager collecting QueryStats for the given connection."""
+
+    def __init__(
+        self,
+        db: BaseDatabaseWrapper = connection
+    ) -> None:
+        self.db = db
+        self.stats: QueryStats = QueryStats()
+
+    def __enter__(self) -> QueryStats:
+        self.stats.reset()
+        make_cursor: Callable = self.db.make_cursor
+        make_debug_cursor: Callable = self.db.make_debug_cursor
+        self.db.make_cursor = lambda cursor: RowCountingCursor(
+            make_cursor(cursor), self.stats
+        )
+        self.db.make_debug_cursor = lambda cursor: RowCountingCursor(
+            make_debug_cursor(cursor), self.stats
+        )
+        return self.stats
+
+    def __exit__(self, *args: tuple[Any]) -> None:
+        del self.db.make_cursor
+        del self.db.make_debug_cursor
+
+
+def get_percentile(values: list[float], percent: float) -> float:
+    """Get percentile of values with linear interpolation."""
+    if not values:
+        return 0.0
+    ordered: list[float] = sorted(values)
+    position: float = (len(ordered) - 1) * percent / 100
+    lower: int = int(position)
+    upper: int = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (
+        position - lower
+    )
+
+
+class EndpointResult:
+    """Measurements of one benchmarked endpoint."""
+
+    def __init__(
+        self,
+        name: str,
+        latencies: list[float],
+        queries: int,
+        rows: int,
+        status: int
+    ) -> None:
+        self.name = name
+        self.latencies = latencies
+        self.queries = queries
+        self.rows = rows
+        self.status = status
+
+    @property
+    def p50_ms(self) -> float:
+        return round(get_percentile(self.latencies, 50) * 1000, 3)
+
+    @property
+    def p95_ms(self) -> float:
+        return round(get_percentile(self.latencies, 95) * 1000, 3)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get result in the baseline file format."""
+        return {
+            "status": self.status,
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "queries": self.queries,
+            "rows": self.rows,
+        }
+
+
+class BaselineComparator:
+    """Compare endpoint results with the committed baselines."""
+
+    DEFAULT_TOLERANCE = {
+        "latency": 1.0,
+        "latency_ms": 10.0,
+        "rows": 0.2,
+        "queries": 0,
+    }
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.baselines: dict[str, Any] = {}
+        self.tolerance: dict[str, float] = dict(self.DEFAULT_TOLERANCE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data: dict[str, Any] = json.load(file)
+            self.baselines = data.get("endpoints", {})
+            self.tolerance.update(data.get("tolerance", {}))
+
+    def compare(
+        self,
+        result: EndpointResult,
+        check_latency: bool = True
+    ) -> list[str]:
+        """Get the list of regressions of the result."""
+        baseline: Optional[dict[str, Any]] = self.baselines.get(result.name)
+        if not baseline:
+            return [f"{result.name}: нет базовой линии"]
+        errors: list[str] = []
+        if result.status != baseline["status"]:
+            errors.append(
+                f"{result.name}: статус {result.status}, "
+                f"ожидался {baseline['status']}"
+            )
+        if result.queries > baseline["queries"] + self.tolerance["queries"]:
+            errors.append(
+                f"{result.name}: {result.queries} SQL запросов, "
+                f"базовая линия {baseline['queries']} (возможен N+1)"
+            )
+        rows_limit: float = baseline["rows"] * (1 + self.tolerance["rows"])
+        if result.rows > rows_limit:
+            errors.append(
+                f"{result.name}: {result.rows} строк выбрано, "
+                f"базовая линия {baseline['rows']}"
+            )
+        latency_limit: float = max(
+            baseline["p95_ms"] * (1 + self.tolerance["latency"]),
+            baseline["p95_ms"] + self.tolerance["latency_ms"]
+        )
+        if check_latency and result.p95_ms > latency_limit:
+            errors.append(
+                f"{result.name}: p95 {result.p95_ms} мс, "
+                f"базовая линия {baseline['p95_ms']} мс"
+            )
+        return errors
+
+    def save(self, results: list[EndpointResult]) -> None:
+        """Write results as the new baselines."""
+        self.baselines.update({
+            result.name: result.as_dict() for result in results
+        })
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "tolerance": self.tolerance,
+                    "endpoints": dict(sorted(self.baselines.items())),
+                },
+                file,
+                indent=4,
+                ensure_ascii=False
+            )
+            file.write("\n")
@@ -0,0 +1,179 @@
+"""Conditional and range-capable responses for stored files."""
+import mimetypes
+import os
+import re
+from typing import (
+    Any,
+    Iterator,
+    Optional,
+)
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models.fields.files import FieldFile
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBase,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date
+
+RANGE_RE: re.Pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def get_etag(size: int, modified_ns: int) -> str:
+    """Get strong ETag of the file version."""
+    return f'"{size:x}-{modified_ns:x}"'
+
+
+def parse_range(
+    header: str,
+    size: int
+) -> Optional[tuple[int, int]]:
+    """Get (start, end) of the single byte range, both inclusive.
+
+    Returns None when the header should be ignored, e.g. it is malformed
+    or asks for several ranges, and (size, size) when it is unsatisfiable.
+    """
+    match: Optional[re.Match] = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    start: str
+    end: str
+    start, end = match.groups()
+    if start == "":
+        suffix: int = int(end)
+        if suffix == 0:
+            return (size, size)
+        return (max(size - suffix, 0), size - 1)
+    first: int = int(start)
+    if end and int(end) < first:
+        return None
+    if first >= size:
+        return (size, size)
+    return (first, min(int(end), size - 1) if end else size - 1)
+
+
+def iter_file_range(
+    file: File,
+    start: int,
+    length: int,
+    chunk_size: int
+) -> Iterator[bytes]:
+    """Iterate over length bytes of the file starting at start.
+
+    The file is opened with the first chunk, so a response closed before
+    streaming, e.g. on a client disconnect, leaves no open handle.
+    """
+    file.open("rb")
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk: bytes = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def get_content_disposition(filename: str) -> str:
+    try:
+        filename.encode("ascii")
+        return 'inline; filename="{}"'.format(
+            filename.replace("\\", "\\\\").replace('"', r"\"")
+        )
+    except UnicodeEncodeError:
+        return f"inline; filename*=utf-8''{quote(filename)}"
+
+
+def get_offload_response(file: FieldFile) -> Optional[HttpResponse]:
+    """Get response handing the file over to the front-end server."""
+    config: dict[str, Any] = settings.FILE_DOWNLOADS
+    offload: Optional[str] = config.get("OFFLOAD")
+    if not offload:
+        return None
+    response: HttpResponse = HttpResponse()
+    if offload == "x-accel-redirect":
+        response["X-Accel-Redirect"] = quote(
+            config.get("X_ACCEL_REDIRECT_PREFIX", "/protected/") + file.name
+        )
+    else:
+        response["X-Sendfile"] = file.path
+    # The front-end server detects type, sizes and ranges itself
+    del response["Content-Type"]
+    return response
+
+
+def get_file_response(
+    request: HttpRequest,
+    file: FieldFile
+) -> HttpResponseBase:
+    """Get response streaming the file.
+
+    Supports If-None-Match, a single byte Range (with If-Range) and
+    offloading to the front-end server configured in FILE_DOWNLOADS.
+    """
+    storage: Any = file.storage
+    size: int = file.size
+    modified_ns: int = int(
+        storage.get_modified_time(file.name).timestamp() * 1_000_000_000
+    )
+    etag: str = get_etag(size, modified_ns)
+    filename: str = os.path.basename(file.name)
+
+    if etag in (
+        tag.strip() for tag in request.headers.get("If-None-Match", "")
+        .split(",")
+    ):
+        response: HttpResponseBase = HttpResponse(status=304)
+        response["ETag"] = etag
+        return response
+
+    offload_response: Optional[HttpResponse] = get_offload_response(file)
+    if offload_response is not None:
+        offload_response["ETag"] = etag
+        offload_response["Content-Disposition"] = \
+            get_content_disposition(filename)
+        return offload_response
+
+    byte_range: Optional[tuple[int, int]] = None
+    range_header: Optional[str] = request.headers.get("Range")
+    if_range: Optional[str] = request.headers.get("If-Range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_range(range_header, size)
+
+    chunk_size: int = settings.FILE_DOWNLOADS.get("CHUNK_SIZE", 64 * 1024)
+    content_type: str = mimetypes.guess_type(filename)[0] or \
+        "application/octet-stream"
+    if byte_range is None:
+        response = FileResponse(file.open("rb"), filename=filename)
+        response.block_size = chunk_size
+    elif byte_range[0] >= size:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    else:
+        start: int
+        end: int
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_file_range(
+                file=file,
+                start=start,
+                length=end - start + 1,
+                chunk_size=chunk_size
+            ),
+            status=206,
+            content_type=content_type
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Disposition"] = get_content_disposition(filename)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified_ns // 1_000_000_000)
+    return response
@@ -1,15 +1,42 @@
 from typing import (
     Optional,
     Any,
+    Tuple,
+    Union,
 )
 
-from django.db.models import QuerySet
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.db.models import (
+    Model,
+    QuerySet,
+)
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+)
 
+from rest_framework.exceptions import (
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request as DRF_Request
 from rest_framework.response import Response as DRF_Response
 from rest_framework.serializers import Serializer
 from rest_framework.pagination import BasePagination
 from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from abstracts.paginators import AbstractPageNumberPaginator
+from abstracts.reference import reference_data
+from abstracts.timing import track_stage
 
 
 class DRFResponseHandler:
@@ -36,9 +63,11 @@ class DRFResponseHandler:
                 many=many,
                 context=serializer_context
             )
+            with track_stage(request, "serialize"):
+                serialized_data: Any = serializer.data
             response: DRF_Response = \
                 paginator.get_paginated_response(
-                    serializer.data
+                    serialized_data
                 )
             return response
 
@@ -47,10 +76,145 @@ class DRFResponseHandler:
             many=many,
             context=serializer_context
         )
+        with track_stage(request, "serialize"):
+            serialized_data: Any = serializer.data
         response: DRF_Response = DRF_Response(
             {
-                'data': serializer.data
+                'data': serialized_data
             },
             status=status.HTTP_200_OK
         )
         return response
+
+
+class AsyncResponseHandler:
+    """Handler for responses of async views.
+
+    Querysets are evaluated with the async ORM, so serializers must not
+    query the database: related objects have to be selected or prefetched.
+    """
+
+    renderer: JSONRenderer = JSONRenderer()
+    authentication: JWTAuthentication = JWTAuthentication()
+
+    def get_json_response(
+        self,
+        data: Any,
+        status_code: int = status.HTTP_200_OK
+    ) -> HttpResponse:
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type="application/json"
+        )
+
+    def get_message_response(
+        self,
+        message: str,
+        status_code: int
+    ) -> HttpResponse:
+        return self.get_json_response({"response": message}, status_code)
+
+    async def authenticate(
+        self,
+        request: HttpRequest
+    ) -> Tuple[Optional[AbstractBaseUser], Optional[HttpResponse]]:
+        """Get non-deleted user of the JWT or an error response."""
+        header: Optional[bytes] = self.authentication.get_header(request)
+        raw_token: Optional[bytes] = self.authentication.get_raw_token(
+            header
+        ) if header else None
+        if raw_token is None:
+            return (None, self.get_json_response(
+                {"detail": NotAuthenticated.default_detail},
+                status.HTTP_401_UNAUTHORIZED
+            ))
+        try:
+            user_id: Any = self.authentication.get_validated_token(
+                raw_token
+            )[jwt_settings.USER_ID_CLAIM]
+        except (InvalidToken, TokenError, KeyError) as exc:
+            return (None, self.get_json_response(
+                {"detail": getattr(exc, "detail", str(exc))},
+                status.HTTP_401_UNAUTHORIZED
+            ))
+        user: Optional[AbstractBaseUser] = await get_user_model().objects \
+            .filter(**{jwt_settings.USER_ID_FIELD: user_id}).afirst()
+        if not user or not user.is_active:
+            return (None, self.get_json_response(
+                {"detail": NotAuthenticated.default_detail},
+                status.HTTP_401_UNAUTHORIZED
+            ))
+        if user.datetime_deleted:
+            return (None, self.get_json_response(
+                {"detail": PermissionDenied.default_detail},
+                status.HTTP_403_FORBIDDEN
+            ))
+        return (user, None)
+
+    async def check_deleted_access(
+        self,
+        request: HttpRequest
+    ) -> Optional[HttpResponse]:
+        """Get error response unless deleted objects are not requested
+        or requested by an admin."""
+        if not request.GET.get("is_deleted"):
+            return None
+        user: Optional[AbstractBaseUser]
+        error_response: Optional[HttpResponse]
+        user, error_response = await self.authenticate(request)
+        if error_response:
+            return error_response
+        if not user.is_superuser:
+            return self.get_message_response(
+                "Вы не админ, чтобы запрашивать удалённые данные",
+                status.HTTP_403_FORBIDDEN
+            )
+        return None
+
+    async def get_async_response(
+        self,
+        request: HttpRequest,
+        data: Union[QuerySet, Model],
+        serializer_class: Serializer,
+        many: bool = False,
+        paginator: Optional[AbstractPageNumberPaginator] = None,
+        serializer_context: Optional[dict[str, Any]] = None
+    ) -> HttpResponse:
+        """Async counterpart of DRFResponseHandler.get_drf_response."""
+        # Serializers run on the event loop and may read reference rows
+        await reference_data.aensure_loaded()
+        if not serializer_context:
+            serializer_context = {"request": request}
+        if paginator and many:
+            try:
+                objects: list = await paginator.apaginate_queryset(
+                    queryset=data,
+                    request=request
+                )
+            except NotFound as exc:
+                return self.get_json_response(
+                    {"detail": exc.detail},
+                    status.HTTP_404_NOT_FOUND
+                )
+            serializer: Serializer = serializer_class(
+                objects,
+                many=many,
+                context=serializer_context
+            )
+            with track_stage(request, "serialize"):
+                serialized_data: Any = serializer.data
+            return self.get_json_response(
+                paginator.get_dict_response(serialized_data)
+            )
+
+        if many:
+            data = [obj async for obj in data]
+        serializer = serializer_class(
+            data,
+            many=many,
+            context=serializer_context
+        )
+        with track_stage(request, "serialize"):
+            serialized_data = serializer.data
+        return self.get_json_response({"data": serialized_data})
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Tuple,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.utils import load_backend
+
+from abstracts.backends.pool import close_idle_pools
+
+
+class Command(BaseCommand):
+    """Compare request latency with new and pooled PostgreSQL connections."""
+
+    help = "Сравнение задержки запросов с новыми и пулированными " \
+        "соединениями PostgreSQL"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Количество запросов на бэкенд"
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Количество потоков (воркеров)"
+        )
+        parser.add_argument(
+            "--alias",
+            default="default",
+            help="База данных PostgreSQL"
+        )
+
+    def get_request(
+        self,
+        engine: str,
+        settings_dict: dict[str, Any],
+        alias: str
+    ) -> Callable[[], float]:
+        """Get a request opening, querying and closing a connection.
+
+        Every thread gets its own wrapper like a Django worker thread, and
+        closing mirrors the request_finished signal.
+        """
+        def request() -> float:
+            connection: BaseDatabaseWrapper = load_backend(
+                engine
+            ).DatabaseWrapper(
+                {**deepcopy(settings_dict), "ENGINE": engine},
+                alias
+            )
+            start: float = perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.close()
+            return perf_counter() - start
+
+        return request
+
+    def measure(
+        self,
+        request: Callable[[], float],
+        options: Dict[str, Any]
+    ) -> Tuple[float, float, float]:
+        """Get requests per second, p50 and p95 in ms."""
+        start: float = perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            latencies: list[float] = sorted(
+                executor.map(
+                    lambda _: request(),
+                    range(options["requests"])
+                )
+            )
+        total: float = perf_counter() - start
+        return (
+            len(latencies) / total,
+            latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        alias: str = options["alias"]
+        settings_dict: dict[str, Any] = connections[alias].settings_dict
+        if connections[alias].vendor != "postgresql":
+            raise CommandError(f"База данных {alias} не PostgreSQL")
+        backends: tuple[tuple[str, str], ...] = (
+            ("postgresql", "django.db.backends.postgresql"),
+            ("postgresql_pool", "abstracts.backends.postgresql_pool"),
+        )
+        name: str
+        engine: str
+        for name, engine in backends:
+            result: Tuple[float, float, float] = self.measure(
+                request=self.get_request(
+                    engine=engine,
+                    settings_dict=settings_dict,
+                    alias=alias
+                ),
+                options=options
+            )
+            self.stdout.write(
+                "{0:<16} запросов={1:>8.0f}/с p50={2:>7.2f}мс "
+                "p95={3:>7.2f}мс".format(name, *result)
+            )
+        close_idle_pools()
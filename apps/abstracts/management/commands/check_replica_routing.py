@@ -0,0 +1,166 @@
+import sqlite3
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+from rest_framework.test import APIClient
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connections,
+)
+
+from abstracts.routers import (
+    REPLICAS,
+    STICKY_CACHE,
+    get_sticky_key,
+)
+from subjectss.models import (
+    ClassSubject,
+    Student,
+    StudentRegisteredSubjects,
+)
+
+
+class Command(BaseCommand):
+    """Check which database serves reads before and after a user's write.
+
+    Meant for settings.env.local_replica, where the primary and the replica
+    are two SQLite files: the primary is copied to the replica first.
+    """
+
+    help = "Проверка маршрутизации чтений на реплику " \
+        "(DJANGO_SETTINGS_MODULE=settings.env.local_replica)"
+
+    API_PREFIX: str = "/api/v1/"
+
+    def copy_primary(self) -> None:
+        """Replicate the primary SQLite file to the replicas."""
+        primary: str = connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+        alias: str
+        for alias in REPLICAS:
+            if connections[alias].vendor != "sqlite":
+                continue
+            connections[alias].close()
+            source: sqlite3.Connection = sqlite3.connect(primary)
+            target: sqlite3.Connection = sqlite3.connect(
+                connections[alias].settings_dict["NAME"]
+            )
+            source.backup(target)
+            source.close()
+            target.close()
+
+    def request(
+        self,
+        client: APIClient,
+        method: str,
+        path: str
+    ) -> Tuple[int, set[str]]:
+        """Perform a request, get its status and databases it queried."""
+        used: set[str] = set()
+
+        def get_wrapper(alias: str) -> Callable:
+            def wrapper(execute: Callable, *args: Any) -> Any:
+                used.add(alias)
+                return execute(*args)
+            return wrapper
+
+        aliases: tuple[str, ...] = (DEFAULT_DB_ALIAS, *REPLICAS)
+        alias: str
+        for alias in aliases:
+            connections[alias].execute_wrappers.append(get_wrapper(alias))
+        try:
+            status: int = client.generic(
+                method,
+                self.API_PREFIX + path
+            ).status_code
+        finally:
+            for alias in aliases:
+                connections[alias].execute_wrappers.pop()
+        return status, used
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        if not REPLICAS:
+            raise CommandError(
+                "Реплики не настроены: DATABASE_ROUTING['REPLICAS'] пуст"
+            )
+        self.copy_primary()
+        student: Optional[Student] = Student.objects.select_related(
+            "user"
+        ).first()
+        class_subject: Optional[ClassSubject] = ClassSubject.objects.\
+            get_not_deleted().exclude(
+                student_class_subjects__student=student
+            ).first()
+        if student is None or class_subject is None:
+            raise CommandError("Нет студента или предмета для проверки")
+
+        anonymous: APIClient = APIClient(SERVER_NAME="localhost")
+        user: APIClient = APIClient(SERVER_NAME="localhost")
+        user.force_authenticate(user=student.user)
+        primary: str = "primary"
+        replica: str = "replica"
+        steps: tuple[tuple[str, APIClient, str, str, str], ...] = (
+            ("аноним", anonymous, "GET", "subjects/general_subjects",
+             replica),
+            ("студент", user, "GET", "subjects/class_subjects", replica),
+            ("студент", user, "POST",
+             f"subjects/class_subjects/{class_subject.id}/register",
+             primary),
+            ("студент", user, "GET", "subjects/class_subjects", primary),
+            ("аноним", anonymous, "GET", "subjects/class_subjects",
+             replica),
+        )
+        failed: int = 0
+        try:
+            who: str
+            client: APIClient
+            method: str
+            path: str
+            expected: str
+            for who, client, method, path, expected in steps:
+                status: int
+                used: set[str]
+                status, used = self.request(
+                    client=client,
+                    method=method,
+                    path=path
+                )
+                got: str = replica if used & set(REPLICAS) else \
+                    primary if used else "-"
+                ok: bool = status < 400 and got == expected
+                failed += not ok
+                print(
+                    "{0:<8} {1:<5} {2:<48} {3} базы={4:<18} "
+                    "ожидалось={5:<8} {6}".format(
+                        who,
+                        method,
+                        path,
+                        status,
+                        ",".join(sorted(used)),
+                        expected,
+                        "ok" if ok else "ОШИБКА"
+                    )
+                )
+        finally:
+            StudentRegisteredSubjects.objects.filter(
+                student=student,
+                class_subject=class_subject
+            ).delete()
+            caches[STICKY_CACHE].delete(get_sticky_key(student.user.id))
+        if failed:
+            raise CommandError(f"Неверно направлено запросов: {failed}")
+        print(
+            "Маршрутизация верна, чтения после записи идут в основную базу "
+            f"{settings.DATABASE_ROUTING.get('STICKY_SECONDS', 10)} с"
+        )
@@ -0,0 +1,753 @@
+import json
+import logging
+import os
+from random import seed
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Union,
+)
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.core.signals import request_finished
+from django.db import (
+    close_old_connections,
+    connection,
+    transaction,
+)
+from django.db.models import Count
+from django.http import HttpResponseBase
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from abstracts.benchmarks import (
+    QueryCollector,
+    QueryStats,
+    EndpointResult,
+    BaselineComparator,
+)
+from abstracts.reference import reference_data
+from auths.middleware import JWTAuthMiddleware
+from auths.models import CustomUser
+from chats.broadcast import provision_chats
+from chats.models import PersonalChat
+from subjectss.leaderboard import leaderboards
+from subjectss.models import (
+    GeneralSubject,
+    TrackWay,
+    ClassSubject,
+    Topic,
+    Student,
+)
+from teaching.models import Teacher
+from tests.models import (
+    Quiz,
+    QuizType,
+    Question,
+)
+from tests.sampling import question_bank
+from urls.urls import (
+    router,
+    websocket_urlpatterns,
+)
+
+Payload = Union[None, dict[str, Any], Callable[[dict[str, Any], int], Any]]
+
+
+class Command(BaseCommand):
+    """Benchmark every API endpoint against the committed baselines."""
+
+    help = "Замер задержки и SQL запросов всех API эндпоинтов"
+
+    BASELINES_PATH = os.path.join(
+        settings.BASE_DIR, "utils", "benchmarks", "baselines.json"
+    )
+    BENCHMARK_PASSWORD = "benchmark-password"
+    CONTENT_FILE_SIZE = 256 * 1024
+    # Quiz generation picks questions randomly
+    RANDOM_SEED = 2023
+    # Not listed in INTERNAL_IPS, so debug toolbar stays out of the numbers
+    BENCHMARK_REMOTE_ADDR = "192.0.2.1"
+    API_PREFIX = "/api/v1/"
+    VIEWSET_ACTIONS = (
+        "list",
+        "retrieve",
+        "create",
+        "update",
+        "partial_update",
+        "destroy",
+    )
+    SOCKET_ENDPOINTS = (
+        "ChatConsumer.connect",
+        "ChatConsumer.receive",
+    )
+    # (endpoint, method, path, role, payload)
+    ENDPOINT_CASES: tuple[tuple[str, str, str, str, Payload]] = (
+        (
+            "CustomUserViewSet.list", "GET",
+            "auths/users", "student", None,
+        ),
+        (
+            "CustomUserViewSet.retrieve", "GET",
+            "auths/users/{student_user_id}", "student", None,
+        ),
+        (
+            "CustomUserViewSet.get_personal_info", "GET",
+            "auths/users/personal_account", "student", None,
+        ),
+        (
+            "CustomUserViewSet.create_user", "POST",
+            "auths/users/register_user", "anonymous",
+            lambda fixtures, i: {
+                "email": f"benchmark_new_{i}@benchmark.local",
+                "first_name": "Benchmark",
+                "last_name": "User",
+                "password": "benchmark-password",
+                "position": "student",
+            },
+        ),
+        (
+            "CustomUserViewSet.delete_users", "DELETE",
+            "auths/users/delete", "admin",
+            lambda fixtures, i: {"user_ids": [fixtures["target_user_id"]]},
+        ),
+        (
+            "CustomUserViewSet.block", "GET",
+            "auths/users/{target_user_id}/block", "admin", None,
+        ),
+        (
+            "CustomUserViewSet.unblock", "GET",
+            "auths/users/{blocked_user_id}/unblock", "admin", None,
+        ),
+        (
+            "CustomUserViewSet.recover", "PATCH",
+            "auths/users/{deleted_user_id}/recover", "admin", None,
+        ),
+        (
+            "CustomUserViewSet.get_students", "GET",
+            "auths/users/students", "teacher", None,
+        ),
+        (
+            "CustomUserViewSet.get_teachers", "GET",
+            "auths/users/teachers", "student", None,
+        ),
+        (
+            "CustomUserViewSet.login", "POST",
+            "auths/users/login", "anonymous",
+            lambda fixtures, i: {
+                "email": fixtures["login_email"],
+                "password": fixtures["login_password"],
+            },
+        ),
+        (
+            "GeneralSubjectViewSet.list", "GET",
+            "subjects/general_subjects", "anonymous", None,
+        ),
+        (
+            "GeneralSubjectViewSet.retrieve", "GET",
+            "subjects/general_subjects/{general_subject_id}",
+            "anonymous", None,
+        ),
+        (
+            "TrackWayViewSet.list", "GET",
+            "subjects/trackways", "anonymous", None,
+        ),
+        (
+            "TrackWayViewSet.retrieve", "GET",
+            "subjects/trackways/{trackway_id}", "anonymous", None,
+        ),
+        (
+            "ClassViewSet.list", "GET",
+            "subjects/classes", "anonymous", None,
+        ),
+        (
+            "ClassSubjectViewSet.list", "GET",
+            "subjects/class_subjects", "anonymous", None,
+        ),
+        (
+            "ClassSubjectViewSet.retrieve", "GET",
+            "subjects/class_subjects/{class_subject_id}", "anonymous", None,
+        ),
+        (
+            "ClassSubjectViewSet.get_class_subj_teachers", "GET",
+            "subjects/class_subjects/{class_subject_id}/get_teachers",
+            "student", None,
+        ),
+        (
+            "ClassSubjectViewSet.register_students", "POST",
+            "subjects/class_subjects/{free_class_subject_id}/register",
+            "student", None,
+        ),
+        (
+            "ClassSubjectViewSet.bulk_register_students", "POST",
+            "subjects/class_subjects/bulk_register", "student",
+            lambda fixtures, i: {
+                "class_subject_ids": [
+                    fixtures["free_class_subject_id"],
+                    fixtures["class_subject_id"],
+                ],
+            },
+        ),
+        (
+            "ClassSubjectViewSet.enroll_class_students", "POST",
+            "subjects/class_subjects/{free_class_subject_id}/enroll_class",
+            "admin", None,
+        ),
+        (
+            "TopicViewSet.list", "GET",
+            "subjects/topics", "student", None,
+        ),
+        (
+            "TopicViewSet.retrieve", "GET",
+            "subjects/topics/{topic_id}", "student", None,
+        ),
+        (
+            "TopicViewSet.download", "GET",
+            "subjects/topics/{topic_id}/download", "admin", None,
+        ),
+        (
+            "LeaderboardViewSet.list", "GET",
+            "subjects/leaderboard?scope=class_subject"
+            "&scope_id={class_subject_id}", "student", None,
+        ),
+        (
+            "LeaderboardViewSet.get_my_rank", "GET",
+            "subjects/leaderboard/me", "student", None,
+        ),
+        (
+            "PersonalChatViewSet.list", "GET",
+            "chats/chats", "chat_member", None,
+        ),
+        (
+            "PersonalChatViewSet.retrieve", "GET",
+            "chats/chats/{chat_id}", "chat_member", None,
+        ),
+        (
+            "PersonalChatViewSet.create", "POST",
+            "chats/chats", "student",
+            lambda fixtures, i: {
+                "student": fixtures["student_id"],
+                "teacher": fixtures["free_teacher_id"],
+            },
+        ),
+        (
+            "PersonalChatViewSet.add_message", "POST",
+            "chats/chats/{chat_id}/add_message", "chat_member",
+            lambda fixtures, i: {"content": f"Сообщение бенчмарка {i}"},
+        ),
+        (
+            "PersonalChatViewSet.provision", "POST",
+            "chats/chats/provision", "admin",
+            lambda fixtures, i: {
+                "class_subject": fixtures["class_subject_id"],
+                "teacher": fixtures["class_subject_teacher_id"],
+            },
+        ),
+        (
+            "PersonalChatViewSet.broadcast", "POST",
+            "chats/chats/broadcast", "admin",
+            lambda fixtures, i: {
+                "class_subject": fixtures["class_subject_id"],
+                "teacher": fixtures["class_subject_teacher_id"],
+                "content": f"Объявление бенчмарка {i}",
+            },
+        ),
+        (
+            "PersonalChatViewSet.transcript", "GET",
+            "chats/chats/{chat_id}/transcript?file_format=csv",
+            "chat_teacher", None,
+        ),
+        (
+            "QuizTypeViewSet.list", "GET",
+            "tests/quiz_types", "anonymous", None,
+        ),
+        (
+            "QuizViewSet.list", "GET",
+            "tests/quiz", "student", None,
+        ),
+        (
+            "QuizViewSet.retrieve", "GET",
+            "tests/quiz/{quiz_id}", "student", None,
+        ),
+        (
+            "QuizViewSet.create", "POST",
+            "tests/quiz", "student",
+            lambda fixtures, i: {
+                "name": f"Тест бенчмарка {i}",
+                "quiz_type": fixtures["topic_quiz_type_id"],
+                "topic_id": fixtures["quiz_topic_id"],
+            },
+        ),
+        (
+            "QuizViewSet.upload_quiz", "POST",
+            "tests/quiz/{open_quiz_id}/upload_answers", "student",
+            lambda fixtures, i: {"questions": fixtures["open_quiz_answers"]},
+        ),
+        (
+            "StudentTopicStatsViewSet.list", "GET",
+            "tests/progress", "student", None,
+        ),
+        (
+            "StudentTopicStatsViewSet.list.teacher", "GET",
+            "tests/progress?student={student_id}", "teacher", None,
+        ),
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Количество замеров на эндпоинт"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Количество прогревочных запросов без замера"
+        )
+        parser.add_argument(
+            "--baselines",
+            default=self.BASELINES_PATH,
+            help="Путь к файлу базовых линий"
+        )
+        parser.add_argument(
+            "--only",
+            default="",
+            help="Замерять только эндпоинты, содержащие подстроку"
+        )
+        parser.add_argument(
+            "--update-baselines",
+            action="store_true",
+            help="Перезаписать базовые линии текущими результатами"
+        )
+        parser.add_argument(
+            "--skip-latency",
+            action="store_true",
+            help="Не сравнивать задержку (например, на другой машине)"
+        )
+
+    def get_router_endpoints(self) -> set[str]:
+        """Get names of all endpoints registered in the API router."""
+        endpoints: set[str] = set()
+        viewset: Any
+        for _, viewset, _ in router.registry:
+            action_name: str
+            for action_name in self.VIEWSET_ACTIONS:
+                if hasattr(viewset, action_name):
+                    endpoints.add(f"{viewset.__name__}.{action_name}")
+            extra_action: Any
+            for extra_action in viewset.get_extra_actions():
+                endpoints.add(f"{viewset.__name__}.{extra_action.__name__}")
+        return endpoints
+
+    def create_user(self, email: str, **kwargs: dict[str, Any]) -> CustomUser:
+        """Create benchmark user without hashing a password."""
+        return CustomUser.objects.create(
+            email=email,
+            first_name="Benchmark",
+            last_name="User",
+            **kwargs
+        )
+
+    def prepare_fixtures(self) -> dict[str, Any]:
+        """Pick seeded objects and create missing ones for the endpoints."""
+        student: Optional[Student] = Student.objects.annotate(
+            quizes_count=Count("subject_quizes")
+        ).order_by("-quizes_count", "id").select_related("user").first()
+        chat: Optional[PersonalChat] = PersonalChat.objects.get_not_deleted(
+        ).annotate(
+            messages_count=Count("messages")
+        ).order_by("-messages_count", "id").select_related(
+            "student__user",
+            "teacher__user"
+        ).first()
+        teacher: Optional[Teacher] = Teacher.objects.select_related(
+            "user"
+        ).order_by("id").first()
+        class_subject: Optional[ClassSubject] = ClassSubject.objects\
+            .get_not_deleted().annotate(
+                topics_count=Count("topics")
+            ).order_by("-topics_count", "id").first()
+        topic: Optional[Topic] = Topic.objects.get_not_deleted().annotate(
+            questions_count=Count("questions")
+        ).order_by("-questions_count", "id").first()
+        if not all((student, chat, teacher, class_subject, topic)):
+            raise CommandError(
+                "База данных не заполнена. Запустите команды generate_*_data"
+            )
+        # Boards are built on first use; keep that out of the numbers
+        leaderboards.rebuild()
+        question_bank.rebuild()
+        reference_data.rebuild()
+        topic.content_file.save(
+            "benchmark.pdf",
+            ContentFile(b"%PDF-1.4\n" + b"0" * self.CONTENT_FILE_SIZE)
+        )
+
+        admin: CustomUser = self.create_user(
+            email="benchmark_admin@benchmark.local",
+            is_staff=True,
+            is_superuser=True
+        )
+        login_user: CustomUser = self.create_user(
+            email="benchmark_login@benchmark.local"
+        )
+        login_user.set_password(self.BENCHMARK_PASSWORD)
+        login_user.save(update_fields=["password"])
+        blocked_user: CustomUser = self.create_user(
+            email="benchmark_blocked@benchmark.local",
+            is_active=False
+        )
+        deleted_user: CustomUser = self.create_user(
+            email="benchmark_deleted@benchmark.local",
+            datetime_deleted=timezone.now()
+        )
+        target_user: CustomUser = self.create_user(
+            email="benchmark_target@benchmark.local"
+        )
+
+        class_subject_teacher_id: Optional[int] = \
+            class_subject.teachers.order_by("id").values_list(
+                "id", flat=True
+            ).first()
+        if class_subject_teacher_id is not None:
+            # Broadcasts reach the chats, provisioning finds them existing
+            provision_chats(
+                teacher_id=class_subject_teacher_id,
+                class_subject_id=class_subject.id
+            )
+
+        open_quiz: Quiz = Quiz(
+            name="Тест бенчмарка",
+            quiz_type_id=reference_data.get_id(QuizType, QuizType.TOPIC),
+            student=student
+        )
+        open_quiz._topic_id = topic.id
+        open_quiz.save()
+        open_quiz_answers: list[dict[str, int]] = [
+            {
+                "quiz": open_quiz.id,
+                "question": question.id,
+                "user_answer": question.answers.all()[0].id,
+            }
+            for question in Question.objects.filter(
+                quizess=open_quiz
+            ).prefetch_related("answers")
+        ]
+        quiz_id: int = Quiz.objects.filter(student=student).annotate(
+            answers_count=Count("quiz_questions")
+        ).order_by("-answers_count", "id").values_list(
+            "id", flat=True
+        ).first() or open_quiz.id
+
+        return {
+            "users": {
+                "anonymous": None,
+                "student": student.user,
+                "chat_member": chat.student.user,
+                "chat_teacher": chat.teacher.user,
+                "teacher": teacher.user,
+                "admin": admin,
+            },
+            "student_id": student.id,
+            "student_user_id": student.user_id,
+            "chat_id": chat.id,
+            "chat_user_id": chat.student.user_id,
+            "chat_user_token": str(
+                RefreshToken.for_user(chat.student.user).access_token
+            ),
+            "target_user_id": target_user.id,
+            "blocked_user_id": blocked_user.id,
+            "deleted_user_id": deleted_user.id,
+            "login_email": login_user.email,
+            "login_password": self.BENCHMARK_PASSWORD,
+            "general_subject_id": GeneralSubject.objects.get_not_deleted(
+            ).order_by("id").values_list("id", flat=True).first(),
+            "trackway_id": TrackWay.objects.get_not_deleted().order_by(
+                "id"
+            ).values_list("id", flat=True).first(),
+            "class_subject_id": class_subject.id,
+            "class_subject_teacher_id": class_subject_teacher_id,
+            "free_class_subject_id": ClassSubject.objects.get_not_deleted(
+            ).exclude(
+                student_class_subjects__student=student
+            ).order_by("id").values_list("id", flat=True).first(),
+            "topic_id": topic.id,
+            "quiz_topic_id": topic.id,
+            "topic_quiz_type_id": reference_data.get_id(
+                QuizType,
+                QuizType.TOPIC
+            ),
+            "free_teacher_id": Teacher.objects.exclude(
+                personal_chats__student=student
+            ).order_by("id").values_list("id", flat=True).first(),
+            "quiz_id": quiz_id,
+            "open_quiz_id": open_quiz.id,
+            "open_quiz_answers": open_quiz_answers,
+        }
+
+    def request_endpoint(
+        self,
+        client: APIClient,
+        method: str,
+        path: str,
+        payload: Optional[dict[str, Any]]
+    ) -> int:
+        """Perform request and get its status code."""
+        response: HttpResponseBase
+        if payload is None:
+            response = client.generic(method, path)
+        else:
+            response = client.generic(
+                method,
+                path,
+                data=json.dumps(payload),
+                content_type="application/json"
+            )
+        if response.streaming:
+            b"".join(response.streaming_content)
+        # Streaming responses keep their files open until closed; closing
+        # must not close the connection holding the rolled back transaction
+        request_finished.disconnect(close_old_connections)
+        try:
+            response.close()
+        finally:
+            request_finished.connect(close_old_connections)
+        return response.status_code
+
+    def measure_endpoint(
+        self,
+        fixtures: dict[str, Any],
+        case: tuple[str, str, str, str, Payload],
+        iterations: int,
+        warmup: int
+    ) -> EndpointResult:
+        """Measure one endpoint; every request is rolled back."""
+        name, method, path, role, payload = case
+        client: APIClient = APIClient(
+            REMOTE_ADDR=self.BENCHMARK_REMOTE_ADDR
+        )
+        client.raise_request_exception = False
+        user: Optional[CustomUser] = fixtures["users"][role]
+        if user:
+            client.force_authenticate(user=user)
+        url: str = self.API_PREFIX + path.format(**fixtures)
+
+        latencies: list[float] = []
+        queries: int = 0
+        rows: int = 0
+        status: int = 0
+        collector: QueryCollector = QueryCollector(connection)
+        i: int
+        for i in range(warmup + iterations):
+            data: Optional[dict[str, Any]] = payload(fixtures, i) \
+                if callable(payload) else payload
+            with transaction.atomic():
+                stats: QueryStats
+                with collector as stats:
+                    start: float = perf_counter()
+                    status = self.request_endpoint(
+                        client=client,
+                        method=method,
+                        path=url,
+                        payload=data
+                    )
+                    elapsed: float = perf_counter() - start
+                transaction.set_rollback(True)
+            if i >= warmup:
+                latencies.append(elapsed)
+                queries = max(queries, stats.queries)
+                rows = max(rows, stats.rows)
+        return EndpointResult(
+            name=name,
+            latencies=latencies,
+            queries=queries,
+            rows=rows,
+            status=status
+        )
+
+    async def chat_socket_session(
+        self,
+        fixtures: dict[str, Any],
+        stats: QueryStats,
+        index: int
+    ) -> dict[str, tuple[float, int, int, int]]:
+        """Connect to the chat socket and send one message."""
+        phases: dict[str, tuple[float, int, int, int]] = {}
+        communicator: WebsocketCommunicator = WebsocketCommunicator(
+            JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+            f"/ws/chats/{fixtures['chat_id']}/"
+            f"?token={fixtures['chat_user_token']}"
+        )
+        stats.reset()
+        start: float = perf_counter()
+        connected: bool
+        connected, _ = await communicator.connect()
+        if connected:
+            await communicator.receive_json_from()
+        phases["ChatConsumer.connect"] = (
+            perf_counter() - start,
+            stats.queries,
+            stats.rows,
+            101 if connected else 403,
+        )
+        if connected:
+            stats.reset()
+            start = perf_counter()
+            await communicator.send_json_to({
+                "content": f"Сообщение бенчмарка {index}",
+                "chat_id": fixtures["chat_id"],
+                "user_id": fixtures["chat_user_id"],
+            })
+            await communicator.receive_json_from()
+            phases["ChatConsumer.receive"] = (
+                perf_counter() - start,
+                stats.queries,
+                stats.rows,
+                101,
+            )
+        await communicator.disconnect()
+        return phases
+
+    def measure_chat_socket(
+        self,
+        fixtures: dict[str, Any],
+        iterations: int,
+        warmup: int
+    ) -> list[EndpointResult]:
+        """Measure the websocket chat consumer."""
+        measured: dict[str, list[tuple[float, int, int, int]]] = {}
+        collector: QueryCollector = QueryCollector(connection)
+        i: int
+        for i in range(warmup + iterations):
+            with transaction.atomic():
+                stats: QueryStats
+                with collector as stats:
+                    phases: dict[str, tuple[float, int, int, int]] = \
+                        async_to_sync(self.chat_socket_session)(
+                            fixtures, stats, i
+                        )
+                transaction.set_rollback(True)
+            if i >= warmup:
+                name: str
+                for name, phase in phases.items():
+                    measured.setdefault(name, []).append(phase)
+        return [
+            EndpointResult(
+                name=name,
+                latencies=[phase[0] for phase in phases],
+                queries=max(phase[1] for phase in phases),
+                rows=max(phase[2] for phase in phases),
+                status=phases[-1][3]
+            )
+            for name, phases in measured.items()
+        ]
+
+    def handle(self, *args: tuple[Any], **options: dict[str, Any]) -> None:
+        """Run benchmarks and compare them with the baselines."""
+        cases: tuple[tuple[str, str, str, str, Payload]] = \
+            self.ENDPOINT_CASES
+        uncovered: set[str] = self.get_router_endpoints() - {
+            case[0] for case in cases
+        }
+        if uncovered:
+            raise CommandError(
+                "Эндпоинты без бенчмарка: " + ", ".join(sorted(uncovered))
+            )
+        only: str = options["only"]
+        iterations: int = options["iterations"]
+        warmup: int = options["warmup"]
+
+        results: list[EndpointResult] = []
+        # The benchmark reports timings itself
+        logging.getLogger("abstracts.timing").setLevel(logging.ERROR)
+        seed(self.RANDOM_SEED)
+        setup_test_environment()
+        try:
+            # Uploaded content files are written outside the project media
+            with TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root), \
+                    transaction.atomic():
+                fixtures: dict[str, Any] = self.prepare_fixtures()
+                case: tuple[str, str, str, str, Payload]
+                for case in cases:
+                    if only in case[0]:
+                        results.append(
+                            self.measure_endpoint(
+                                fixtures=fixtures,
+                                case=case,
+                                iterations=iterations,
+                                warmup=warmup
+                            )
+                        )
+                if any(only in name for name in self.SOCKET_ENDPOINTS):
+                    results.extend(
+                        self.measure_chat_socket(
+                            fixtures=fixtures,
+                            iterations=iterations,
+                            warmup=warmup
+                        )
+                    )
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        comparator: BaselineComparator = BaselineComparator(
+            path=options["baselines"]
+        )
+        regressions: list[str] = []
+        result: EndpointResult
+        for result in results:
+            errors: list[str] = comparator.compare(
+                result=result,
+                check_latency=not options["skip_latency"]
+            )
+            regressions.extend(errors)
+            self.stdout.write(
+                "{0:<50} {1:>4} p50={2:>9.3f}мс p95={3:>9.3f}мс "
+                "запросов={4:>3} строк={5:>5} {6}".format(
+                    result.name,
+                    result.status,
+                    result.p50_ms,
+                    result.p95_ms,
+                    result.queries,
+                    result.rows,
+                    "РЕГРЕССИЯ" if errors else "ok"
+                )
+            )
+
+        if options["update_baselines"]:
+            comparator.save(results=results)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Базовые линии сохранены в {options['baselines']}"
+                )
+            )
+            return
+        if regressions:
+            raise CommandError(
+                "Обнаружены регрессии производительности:\n" +
+                "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("Регрессий не обнаружено"))
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from time import perf_counter
+from typing import (
+    Any,
+    Optional,
+)
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import AsyncClient
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from auths.models import CustomUser
+from chats.models import PersonalChat
+from subjectss.models import Student
+from tests.models import Quiz
+
+
+class Command(BaseCommand):
+    """Compare throughput of sync and async read endpoints under ASGI."""
+
+    help = "Сравнение пропускной способности синхронных и асинхронных " \
+        "эндпоинтов при конкурентных запросах"
+
+    API_PREFIX = "/api/v1/"
+    ASYNC_API_PREFIX = "/api/v1/async/"
+    # Not listed in INTERNAL_IPS, so debug toolbar stays out of the numbers
+    BENCHMARK_CLIENT = ["192.0.2.1", 0]
+    # (name, path, async path, role); None when both stacks serve the path
+    ENDPOINT_CASES: tuple[tuple[str, str, Optional[str], str]] = (
+        ("general_subjects", "subjects/general_subjects", None, "anonymous"),
+        ("trackways", "subjects/trackways", None, "anonymous"),
+        ("classes", "subjects/classes", None, "anonymous"),
+        ("class_subjects", "subjects/class_subjects", None, "anonymous"),
+        ("quiz.list", "tests/quiz", None, "student"),
+        ("quiz.retrieve", "tests/quiz/{quiz_id}", None, "student"),
+        ("chats.list", "chats/chats", None, "chat_member"),
+        (
+            "chats.messages", "chats/chats/{chat_id}",
+            "chats/chats/{chat_id}/messages", "chat_member",
+        ),
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Количество одновременных запросов"
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Количество запросов на эндпоинт"
+        )
+        parser.add_argument(
+            "--only",
+            default="",
+            help="Замерять только эндпоинты, содержащие подстроку"
+        )
+
+    def prepare_fixtures(self) -> dict[str, Any]:
+        """Pick seeded users and objects for the endpoints."""
+        student: Optional[Student] = Student.objects.annotate(
+            quizes_count=Count("subject_quizes")
+        ).order_by("-quizes_count", "id").select_related("user").first()
+        chat: Optional[PersonalChat] = PersonalChat.objects.get_not_deleted(
+        ).select_related("student__user").order_by("id").first()
+        if not student or not chat:
+            raise CommandError(
+                "База данных не заполнена. Запустите команды generate_*_data"
+            )
+        return {
+            "users": {
+                "anonymous": None,
+                "student": student.user,
+                "chat_member": chat.student.user,
+            },
+            "chat_id": chat.id,
+            "quiz_id": Quiz.objects.filter(student=student).order_by(
+                "id"
+            ).values_list("id", flat=True).first() or 0,
+        }
+
+    def get_headers(self, user: Optional[CustomUser]) -> dict[str, str]:
+        if not user:
+            return {}
+        return {
+            "authorization": "JWT {0}".format(
+                RefreshToken.for_user(user).access_token
+            )
+        }
+
+    async def measure(
+        self,
+        path: str,
+        headers: dict[str, str],
+        requests: int,
+        concurrency: int
+    ) -> tuple[float, float, int]:
+        """Get requests per second, p95 latency in ms and failures."""
+        client: AsyncClient = AsyncClient(client=self.BENCHMARK_CLIENT)
+        client.raise_request_exception = False
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        failures: int = 0
+
+        async def request() -> None:
+            nonlocal failures
+            async with semaphore:
+                start: float = perf_counter()
+                response: HttpResponse = await client.get(path, **headers)
+                latencies.append(perf_counter() - start)
+                if response.status_code >= 400:
+                    failures += 1
+
+        start: float = perf_counter()
+        await asyncio.gather(*(request() for _ in range(requests)))
+        elapsed: float = perf_counter() - start
+        latencies.sort()
+        return (
+            requests / elapsed,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            failures
+        )
+
+    async def run(
+        self,
+        fixtures: dict[str, Any],
+        options: dict[str, Any]
+    ) -> None:
+        name: str
+        path: str
+        async_path: Optional[str]
+        role: str
+        for name, path, async_path, role in self.ENDPOINT_CASES:
+            if options["only"] not in name:
+                continue
+            headers: dict[str, str] = self.get_headers(
+                fixtures["users"][role]
+            )
+            results: list[tuple[float, float, int]] = []
+            prefix: str
+            stack_path: str
+            for prefix, stack_path in (
+                (self.API_PREFIX, path),
+                (self.ASYNC_API_PREFIX, async_path or path),
+            ):
+                results.append(
+                    await self.measure(
+                        path=prefix + stack_path.format(**fixtures),
+                        headers=headers,
+                        requests=options["requests"],
+                        concurrency=options["concurrency"]
+                    )
+                )
+            (sync_rps, sync_p95, sync_failures), \
+                (async_rps, async_p95, async_failures) = results
+            self.stdout.write(
+                "{0:<20} sync={1:>8.1f} rps p95={2:>8.2f}мс "
+                "async={3:>8.1f} rps p95={4:>8.2f}мс x{5:.2f}{6}".format(
+                    name,
+                    sync_rps,
+                    sync_p95,
+                    async_rps,
+                    async_p95,
+                    async_rps / sync_rps,
+                    " ОШИБКИ: {0}/{1}".format(sync_failures, async_failures)
+                    if sync_failures or async_failures else ""
+                )
+            )
+
+    def handle(self, *args: tuple[Any], **options: dict[str, Any]) -> None:
+        """Run the endpoints through the ASGI handler of the test client."""
+        fixtures: dict[str, Any] = self.prepare_fixtures()
+        # The benchmark reports timings itself
+        logging.getLogger("abstracts.timing").setLevel(logging.ERROR)
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        setup_test_environment()
+        try:
+            asyncio.run(self.run(fixtures=fixtures, options=options))
+        finally:
+            teardown_test_environment()
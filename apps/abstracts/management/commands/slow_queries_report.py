@@ -0,0 +1,121 @@
+import os
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+
+from abstracts.slow_queries import read_slow_queries
+
+
+class Command(BaseCommand):
+    """Summarize the slow query log by fingerprint."""
+
+    help = "Топ медленных SQL запросов по суммарному времени"
+
+    ORDERINGS = ("total", "count", "max", "mean")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="Количество отпечатков в отчете"
+        )
+        parser.add_argument(
+            "--order-by",
+            choices=self.ORDERINGS,
+            default="total",
+            help="Поле сортировки отчета"
+        )
+        parser.add_argument(
+            "--log-file",
+            default=os.path.join(
+                settings.BASE_DIR,
+                settings.SLOW_QUERIES.get(
+                    "LOG_FILE", "logs/slow_queries.log"
+                )
+            ),
+            help="Путь к журналу медленных запросов"
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Показать планы выполнения"
+        )
+
+    def summarize(
+        self,
+        entries: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Get statistics of every fingerprint."""
+        summary: dict[str, dict[str, Any]] = {}
+        entry: dict[str, Any]
+        for entry in entries:
+            stats: dict[str, Any] = summary.setdefault(
+                entry["fingerprint"],
+                {
+                    "fingerprint": entry["fingerprint"],
+                    "sql": entry["sql"],
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "call_sites": {},
+                    "plan": None,
+                }
+            )
+            stats["count"] += 1
+            stats["total"] += entry["duration_ms"]
+            stats["max"] = max(stats["max"], entry["duration_ms"])
+            call_site: str = f"{entry['kind']} {entry['location']}"
+            stats["call_sites"][call_site] = \
+                stats["call_sites"].get(call_site, 0) + 1
+            if entry.get("plan"):
+                stats["plan"] = entry["plan"]
+        for stats in summary.values():
+            stats["mean"] = stats["total"] / stats["count"]
+        return list(summary.values())
+
+    def handle(self, *args: tuple[Any], **options: dict[str, Any]) -> None:
+        """Print the top fingerprints."""
+        entries: list[dict[str, Any]] = read_slow_queries(
+            options["log_file"]
+        )
+        if not entries:
+            self.stdout.write("Медленных запросов не найдено")
+            return
+
+        order_by: str = options["order_by"]
+        summary: list[dict[str, Any]] = sorted(
+            self.summarize(entries),
+            key=lambda stats: stats[order_by],
+            reverse=True
+        )[:options["limit"]]
+        self.stdout.write(
+            f"Записей: {len(entries)}, сортировка: {order_by}\n"
+        )
+        stats: dict[str, Any]
+        for stats in summary:
+            self.stdout.write(
+                f"{stats['fingerprint']} "
+                f"всего={stats['total']:.1f}мс "
+                f"вызовов={stats['count']} "
+                f"среднее={stats['mean']:.1f}мс "
+                f"макс={stats['max']:.1f}мс"
+            )
+            self.stdout.write(f"  {stats['sql'][:300]}")
+            call_site: str
+            count: int
+            for call_site, count in sorted(
+                stats["call_sites"].items(),
+                key=lambda item: item[1],
+                reverse=True
+            ):
+                self.stdout.write(f"  {count:>5} × {call_site}")
+            if options["plans"] and stats["plan"]:
+                line: str
+                for line in stats["plan"]:
+                    self.stdout.write(f"    | {line}")
+            self.stdout.write("")
@@ -0,0 +1,538 @@
+"""In-process metrics registry exposed in the Prometheus text format.
+
+Every worker keeps its own values in memory. When METRICS["MULTIPROCESS_DIR"]
+is set, a background thread of every worker dumps its values every
+FLUSH_INTERVAL seconds into a '<pid>-<start>.json' file of the shared
+directory, and a scrape merges the files of the workers that are alive by
+summing their values. A worker removes its file on exit and a scrape removes
+the files of workers that died without it, so restarted workers are not
+counted twice. The start time of the process in the file name keeps a new
+process with a reused pid from passing for a dead worker.
+"""
+import atexit
+import json
+import logging
+import os
+from contextlib import contextmanager
+from threading import (
+    Event,
+    Lock,
+    Thread,
+)
+from time import (
+    perf_counter,
+    time,
+)
+from typing import (
+    Any,
+    Iterator,
+    Optional,
+)
+
+from django.conf import settings
+
+logger: logging.Logger = logging.getLogger("abstracts.metrics")
+
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS: tuple[float, ...] = (
+    0, 1, 2, 5, 10, 20, 50, 100, 200,
+)
+FLUSH_INTERVAL: float = 1.0
+
+
+def format_value(value: float) -> str:
+    """Get the value as written in the text format."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """Get '{name="value",...}' label set."""
+    if not names:
+        return ""
+    pairs: str = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"')
+            .replace("\n", "\\n")
+        )
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """Base metric with a value per label set."""
+
+    kind: str = ""
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: dict[tuple[str, ...], Any] = {}
+
+    def get_key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        """Get label values ordered as labelnames."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def dump(self) -> dict[str, Any]:
+        """Get the metric as a JSON serializable dict."""
+        return {
+            "kind": self.kind,
+            "documentation": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [
+                [list(key), self.copy_value(value)]
+                for key, value in self.values.items()
+            ],
+        }
+
+    def copy_value(self, value: Any) -> Any:
+        return value
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    kind: str = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key: tuple[str, ...] = self.get_key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down."""
+
+    kind: str = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key: tuple[str, ...] = self.get_key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key: tuple[str, ...] = self.get_key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values over cumulative buckets."""
+
+    kind: str = "histogram"
+
+    def __init__(
+        self,
+        *args: Any,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        **kwargs: Any
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key: tuple[str, ...] = self.get_key(labels)
+        with self.registry.lock:
+            sample: Optional[dict[str, Any]] = self.values.get(key)
+            if sample is None:
+                sample = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+                self.values[key] = sample
+            index: int
+            bound: float
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["counts"][index] += 1
+                    break
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe duration of the block in seconds."""
+        start: float = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def copy_value(self, value: dict[str, Any]) -> dict[str, Any]:
+        return {**value, "counts": list(value["counts"])}
+
+    def dump(self) -> dict[str, Any]:
+        data: dict[str, Any] = super().dump()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Collection of metrics of the current process."""
+
+    def __init__(
+        self,
+        multiprocess_dir: Optional[str] = None,
+        flush_interval: float = FLUSH_INTERVAL
+    ) -> None:
+        self.lock: Lock = Lock()
+        self.flush_lock: Lock = Lock()
+        self.metrics: dict[str, Metric] = {}
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self.process_id: str = ""
+        self.stopped: Event = Event()
+        self.flusher: Optional[Thread] = None
+        if multiprocess_dir:
+            os.makedirs(multiprocess_dir, exist_ok=True)
+            self.start_flusher()
+            os.register_at_fork(after_in_child=self.after_fork)
+            atexit.register(self.close)
+
+    def register(self, metric_class: type, name: str, *args: Any,
+                 **kwargs: Any) -> Any:
+        with self.lock:
+            metric: Optional[Metric] = self.metrics.get(name)
+            if metric is None:
+                metric = metric_class(self, name, *args, **kwargs)
+                self.metrics[name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str,
+              labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str,
+                  labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(
+            Histogram, name, documentation, labelnames, buckets=buckets
+        )
+
+    # ------------------------------------------
+    # Multiprocess mode
+    #
+    def get_path(self, process_id: str) -> str:
+        return os.path.join(self.multiprocess_dir, f"{process_id}.json")
+
+    def start_flusher(self) -> None:
+        """Start flushing values of the current process periodically."""
+        self.process_id = get_process_id(os.getpid())
+        self.stopped = Event()
+        self.flusher = Thread(
+            target=self.run_flusher,
+            args=(self.stopped,),
+            name="metrics-flusher",
+            daemon=True
+        )
+        self.flusher.start()
+
+    def after_fork(self) -> None:
+        """Start the child's own flusher and values.
+
+        Threads do not survive a fork and the parent's flusher may have
+        held the locks; values of the parent are in the parent's file.
+        """
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        metric: Metric
+        for metric in self.metrics.values():
+            metric.values = {}
+        self.start_flusher()
+
+    def stop_flusher(self) -> None:
+        self.stopped.set()
+        if self.flusher is not None:
+            self.flusher.join()
+            self.flusher = None
+
+    def close(self) -> None:
+        """Stop flushing and remove the file of the exiting process."""
+        self.stop_flusher()
+        try:
+            os.remove(self.get_path(self.process_id))
+        except FileNotFoundError:
+            pass
+
+    def run_flusher(self, stopped: Event) -> None:
+        while not stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Ошибка записи метрик процесса")
+
+    def dump(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                name: metric.dump() for name, metric in self.metrics.items()
+            }
+
+    def flush(self) -> None:
+        """Write values of the process into the shared directory."""
+        if not self.multiprocess_dir:
+            return
+        with self.flush_lock:
+            path: str = self.get_path(self.process_id)
+            temp_path: str = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.dump(), file)
+            os.replace(temp_path, path)
+
+    def load_processes(self) -> list[dict[str, Any]]:
+        """Get dumps of the live processes, remove files of dead ones."""
+        self.flush()
+        processes: list[dict[str, Any]] = []
+        filename: str
+        for filename in sorted(os.listdir(self.multiprocess_dir)):
+            if not filename.endswith(".json"):
+                continue
+            path: str = os.path.join(self.multiprocess_dir, filename)
+            process_id: str = filename[:-5]
+            if process_id != self.process_id and \
+                    not is_process_alive(process_id):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path, encoding="utf-8") as file:
+                    processes.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return processes
+
+    # ------------------------------------------
+    # Exposition
+    #
+    def collect(self) -> dict[str, dict[str, Any]]:
+        """Get metrics merged over all processes."""
+        if not self.multiprocess_dir:
+            return self.dump()
+        merged: dict[str, dict[str, Any]] = {}
+        data: dict[str, Any]
+        for data in self.load_processes():
+            name: str
+            metric: dict[str, Any]
+            for name, metric in data.items():
+                target: dict[str, Any] = merged.setdefault(
+                    name, {**metric, "samples": {}}
+                )
+                key: list[str]
+                value: Any
+                for key, value in metric["samples"]:
+                    target["samples"][tuple(key)] = merge_values(
+                        target["samples"].get(tuple(key)), value
+                    )
+        for metric in merged.values():
+            metric["samples"] = [
+                [list(key), value]
+                for key, value in metric["samples"].items()
+            ]
+        return merged
+
+    def render(self) -> str:
+        """Get metrics in the Prometheus text format."""
+        lines: list[str] = []
+        name: str
+        metric: dict[str, Any]
+        for name, metric in sorted(self.collect().items()):
+            labelnames: tuple[str, ...] = tuple(metric["labelnames"])
+            lines.append(f"# HELP {name} {metric['documentation']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            key: list[str]
+            value: Any
+            for key, value in sorted(metric["samples"]):
+                key = tuple(key)
+                if metric["kind"] != "histogram":
+                    lines.append(
+                        f"{name}{format_labels(labelnames, key)} "
+                        f"{format_value(value)}"
+                    )
+                    continue
+                cumulative: int = 0
+                bound: float
+                count: int
+                for bound, count in zip(
+                    metric["buckets"] + [float("inf")],
+                    value["counts"] + [value["count"] - sum(value["counts"])]
+                ):
+                    cumulative += count
+                    bucket_labels: str = format_labels(
+                        labelnames + ("le",), key + (format_value(bound),)
+                    )
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                labels: str = format_labels(labelnames, key)
+                lines.append(
+                    f"{name}_sum{labels} {format_value(value['sum'])}"
+                )
+                lines.append(f"{name}_count{labels} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def get_process_start(pid: int) -> Optional[str]:
+    """Get start time of the process in clock ticks since boot (Linux)."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="utf-8") as file:
+            stat: str = file.read()
+    except OSError:
+        return None
+    # Fields after the parenthesized command; starttime is the 22nd
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def get_process_id(pid: int) -> str:
+    """Get '<pid>-<start>' identifying the process among reused pids."""
+    start: Optional[str] = get_process_start(pid)
+    if start is None:
+        start = f"t{int(time() * 1000)}"
+    return f"{pid}-{start}"
+
+
+def is_process_alive(process_id: str) -> bool:
+    """Get whether the process of the '<pid>-<start>' id is running."""
+    pid_part: str
+    start: str
+    pid_part, _, start = process_id.partition("-")
+    try:
+        pid: int = int(pid_part)
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    current_start: Optional[str] = get_process_start(pid)
+    # Without /proc a running pid is assumed to be the same process
+    return current_start is None or current_start == start
+
+
+def merge_values(current: Any, value: Any) -> Any:
+    """Sum values of the same sample from different processes."""
+    if current is None:
+        return value
+    if isinstance(value, dict):
+        return {
+            "counts": [a + b for a, b in zip(current["counts"],
+                                             value["counts"])],
+            "sum": current["sum"] + value["sum"],
+            "count": current["count"] + value["count"],
+        }
+    return current + value
+
+
+registry: MetricsRegistry = MetricsRegistry(
+    multiprocess_dir=settings.METRICS.get("MULTIPROCESS_DIR")
+)
+
+# ----------------------------------------------
+# HTTP
+#
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "Latency of HTTP requests by viewset action and status.",
+    ("view", "method", "status"),
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request.",
+    ("view",),
+    buckets=QUERY_BUCKETS,
+)
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL per HTTP request.",
+    ("view",),
+)
+
+# ----------------------------------------------
+# ASGI
+#
+asgi_http_in_flight = registry.gauge(
+    "asgi_http_in_flight",
+    "HTTP requests being served by the ASGI application.",
+    (),
+)
+asgi_rejected = registry.counter(
+    "asgi_rejected_total",
+    "Requests and sockets rejected over the concurrency limits.",
+    ("protocol",),
+)
+
+# ----------------------------------------------
+# Chats
+#
+websocket_connections = registry.gauge(
+    "websocket_connections",
+    "Open WebSocket connections by consumer.",
+    ("consumer",),
+)
+chat_messages = registry.counter(
+    "chat_messages_total",
+    "Chat messages received; rate() gives messages per second.",
+    ("consumer",),
+)
+channel_layer_send_duration = registry.histogram(
+    "channel_layer_send_duration_seconds",
+    "Latency of channel layer group_send calls.",
+    ("consumer",),
+)
+chat_ephemeral_events = registry.counter(
+    "chat_ephemeral_events_total",
+    "Presence and typing events by whether they were broadcast or coalesced.",
+    ("event", "outcome"),
+)
+chat_limit_hits = registry.counter(
+    "chat_limit_hits_total",
+    "Chat socket frames rejected or dropped by the limits.",
+    ("limit",),
+)
+
+# ----------------------------------------------
+# Database pool
+#
+db_pool_connections = registry.gauge(
+    "db_pool_connections",
+    "Pooled database connections of the process by state.",
+    ("alias", "state"),
+)
+db_pool_events = registry.counter(
+    "db_pool_events_total",
+    "Pooled connections created, recycled, failed and checkout timeouts.",
+    ("alias", "event"),
+)
+db_pool_checkout_duration = registry.histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to get a connection from the pool, including opening one.",
+    ("alias",),
+)
+db_replica_reads = registry.counter(
+    "db_replica_reads_total",
+    "Hinted reads sent to a replica or kept on the primary after a write.",
+    ("outcome",),
+)
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+from contextlib import ExitStack
+from contextvars import Token
+from random import random
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connections
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+)
+
+from abstracts.metrics import (
+    http_request_db_duration,
+    http_request_db_queries,
+    http_request_duration,
+)
+from abstracts.routers import (
+    RoutingState,
+    routing_state,
+    stick_to_primary,
+)
+from abstracts.timing import (
+    RequestTiming,
+    get_request_timing,
+)
+
+logger: logging.Logger = logging.getLogger("abstracts.timing")
+
+
+def get_view_name(view_func: Callable) -> str:
+    """Get 'ViewSet.action' name of the resolved view."""
+    view_class: Optional[type] = getattr(view_func, "cls", None) or \
+        getattr(view_func, "view_class", None)
+    if not view_class:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    actions: dict[str, str] = getattr(view_func, "actions", None) or {}
+    action: str = ",".join(sorted(set(actions.values())))
+    return f"{view_class.__name__}.{action}" if action \
+        else view_class.__name__
+
+
+class RequestTimingMiddleware:
+    """Record SQL count, DB, serializer and render time of requests.
+
+    Every request feeds the metrics histograms. Sampled requests also get
+    a Server-Timing header and a JSON log line; requests over the
+    configured budgets are logged as warnings.
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        # Serve async views without a thread, like MiddlewareMixin does
+        self._is_coroutine: Optional[object] = \
+            asyncio.coroutines._is_coroutine \
+            if asyncio.iscoroutinefunction(get_response) else None
+        config: dict[str, Any] = settings.REQUEST_TIMING
+        self.enabled: bool = config.get("ENABLED", True)
+        self.sample_rate: float = config.get("SAMPLE_RATE", 1.0)
+        self.server_timing: bool = config.get("SERVER_TIMING_HEADER", True)
+        self.query_budget: Optional[int] = config.get("QUERY_BUDGET")
+        self.time_budget_ms: Optional[float] = config.get("TIME_BUDGET_MS")
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self._is_coroutine:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        timing: RequestTiming = RequestTiming()
+        request.timing = timing
+        with ExitStack() as stack:
+            self.install_wrappers(stack=stack, timing=timing)
+            response: HttpResponse = self.get_response(request)
+        self.finish(request=request, response=response, timing=timing)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """Async version of __call__ used when the stack is async."""
+        if not self.enabled:
+            return await self.get_response(request)
+
+        timing: RequestTiming = RequestTiming()
+        request.timing = timing
+        # Connections are per thread, so the wrappers are installed in the
+        # thread-sensitive thread running the async ORM queries
+        stack: ExitStack = ExitStack()
+        await sync_to_async(self.install_wrappers)(stack=stack, timing=timing)
+        try:
+            response: HttpResponse = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.finish(request=request, response=response, timing=timing)
+        return response
+
+    def install_wrappers(
+        self,
+        stack: ExitStack,
+        timing: RequestTiming
+    ) -> None:
+        """Wrap query execution of all connections of the thread."""
+        alias: str
+        for alias in connections:
+            stack.enter_context(
+                connections[alias].execute_wrapper(timing.execute_wrapper)
+            )
+
+    def finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timing: RequestTiming
+    ) -> None:
+        self.observe(request=request, response=response, timing=timing)
+        if random() < self.sample_rate:
+            self.report(request=request, response=response, timing=timing)
+
+    def process_view(
+        self,
+        request: HttpRequest,
+        view_func: Callable,
+        view_args: tuple[Any],
+        view_kwargs: dict[str, Any]
+    ) -> None:
+        timing: Optional[RequestTiming] = get_request_timing(request)
+        if timing:
+            timing.view_name = get_view_name(view_func)
+
+    def process_template_response(
+        self,
+        request: HttpRequest,
+        response: HttpResponse
+    ) -> HttpResponse:
+        timing: Optional[RequestTiming] = get_request_timing(request)
+        if timing:
+            render_start: float = timing.total_time
+            response.add_post_render_callback(
+                lambda rendered: timing.add_stage(
+                    "render",
+                    timing.total_time - render_start
+                )
+            )
+        return response
+
+    def is_over_budget(self, timing: RequestTiming, total_ms: float) -> bool:
+        """Get whether the request exceeded query or time budget."""
+        return bool(
+            (self.query_budget and timing.queries > self.query_budget) or
+            (self.time_budget_ms and total_ms > self.time_budget_ms)
+        )
+
+    def observe(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timing: RequestTiming
+    ) -> None:
+        """Add the request to the metrics histograms."""
+        view: str = timing.view_name or "unresolved"
+        http_request_duration.observe(
+            timing.total_time,
+            view=view,
+            method=request.method,
+            status=response.status_code
+        )
+        http_request_db_queries.observe(timing.queries, view=view)
+        http_request_db_duration.observe(timing.db_time, view=view)
+
+    def report(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        timing: RequestTiming
+    ) -> None:
+        """Add Server-Timing header and write the log line."""
+        total_ms: float = timing.total_time * 1000
+        durations: dict[str, float] = {
+            "db": timing.db_time * 1000,
+            "serialize": timing.stages.get("serialize", 0.0) * 1000,
+            "render": timing.stages.get("render", 0.0) * 1000,
+            "total": total_ms,
+        }
+        if self.server_timing:
+            response["Server-Timing"] = ", ".join(
+                f"{name};dur={duration:.2f}"
+                for name, duration in durations.items()
+            ) + f', queries;desc="{timing.queries}"'
+
+        over_budget: bool = self.is_over_budget(timing, total_ms)
+        record: dict[str, Any] = {
+            "view": timing.view_name,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": timing.queries,
+            "over_budget": over_budget,
+        }
+        record.update({
+            f"{name}_ms": round(duration, 2)
+            for name, duration in durations.items()
+        })
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(record, ensure_ascii=False)
+        )
+
+
+class DatabaseRoutingMiddleware:
+    """Track writes of requests for ReplicaRouter.
+
+    Users whose request wrote to the database read from the primary for
+    DATABASE_ROUTING["STICKY_SECONDS"]. Must follow the authentication
+    middleware; DRF views set the authenticated user on the request too.
+    """
+
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+        self._is_coroutine: Optional[object] = \
+            asyncio.coroutines._is_coroutine \
+            if asyncio.iscoroutinefunction(get_response) else None
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self._is_coroutine:
+            return self.__acall__(request)
+        state: RoutingState = RoutingState()
+        token: Token = routing_state.set(state)
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            self.stick(request)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """Async version of __call__ used when the stack is async."""
+        state: RoutingState = RoutingState()
+        token: Token = routing_state.set(state)
+        try:
+            response: HttpResponse = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            # The lazy session user may query the database
+            await sync_to_async(self.stick)(request)
+        return response
+
+    def stick(self, request: HttpRequest) -> None:
+        user: Any = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            stick_to_primary(user_id=user.id)
@@ -1,9 +1,12 @@
 from typing import (
+    Any,
+    Dict,
     Optional,
     Tuple,
     Union,
 )
 
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.request import Request as DRF_Request
 from rest_framework.response import Response as DRF_Response
 from rest_framework.status import (
@@ -17,6 +20,7 @@ from django.db.models import (
 )
 
 from abstracts.models import AbstractDateTimeQuerySet
+from abstracts.routers import use_replica
 
 
 class ModelInstanceMixin:
@@ -88,3 +92,28 @@ class ModelInstanceMixin:
                 status=HTTP_404_NOT_FOUND
             ), False)
         return (obj, True)
+
+
+class ReplicaReadMixin:
+    """Read safe requests of replica_actions from a database replica.
+
+    Replicas lag behind the primary, so only actions that tolerate slightly
+    stale data belong here; users who just wrote still read the primary.
+    """
+
+    replica_actions: tuple[str, ...] = ("list", "retrieve")
+
+    def initial(
+        self,
+        request: DRF_Request,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> None:
+        # Authenticates, so the sticky user is known
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and \
+                self.action in self.replica_actions:
+            use_replica(
+                user_id=request.user.id
+                if request.user.is_authenticated else None
+            )
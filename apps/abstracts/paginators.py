@@ -2,8 +2,18 @@
 from typing import (
     Dict,
     Any,
+    Union,
 )
 
+from django.core.paginator import (
+    InvalidPage,
+    Paginator,
+)
+from django.db.models import QuerySet
+from django.http import HttpRequest
+
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request as DRF_Request
 from rest_framework.response import Response as DRF_Response
 from rest_framework.pagination import (
     PageNumberPagination,
@@ -34,6 +44,39 @@ class AbstractPageNumberPaginator(PageNumberPagination):
         )
         return response
 
+    async def apaginate_queryset(
+        self,
+        queryset: QuerySet,
+        request: Union[HttpRequest, DRF_Request]
+    ) -> list[Any]:
+        """Get objects of the requested page with the async ORM."""
+        if not isinstance(request, DRF_Request):
+            request = DRF_Request(request)
+        paginator: Paginator = self.django_paginator_class(
+            queryset,
+            self.get_page_size(request)
+        )
+        # Paginator would count the objects synchronously
+        paginator.count = await queryset.acount()
+        page_number: Union[int, str] = self.get_page_number(
+            request,
+            paginator
+        )
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number,
+                    message=str(exc)
+                )
+            )
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        self.request = request
+        return list(self.page)
+
     def get_dict_response(self, data: ReturnList) -> Dict[str, Any]:
         """Get paginated response as a Dictionay with filled data."""
         return {
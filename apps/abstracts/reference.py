@@ -0,0 +1,212 @@
+"""In-process registry of small reference tables.
+
+Tables of REFERENCE_DATA["TABLES"] (quiz types, subject states, statuses
+and subscriptions, classes) are loaded once per process into read-only
+maps by id and by natural key, so code resolves rows like
+QuizType.TOPIC instead of magic ids and serializers render nested rows
+without joins. Saving or deleting a row through the ORM bumps a version
+stamp in the REFERENCE_DATA["CACHE"] cache after commit; every process
+compares it with the version it loaded at most every CHECK_INTERVAL
+seconds and reloads when it changed, so the cache must be shared by the
+workers (abstracts.apps.check_shared_caches). Rows handed out are shared by
+all requests and must not be modified.
+"""
+from threading import RLock
+from time import monotonic
+from types import MappingProxyType
+from typing import (
+    Any,
+    Hashable,
+    Mapping,
+    Optional,
+)
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from rest_framework.serializers import Serializer
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import (
+    BaseCache,
+    caches,
+)
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
+
+
+class ReferenceTable:
+    """Rows of one table by id and by natural key."""
+
+    def __init__(self, key_field: str, rows: list[Model]) -> None:
+        self.key_field = key_field
+        self.by_id: Mapping[int, Model] = MappingProxyType(
+            {row.pk: row for row in rows}
+        )
+        self.by_key: Mapping[Hashable, Model] = MappingProxyType(
+            {getattr(row, key_field): row for row in rows}
+        )
+
+
+class ReferenceData:
+    """Reference tables of the process with version stamp invalidation."""
+
+    VERSION_KEY: str = "reference_data:version"
+
+    def __init__(
+        self,
+        tables: dict[str, str],
+        cache_alias: str,
+        check_interval: float
+    ) -> None:
+        # Natural key field by model label, e.g. "tests.QuizType": "name"
+        self.table_keys = tables
+        self.cache_alias = cache_alias
+        self.check_interval = check_interval
+        self.lock: RLock = RLock()
+        self.tables: Mapping[type[Model], ReferenceTable] = \
+            MappingProxyType({})
+        # Serialized rows by serializer class and id, dropped on reload
+        self.representations: dict[tuple[type, int], dict[str, Any]] = {}
+        self.version: Optional[str] = None
+        self.checked_at: float = 0.0
+
+    @property
+    def cache(self) -> BaseCache:
+        return caches[self.cache_alias]
+
+    def get_version(self) -> str:
+        """Get the shared version stamp, creating it when missing."""
+        version: Optional[str] = self.cache.get(self.VERSION_KEY)
+        if version is None:
+            self.cache.add(self.VERSION_KEY, uuid4().hex, None)
+            version = self.cache.get(self.VERSION_KEY)
+        return version
+
+    def rebuild(self) -> None:
+        """Load all tables from the database."""
+        # Read before the rows, so changes during the load reload again
+        version: str = self.get_version()
+        tables: dict[type[Model], ReferenceTable] = {}
+        label: str
+        key_field: str
+        for label, key_field in self.table_keys.items():
+            model: type[Model] = apps.get_model(label)
+            tables[model] = ReferenceTable(
+                key_field=key_field,
+                rows=list(model.objects.order_by("pk"))
+            )
+        with self.lock:
+            self.tables = MappingProxyType(tables)
+            self.representations = {}
+            self.version = version
+            self.checked_at = monotonic()
+
+    def is_due(self) -> bool:
+        return self.version is None or \
+            monotonic() - self.checked_at >= self.check_interval
+
+    def refresh(self) -> None:
+        """Reload the tables if another process changed them."""
+        if self.version is None or self.get_version() != self.version:
+            self.rebuild()
+        else:
+            self.checked_at = monotonic()
+
+    def ensure_loaded(self) -> None:
+        if self.is_due():
+            self.refresh()
+
+    async def aensure_loaded(self) -> None:
+        """Async version of ensure_loaded, loading in the sync thread."""
+        if self.is_due():
+            await sync_to_async(self.refresh)()
+
+    def invalidate(self) -> None:
+        """Reload the tables on the next access."""
+        self.version = None
+
+    def bump(self) -> None:
+        """Make all processes reload the tables."""
+        self.cache.set(self.VERSION_KEY, uuid4().hex, None)
+        self.invalidate()
+
+    def on_change(self, *args: Any, **kwargs: Any) -> None:
+        transaction.on_commit(self.bump)
+
+    def connect_signals(self) -> None:
+        label: str
+        for label in self.table_keys:
+            model: type[Model] = apps.get_model(label)
+            post_save.connect(
+                self.on_change,
+                sender=model,
+                dispatch_uid=f"reference_data.save.{label}"
+            )
+            post_delete.connect(
+                self.on_change,
+                sender=model,
+                dispatch_uid=f"reference_data.delete.{label}"
+            )
+
+    def get_table(self, model: type[Model]) -> ReferenceTable:
+        self.ensure_loaded()
+        return self.tables[model]
+
+    def get(self, model: type[Model], pk: Optional[int]) -> Optional[Model]:
+        """Get row by id, None for a null foreign key or a missing row."""
+        if pk is None:
+            return None
+        return self.get_table(model).by_id.get(pk)
+
+    def get_by_key(self, model: type[Model], key: Hashable) -> Model:
+        """Get row by its natural key."""
+        try:
+            return self.get_table(model).by_key[key]
+        except KeyError:
+            raise LookupError(
+                f"{model._meta.label} '{key}' не найден в справочниках"
+            ) from None
+
+    def get_id(self, model: type[Model], key: Hashable) -> int:
+        return self.get_by_key(model, key).pk
+
+    def get_data(
+        self,
+        serializer_class: type[Serializer],
+        pk: Optional[int]
+    ) -> Optional[dict[str, Any]]:
+        """Get a row serialized by the serializer, serializing it once."""
+        if pk is None:
+            return None
+        self.ensure_loaded()
+        with self.lock:
+            # Rows and their representations of the same load
+            tables: Mapping[type[Model], ReferenceTable] = self.tables
+            representations: dict[tuple[type, int], dict[str, Any]] = \
+                self.representations
+        data: Optional[dict[str, Any]] = representations.get(
+            (serializer_class, pk)
+        )
+        if data is None:
+            row: Optional[Model] = tables[
+                serializer_class.Meta.model
+            ].by_id.get(pk)
+            if row is None:
+                return None
+            data = representations[(serializer_class, pk)] = dict(
+                serializer_class(row).data
+            )
+        # Callers may change the response data
+        return dict(data)
+
+
+reference_data: ReferenceData = ReferenceData(
+    tables=settings.REFERENCE_DATA.get("TABLES", {}),
+    cache_alias=settings.REFERENCE_DATA.get("CACHE", "default"),
+    check_interval=settings.REFERENCE_DATA.get("CHECK_INTERVAL", 5)
+)
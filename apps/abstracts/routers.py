@@ -0,0 +1,111 @@
+"""Database router sending hinted reads to replicas of the primary.
+
+Reads go to the primary unless a view hints otherwise: ReplicaReadMixin
+sends safe methods of its replica_actions to a random alias of
+DATABASE_ROUTING["REPLICAS"]. Writes always go to the primary. The first
+write of a request sends the rest of its reads to the primary, and
+DatabaseRoutingMiddleware keeps reads of the writing user on the primary
+for STICKY_SECONDS, so users see their own changes despite replica lag.
+Sticky users are stored in the STICKY_CACHE cache, which must be shared by
+the workers (abstracts.apps.check_shared_caches fails startup otherwise).
+"""
+from contextvars import ContextVar
+from random import choice
+from typing import (
+    Any,
+    Optional,
+)
+
+from django.conf import settings
+from django.core.cache import (
+    BaseCache,
+    caches,
+)
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Model
+
+from abstracts.metrics import db_replica_reads
+
+REPLICAS: tuple[str, ...] = tuple(
+    settings.DATABASE_ROUTING.get("REPLICAS", ())
+)
+STICKY_SECONDS: float = settings.DATABASE_ROUTING.get("STICKY_SECONDS", 10)
+STICKY_CACHE: str = settings.DATABASE_ROUTING.get("STICKY_CACHE", "default")
+
+
+class RoutingState:
+    """Database for reads of the current request and whether it wrote."""
+
+    __slots__ = ("database", "wrote")
+
+    def __init__(self) -> None:
+        self.database: Optional[str] = None
+        self.wrote: bool = False
+
+
+# Set per request by DatabaseRoutingMiddleware; the object is shared with
+# the sync thread of the view, so marks made there are seen afterwards
+routing_state: ContextVar[Optional[RoutingState]] = ContextVar(
+    "routing_state",
+    default=None
+)
+
+
+def get_sticky_key(user_id: int) -> str:
+    return f"db_routing:sticky:{user_id}"
+
+
+def stick_to_primary(user_id: int) -> None:
+    """Send reads of the user to the primary for STICKY_SECONDS."""
+    cache: BaseCache = caches[STICKY_CACHE]
+    cache.set(get_sticky_key(user_id), True, STICKY_SECONDS)
+
+
+def use_replica(user_id: Optional[int] = None) -> Optional[str]:
+    """Send further reads of the request to a replica, return its alias.
+
+    Does nothing without replicas, outside a request, after a write of the
+    request or for users who wrote within STICKY_SECONDS.
+    """
+    state: Optional[RoutingState] = routing_state.get()
+    if not REPLICAS or state is None or state.wrote:
+        return None
+    if user_id is not None and \
+            caches[STICKY_CACHE].get(get_sticky_key(user_id)):
+        db_replica_reads.inc(outcome="sticky")
+        return None
+    state.database = choice(REPLICAS)
+    db_replica_reads.inc(outcome="replica")
+    return state.database
+
+
+class ReplicaRouter:
+    """Route hinted reads to replicas and everything else to the primary."""
+
+    def db_for_read(self, model: type[Model], **hints: Any) -> Optional[str]:
+        instance: Optional[Model] = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related objects are read where the instance was read
+            return instance._state.db
+        state: Optional[RoutingState] = routing_state.get()
+        return state.database if state is not None else None
+
+    def db_for_write(self, model: type[Model], **hints: Any) -> str:
+        state: Optional[RoutingState] = routing_state.get()
+        if state is not None:
+            state.wrote = True
+            state.database = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: Any) -> bool:
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(
+        self,
+        db: str,
+        app_label: str,
+        **hints: Any
+    ) -> bool:
+        # Replicas get the schema by replication
+        return db not in REPLICAS
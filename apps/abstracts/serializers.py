@@ -2,14 +2,18 @@ from typing import (
     Tuple,
     Dict,
     Any,
+    Optional,
 )
 
 from rest_framework.serializers import (
+    Field,
+    Serializer,
     SerializerMethodField,
     DateTimeField,
 )
 
 from abstracts.models import AbstractDateTime
+from abstracts.reference import reference_data
 
 
 class AbstractDateTimeSerializer:
@@ -31,3 +35,27 @@ class AbstractDateTimeSerializer:
     ) -> bool:
         """Get is_deleted field."""
         return True if obj.datetime_deleted else False
+
+
+class ReferenceField(Field):
+    """Nested row of a reference table rendered from reference_data.
+
+    Reads the <field>_id attribute, so querysets need no join for it.
+    """
+
+    def __init__(
+        self,
+        serializer_class: type[Serializer],
+        **kwargs: Dict[str, Any]
+    ) -> None:
+        self.serializer_class = serializer_class
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def bind(self, field_name: str, parent: Serializer) -> None:
+        if self.source is None:
+            self.source = f"{field_name}_id"
+        super().bind(field_name, parent)
+
+    def to_representation(self, value: int) -> Optional[Dict[str, Any]]:
+        return reference_data.get_data(self.serializer_class, value)
@@ -0,0 +1,261 @@
+"""Sampled log of slow SQL statements with their call sites and plans.
+
+The wrapper is installed on every new connection (see AbstractsConfig) and
+writes JSON lines into a rotating log file. The first time a fingerprint is
+logged by the process its plan is captured with EXPLAIN, without executing
+the statement again.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from logging.handlers import RotatingFileHandler
+from random import random
+from threading import (
+    Lock,
+    local,
+)
+from time import perf_counter
+from types import FrameType
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+from django.conf import settings
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+logger: logging.Logger = logging.getLogger("abstracts.slow_queries")
+
+STRING_RE: re.Pattern = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE: re.Pattern = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST_RE: re.Pattern = re.compile(
+    r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)"
+)
+SPACE_RE: re.Pattern = re.compile(r"\s+")
+EXPLAINABLE: tuple[str, ...] = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+CALL_SITE_KINDS: dict[str, str] = {
+    "views.py": "view",
+    "serializers.py": "serializer",
+    "signals.py": "signal",
+}
+APPS_DIR: str = os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))
+) + os.sep
+SKIPPED_FILES: tuple[str, ...] = (
+    os.path.abspath(__file__),
+    os.path.join(APPS_DIR, "abstracts", "middleware.py"),
+    os.path.join(APPS_DIR, "abstracts", "timing.py"),
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Get SQL with literals and parameter lists replaced by placeholders."""
+    sql = STRING_RE.sub("?", sql)
+    sql = NUMBER_RE.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = PLACEHOLDER_LIST_RE.sub("(...)", sql)
+    return SPACE_RE.sub(" ", sql).strip()
+
+
+def get_fingerprint(normalized_sql: str) -> str:
+    return hashlib.md5(normalized_sql.encode("utf-8")).hexdigest()[:16]
+
+
+def get_call_site() -> dict[str, str]:
+    """Get the innermost project frame that issued the statement.
+
+    Frames of views, serializers and signals modules are preferred over
+    the rest of the project code, e.g. models and managers.
+    """
+    fallback: Optional[FrameType] = None
+    frame: Optional[FrameType] = sys._getframe(1)
+    while frame:
+        filename: str = frame.f_code.co_filename
+        if filename.startswith(APPS_DIR) and filename not in SKIPPED_FILES:
+            if os.path.basename(filename) in CALL_SITE_KINDS:
+                return describe_frame(frame)
+            fallback = fallback or frame
+        frame = frame.f_back
+    return describe_frame(fallback) if fallback else {
+        "kind": "unknown",
+        "location": "",
+    }
+
+
+def describe_frame(frame: FrameType) -> dict[str, str]:
+    filename: str = frame.f_code.co_filename
+    owner: Any = frame.f_locals.get("self")
+    function: str = frame.f_code.co_name
+    if owner is not None:
+        function = f"{owner.__class__.__name__}.{function}"
+    return {
+        "kind": CALL_SITE_KINDS.get(os.path.basename(filename), "code"),
+        "location": "{}:{}:{}".format(
+            os.path.relpath(filename, APPS_DIR),
+            function,
+            frame.f_lineno
+        ),
+    }
+
+
+class SlowQueryLogger:
+    """connection.execute_wrapper logging statements over the threshold."""
+
+    def __init__(self, config: dict[str, Any]) -> None:
+        self.threshold: float = config.get("THRESHOLD_MS", 100) / 1000
+        self.sample_rate: float = config.get("SAMPLE_RATE", 1.0)
+        self.explain: bool = config.get("EXPLAIN", True)
+        self.log_file: str = os.path.join(
+            settings.BASE_DIR, config.get("LOG_FILE", "logs/slow_queries.log")
+        )
+        self.max_bytes: int = config.get("MAX_BYTES", 10 * 1024 * 1024)
+        self.backup_count: int = config.get("BACKUP_COUNT", 5)
+        self.explained: set[str] = set()
+        self.lock: Lock = Lock()
+        self.state: local = local()
+        self.handler: Optional[RotatingFileHandler] = None
+
+    def install(self, connection: BaseDatabaseWrapper, **kwargs: Any) -> None:
+        """Add the wrapper to the connection (connection_created receiver).
+
+        It goes first, as execute_wrapper() context managers pop the last one.
+        """
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, self)
+
+    def get_handler(self) -> RotatingFileHandler:
+        if self.handler is None:
+            with self.lock:
+                if self.handler is None:
+                    os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+                    handler: RotatingFileHandler = RotatingFileHandler(
+                        self.log_file,
+                        maxBytes=self.max_bytes,
+                        backupCount=self.backup_count,
+                        encoding="utf-8"
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    logger.addHandler(handler)
+                    logger.setLevel(logging.INFO)
+                    logger.propagate = False
+                    self.handler = handler
+        return self.handler
+
+    def __call__(
+        self,
+        execute: Callable,
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any]
+    ) -> Any:
+        if getattr(self.state, "active", False):
+            return execute(sql, params, many, context)
+        start: float = perf_counter()
+        result: Any = execute(sql, params, many, context)
+        duration: float = perf_counter() - start
+        if duration >= self.threshold and random() < self.sample_rate:
+            self.state.active = True
+            try:
+                self.record(
+                    sql=sql,
+                    params=params,
+                    many=many,
+                    duration=duration,
+                    connection=context["connection"]
+                )
+            except Exception:
+                logger.exception("Не удалось записать медленный запрос")
+            finally:
+                self.state.active = False
+        return result
+
+    def record(
+        self,
+        sql: str,
+        params: Any,
+        many: bool,
+        duration: float,
+        connection: BaseDatabaseWrapper
+    ) -> None:
+        normalized_sql: str = normalize_sql(sql)
+        fingerprint: str = get_fingerprint(normalized_sql)
+        entry: dict[str, Any] = {
+            "fingerprint": fingerprint,
+            "sql": normalized_sql,
+            "duration_ms": round(duration * 1000, 3),
+            "database": connection.alias,
+            "many": many,
+            **get_call_site(),
+        }
+        if self.explain and not many:
+            with self.lock:
+                first_time: bool = fingerprint not in self.explained
+                self.explained.add(fingerprint)
+            if first_time:
+                entry["plan"] = self.get_plan(connection, sql, params)
+        self.get_handler()
+        logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def get_plan(
+        self,
+        connection: BaseDatabaseWrapper,
+        sql: str,
+        params: Any
+    ) -> Optional[list[str]]:
+        """Get the plan of the statement without executing it."""
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        if connection.vendor == "postgresql":
+            explain_sql: str = f"EXPLAIN (ANALYZE off) {sql}"
+        elif connection.vendor == "sqlite":
+            explain_sql = f"EXPLAIN QUERY PLAN {sql}"
+        else:
+            return None
+        savepoint: Optional[str] = None
+        if connection.in_atomic_block:
+            savepoint = connection.savepoint()
+        try:
+            # Backend cursor bypasses Django's wrappers and keeps the
+            # results of the original statement intact
+            cursor: Any = connection.create_cursor()
+            try:
+                cursor.execute(explain_sql, params)
+                rows: list[tuple[Any, ...]] = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as exc:
+            if savepoint:
+                connection.savepoint_rollback(savepoint)
+            return [f"EXPLAIN failed: {exc}"]
+        if savepoint:
+            connection.savepoint_commit(savepoint)
+        return [" ".join(str(column) for column in row) for row in rows]
+
+
+slow_query_logger: SlowQueryLogger = SlowQueryLogger(settings.SLOW_QUERIES)
+
+
+def read_slow_queries(log_file: str) -> list[dict[str, Any]]:
+    """Get entries of the log file and its rotated backups."""
+    entries: list[dict[str, Any]] = []
+    directory: str = os.path.dirname(log_file) or "."
+    if not os.path.isdir(directory):
+        return entries
+    base_name: str = os.path.basename(log_file)
+    filename: str
+    for filename in sorted(os.listdir(directory)):
+        if filename != base_name and not filename.startswith(f"{base_name}."):
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as file:
+            line: str
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
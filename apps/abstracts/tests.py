@@ -1,3 +1,947 @@
-from django.test import TestCase
+import atexit
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+from threading import Thread
+from time import (
+    monotonic,
+    sleep,
+)
+from contextvars import Token
+from io import StringIO
+from typing import (
+    Any,
+    Iterator,
+)
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import ProtocolTypeRouter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.signals import request_finished
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connection,
+)
+from django.db.models import FileField
+from django.db.models.fields.files import FieldFile
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBase,
+    StreamingHttpResponse,
+)
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from abstracts.apps import check_shared_caches
+from abstracts.asgi import (
+    StreamingASGIHandler,
+    get_project_application,
+)
+from abstracts.benchmarks import (
+    BaselineComparator,
+    EndpointResult,
+    QueryCollector,
+    QueryStats,
+    RowCountingCursor,
+    get_percentile,
+)
+from abstracts.backends.pool import (
+    ConnectionPool,
+    PoolTimeout,
+)
+from abstracts.files import (
+    get_file_response,
+    parse_range,
+)
+from abstracts.metrics import (
+    Counter,
+    MetricsRegistry,
+    get_process_id,
+    http_request_db_queries,
+    is_process_alive,
+)
+from abstracts.middleware import RequestTimingMiddleware
+from abstracts.slow_queries import (
+    APPS_DIR,
+    SlowQueryLogger,
+    get_call_site,
+    logger as slow_queries_logger,
+    read_slow_queries,
+)
+from abstracts.routers import (
+    ReplicaRouter,
+    RoutingState,
+    get_sticky_key,
+    routing_state,
+    stick_to_primary,
+    use_replica,
+)
+from auths.models import CustomUser
+
+
+class GetPercentileTests(SimpleTestCase):
+    """get_percentile interpolation."""
+
+    def test_percentiles(self) -> None:
+        self.assertEqual(get_percentile([], 95), 0.0)
+        self.assertEqual(get_percentile([3.0], 95), 3.0)
+        self.assertEqual(get_percentile([4.0, 1.0, 3.0, 2.0], 50), 2.5)
+        self.assertAlmostEqual(
+            get_percentile([float(value) for value in range(101)], 95),
+            95.0
+        )
+
+
+class BaselineComparatorTests(SimpleTestCase):
+    """BaselineComparator tolerances of an endpoint."""
+
+    def setUp(self) -> None:
+        self.directory: TemporaryDirectory = TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "baselines.json")
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "tolerance": {"rows": 0.5},
+                    "endpoints": {
+                        "View.list": {
+                            "status": 200,
+                            "p50_ms": 5.0,
+                            "p95_ms": 20.0,
+                            "queries": 3,
+                            "rows": 10,
+                        },
+                    },
+                },
+                file
+            )
+        self.comparator: BaselineComparator = BaselineComparator(self.path)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def compare(self, check_latency: bool = True, **kwargs: Any) -> list[str]:
+        measured: dict[str, Any] = {
+            "name": "View.list",
+            "latencies": [0.02],
+            "queries": 3,
+            "rows": 10,
+            "status": 200,
+            **kwargs,
+        }
+        return self.comparator.compare(
+            EndpointResult(**measured),
+            check_latency=check_latency
+        )
+
+    def test_file_tolerance_overrides_defaults(self) -> None:
+        self.assertEqual(self.comparator.tolerance, {
+            **BaselineComparator.DEFAULT_TOLERANCE,
+            "rows": 0.5,
+        })
+
+    def test_result_within_tolerance(self) -> None:
+        self.assertEqual(self.compare(rows=15, latencies=[0.04]), [])
+
+    def test_extra_query_is_regression(self) -> None:
+        errors: list[str] = self.compare(queries=4)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("N+1", errors[0])
+
+    def test_rows_over_tolerance(self) -> None:
+        self.assertEqual(len(self.compare(rows=16)), 1)
+
+    def test_latency_over_tolerance(self) -> None:
+        # Twice the baseline p95 and 10 ms over it
+        self.assertEqual(len(self.compare(latencies=[0.041])), 1)
+        self.assertEqual(
+            self.compare(latencies=[0.041], check_latency=False),
+            []
+        )
+
+    def test_status_and_missing_baseline(self) -> None:
+        self.assertEqual(len(self.compare(status=500)), 1)
+        self.assertEqual(len(self.compare(name="View.retrieve")), 1)
+
+    def test_saved_results_are_baselines(self) -> None:
+        self.comparator.save([
+            EndpointResult(
+                name="View.retrieve",
+                latencies=[0.001],
+                queries=1,
+                rows=1,
+                status=200
+            ),
+        ])
+        comparator: BaselineComparator = BaselineComparator(self.path)
+        self.assertEqual(
+            sorted(comparator.baselines),
+            ["View.list", "View.retrieve"]
+        )
+        self.assertEqual(comparator.tolerance["rows"], 0.5)
+
+
+class StandInCursor:
+    """Cursor of RowCountingCursor tests returning fixed rows."""
+
+    def __init__(self, rows: list[tuple[int]]) -> None:
+        self.rows = rows
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        pass
+
+    def fetchone(self) -> Any:
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size: int) -> list[tuple[int]]:
+        rows: list[tuple[int]] = self.rows[:size]
+        del self.rows[:size]
+        return rows
+
+    def fetchall(self) -> list[tuple[int]]:
+        rows: list[tuple[int]] = self.rows
+        self.rows = []
+        return rows
+
+
+class RowCountingCursorTests(SimpleTestCase):
+    """Statements and rows counted by RowCountingCursor."""
+
+    def test_rows_of_every_fetch_method(self) -> None:
+        stats: QueryStats = QueryStats()
+        cursor: RowCountingCursor = RowCountingCursor(
+            StandInCursor([(number,) for number in range(6)]),
+            stats
+        )
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.fetchmany(2)
+        cursor.fetchall()
+        cursor.fetchone()
+        self.assertEqual(stats.queries, 1)
+        self.assertEqual(stats.rows, 6)
+        stats.reset()
+        self.assertEqual((stats.queries, stats.rows, stats.db_time), (0, 0, 0))
+
+
+class QueryCollectorTests(TestCase):
+    """QueryCollector over the ORM."""
+
+    def test_queries_and_rows(self) -> None:
+        CustomUser.objects.bulk_create(
+            CustomUser(
+                email=f"user{number}@test.local",
+                first_name="Тест",
+                last_name="Тестов"
+            )
+            for number in range(3)
+        )
+        with QueryCollector() as stats:
+            users: list[CustomUser] = list(CustomUser.objects.all())
+            CustomUser.objects.filter(email="user0@test.local").exists()
+        self.assertEqual(len(users), 3)
+        self.assertEqual(stats.queries, 2)
+        self.assertEqual(stats.rows, 4)
+        self.assertGreater(stats.db_time, 0)
+        # The connection gets its own cursors back
+        self.assertNotIn("make_cursor", vars(connection))
+        CustomUser.objects.count()
+        self.assertEqual(stats.queries, 2)
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Sampling of RequestTimingMiddleware reports on both paths."""
+
+    def get_response(self, request: HttpRequest) -> HttpResponse:
+        CustomUser.objects.count()
+        return HttpResponse()
+
+    async def aget_response(self, request: HttpRequest) -> HttpResponse:
+        await CustomUser.objects.acount()
+        return HttpResponse()
+
+    def get_middleware(
+        self,
+        sample_rate: float,
+        get_response: Any
+    ) -> RequestTimingMiddleware:
+        with override_settings(REQUEST_TIMING={
+            "SAMPLE_RATE": sample_rate,
+            "SERVER_TIMING_HEADER": True,
+        }):
+            return RequestTimingMiddleware(get_response)
+
+    def get_observed(self) -> tuple[int, float]:
+        """Get count and sum of observed queries of unresolved views."""
+        sample: dict[str, Any] = http_request_db_queries.values.get(
+            ("unresolved",),
+            {"count": 0, "sum": 0.0}
+        )
+        return sample["count"], sample["sum"]
+
+    def assert_observed(self, before: tuple[int, float]) -> None:
+        self.assertEqual(
+            self.get_observed(),
+            (before[0] + 1, before[1] + 1)
+        )
+
+    def test_sampled_request_is_reported(self) -> None:
+        before: tuple[int, float] = self.get_observed()
+        with self.assertLogs("abstracts.timing") as logs:
+            response: HttpResponse = self.get_middleware(
+                1.0,
+                self.get_response
+            )(RequestFactory().get("/"))
+        self.assertIn('queries;desc="1"', response["Server-Timing"])
+        self.assertEqual(json.loads(logs.records[0].msg)["queries"], 1)
+        self.assert_observed(before)
+
+    def test_skipped_request_is_only_observed(self) -> None:
+        before: tuple[int, float] = self.get_observed()
+        with self.assertNoLogs("abstracts.timing"):
+            response: HttpResponse = self.get_middleware(
+                0.0,
+                self.get_response
+            )(RequestFactory().get("/"))
+        self.assertNotIn("Server-Timing", response)
+        self.assert_observed(before)
+
+    def test_sampling_follows_rate(self) -> None:
+        middleware: RequestTimingMiddleware = self.get_middleware(
+            0.5,
+            self.get_response
+        )
+        draw: float
+        sampled: bool
+        for draw, sampled in ((0.3, True), (0.7, False)):
+            with patch("abstracts.middleware.random", return_value=draw), \
+                    self.assertLogs("abstracts.timing") as logs:
+                response: HttpResponse = middleware(RequestFactory().get("/"))
+                # assertLogs needs a record of the skipped request too
+                logging.getLogger("abstracts.timing").info("done")
+            self.assertEqual("Server-Timing" in response, sampled)
+            self.assertEqual(len(logs.records), 2 if sampled else 1)
+
+    async def test_async_sampled_request_is_reported(self) -> None:
+        before: tuple[int, float] = self.get_observed()
+        with self.assertLogs("abstracts.timing"):
+            response: HttpResponse = await self.get_middleware(
+                1.0,
+                self.aget_response
+            )(RequestFactory().get("/"))
+        self.assertIn('queries;desc="1"', response["Server-Timing"])
+        self.assert_observed(before)
+
+    async def test_async_skipped_request_is_only_observed(self) -> None:
+        before: tuple[int, float] = self.get_observed()
+        with self.assertNoLogs("abstracts.timing"):
+            response: HttpResponse = await self.get_middleware(
+                0.0,
+                self.aget_response
+            )(RequestFactory().get("/"))
+        self.assertNotIn("Server-Timing", response)
+        self.assert_observed(before)
+
+
+class SlowQueryLoggerTests(TestCase):
+    """Slow statements logged by SlowQueryLogger and their report."""
+
+    def setUp(self) -> None:
+        self.directory: TemporaryDirectory = TemporaryDirectory()
+        self.log_file: str = os.path.join(self.directory.name, "slow.log")
+        self.propagate: bool = slow_queries_logger.propagate
+        self.level: int = slow_queries_logger.level
+        CustomUser.objects.bulk_create(
+            CustomUser(
+                email=f"user{number}@test.local",
+                first_name="Тест",
+                last_name="Тестов"
+            )
+            for number in range(2)
+        )
+
+    def tearDown(self) -> None:
+        handler: Any
+        for handler in list(slow_queries_logger.handlers):
+            slow_queries_logger.removeHandler(handler)
+            handler.close()
+        slow_queries_logger.propagate = self.propagate
+        slow_queries_logger.setLevel(self.level)
+        self.directory.cleanup()
+
+    def get_logger(self, threshold_ms: float) -> SlowQueryLogger:
+        return SlowQueryLogger({
+            "THRESHOLD_MS": threshold_ms,
+            "LOG_FILE": self.log_file,
+        })
+
+    def run_queries(self, slow_query_logger: SlowQueryLogger) -> None:
+        with connection.execute_wrapper(slow_query_logger):
+            CustomUser.objects.filter(email="user0@test.local").exists()
+            CustomUser.objects.filter(email="user1@test.local").exists()
+            CustomUser.objects.count()
+
+    def record_call_site(self) -> dict[str, str]:
+        return get_call_site()
+
+    def test_fast_statements_are_skipped(self) -> None:
+        self.run_queries(self.get_logger(threshold_ms=60_000))
+        self.assertEqual(read_slow_queries(self.log_file), [])
+
+    def test_plan_is_captured_once_per_fingerprint(self) -> None:
+        self.run_queries(self.get_logger(threshold_ms=0))
+        entries: list[dict[str, Any]] = read_slow_queries(self.log_file)
+        self.assertEqual(len(entries), 3)
+        # Both filters differ only in the literal
+        self.assertEqual(entries[0]["fingerprint"], entries[1]["fingerprint"])
+        self.assertEqual(
+            ["plan" in entry for entry in entries],
+            [True, False, True]
+        )
+        self.assertTrue(entries[0]["plan"])
+        self.assertEqual(entries[0]["kind"], "code")
+        self.assertTrue(
+            entries[0]["location"].startswith(
+                "abstracts/tests.py:SlowQueryLoggerTests.run_queries:"
+            )
+        )
+
+    def test_view_frame_is_preferred(self) -> None:
+        namespace: dict[str, Any] = {"test": self}
+        # Code of a views module calling a helper of this module
+        exec(
+            compile(
+                "site = test.record_call_site()",
+                os.path.join(APPS_DIR, "chats", "views.py"),
+                "exec"
+            ),
+            namespace
+        )
+        self.assertEqual(namespace["site"]["kind"], "view")
+        self.assertTrue(
+            namespace["site"]["location"].startswith("chats/views.py:")
+        )
+        self.assertEqual(self.record_call_site()["kind"], "code")
+
+    def test_report_aggregates_fingerprints(self) -> None:
+        entries: list[dict[str, Any]] = [
+            {
+                "fingerprint": fingerprint,
+                "sql": f"SELECT {fingerprint}",
+                "duration_ms": duration,
+                "kind": "view",
+                "location": location,
+            }
+            for fingerprint, duration, location in (
+                ("a", 120.0, "chats/views.py:list:1"),
+                ("a", 300.0, "chats/views.py:list:1"),
+                ("a", 180.0, "tests/views.py:create:2"),
+                ("b", 500.0, "auths/views.py:login:3"),
+            )
+        ]
+        with open(self.log_file, "w", encoding="utf-8") as file:
+            file.writelines(json.dumps(entry) + "\n" for entry in entries)
+        out: StringIO = StringIO()
+        call_command(
+            "slow_queries_report",
+            log_file=self.log_file,
+            order_by="count",
+            stdout=out
+        )
+        lines: list[str] = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "Записей: 4, сортировка: count")
+        self.assertEqual(
+            lines[1],
+            "a всего=600.0мс вызовов=3 среднее=200.0мс макс=300.0мс"
+        )
+        self.assertEqual(lines[3], "      2 × view chats/views.py:list:1")
+        self.assertEqual(lines[4], "      1 × view tests/views.py:create:2")
+        self.assertIn("b всего=500.0мс вызовов=1", out.getvalue())
+
+
+class StreamingASGIHandlerTests(SimpleTestCase):
+    """Streaming responses sent by StreamingASGIHandler."""
+
+    def setUp(self) -> None:
+        self.finished: list[Any] = []
+        self.closed: list[bool] = []
+        request_finished.disconnect(close_old_connections)
+        request_finished.connect(self.on_finished)
+
+    def tearDown(self) -> None:
+        request_finished.disconnect(self.on_finished)
+        request_finished.connect(close_old_connections)
+
+    def on_finished(self, **kwargs: Any) -> None:
+        self.finished.append(kwargs["sender"])
+
+    def get_parts(self) -> Iterator[bytes]:
+        try:
+            yield b"first"
+            yield b"second"
+        finally:
+            self.closed.append(True)
+
+    async def test_streamed_response_fires_request_finished(self) -> None:
+        sent: list[dict[str, Any]] = []
+
+        async def send(message: dict[str, Any]) -> None:
+            sent.append(message)
+
+        await StreamingASGIHandler().send_response(
+            StreamingHttpResponse(self.get_parts()),
+            send
+        )
+        self.assertEqual(len(self.finished), 1)
+        self.assertEqual(self.closed, [True])
+        self.assertEqual(
+            b"".join(message.get("body", b"") for message in sent[1:]),
+            b"firstsecond"
+        )
+
+    async def test_disconnected_client_closes_response(self) -> None:
+        async def send(message: dict[str, Any]) -> None:
+            if message["type"] == "http.response.body":
+                raise OSError("client disconnected")
+
+        with self.assertRaises(OSError):
+            await StreamingASGIHandler().send_response(
+                StreamingHttpResponse(self.get_parts()),
+                send
+            )
+        self.assertEqual(len(self.finished), 1)
+        self.assertEqual(self.closed, [True])
+
+
+class StandInCache:
+    """In-memory cache counting its rebuilds."""
+
+    def __init__(self) -> None:
+        self.rebuilds: int = 0
+
+    def rebuild(self) -> None:
+        self.rebuilds += 1
+
+
+stand_in_cache: StandInCache = StandInCache()
+
+
+class WarmupTests(SimpleTestCase):
+    """Caches warmed up with and without lifespan events."""
+
+    def setUp(self) -> None:
+        stand_in_cache.rebuilds = 0
+
+    def get_application(self, lifespan: bool) -> ProtocolTypeRouter:
+        with override_settings(ASGI={
+            **settings.ASGI,
+            "LIFESPAN": lifespan,
+            "WARMUP_CACHES": ("abstracts.tests.stand_in_cache",),
+        }):
+            return get_project_application(http_application=HttpResponse)
+
+    @async_to_sync
+    async def run_lifespan(
+        self,
+        application: ProtocolTypeRouter
+    ) -> dict[str, Any]:
+        communicator: ApplicationCommunicator = ApplicationCommunicator(
+            application,
+            {"type": "lifespan"}
+        )
+        await communicator.send_input({"type": "lifespan.startup"})
+        started: dict[str, Any] = await communicator.receive_output()
+        await communicator.send_input({"type": "lifespan.shutdown"})
+        await communicator.receive_output()
+        return started
+
+    def test_warmed_up_on_build_without_lifespan(self) -> None:
+        with self.assertLogs("abstracts.asgi", logging.INFO):
+            application: ProtocolTypeRouter = self.get_application(False)
+        self.assertEqual(stand_in_cache.rebuilds, 1)
+        self.assertEqual(
+            self.run_lifespan(application)["type"],
+            "lifespan.startup.complete"
+        )
+        self.assertEqual(stand_in_cache.rebuilds, 1)
+
+    def test_warmed_up_on_lifespan_startup(self) -> None:
+        application: ProtocolTypeRouter = self.get_application(True)
+        self.assertEqual(stand_in_cache.rebuilds, 0)
+        with self.assertLogs("abstracts.asgi", logging.INFO):
+            started: dict[str, Any] = self.run_lifespan(application)
+        self.assertEqual(started["type"], "lifespan.startup.complete")
+        self.assertEqual(stand_in_cache.rebuilds, 1)
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Multiprocess mode of MetricsRegistry."""
+
+    def setUp(self) -> None:
+        self.directory: TemporaryDirectory = TemporaryDirectory()
+        self.registry: MetricsRegistry = MetricsRegistry(
+            multiprocess_dir=self.directory.name,
+            flush_interval=0.01
+        )
+
+    def tearDown(self) -> None:
+        self.registry.stop_flusher()
+        atexit.unregister(self.registry.close)
+        self.directory.cleanup()
+
+    def read_flushed(self, name: str, expected: Any) -> Any:
+        """Get the flushed value of the metric once it is the expected one.
+
+        Waits up to a second for the flusher.
+        """
+        path: str = self.registry.get_path(self.registry.process_id)
+        deadline: float = monotonic() + 1
+        value: Any = None
+        while value != expected and monotonic() < deadline:
+            sleep(0.01)
+            try:
+                with open(path, encoding="utf-8") as file:
+                    value = json.load(file)[name]["samples"][0][1]
+            except (OSError, ValueError, KeyError, IndexError):
+                pass
+        return value
+
+    def test_idle_process_flushes_last_update(self) -> None:
+        counter: Counter = self.registry.counter("events", "Events.")
+        counter.inc()
+        counter.inc()
+        # No update follows, the flusher writes the values anyway
+        self.assertEqual(self.read_flushed("events", 2), 2)
+
+    def test_file_is_keyed_by_process_start(self) -> None:
+        self.assertEqual(
+            self.registry.process_id,
+            get_process_id(os.getpid())
+        )
+        self.registry.flush()
+        self.assertEqual(
+            os.listdir(self.directory.name),
+            [f"{self.registry.process_id}.json"]
+        )
+
+    def test_closed_process_removes_file(self) -> None:
+        self.registry.flush()
+        self.registry.close()
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_dead_process_is_not_merged(self) -> None:
+        counter: Counter = self.registry.counter("events", "Events.")
+        counter.inc()
+        dead_path: str = self.registry.get_path(f"{os.getpid()}-0")
+        with open(dead_path, "w", encoding="utf-8") as file:
+            json.dump(self.registry.dump(), file)
+        self.assertEqual(
+            self.registry.collect()["events"]["samples"],
+            [[[], 1]]
+        )
+        self.assertFalse(os.path.exists(dead_path))
+
+    def test_reused_pid_is_not_alive(self) -> None:
+        self.assertTrue(is_process_alive(get_process_id(os.getpid())))
+        self.assertFalse(is_process_alive(f"{os.getpid()}-0"))
+
+
+class StandInConnection:
+    """Connection of ConnectionPool tests."""
+
+    def __init__(self) -> None:
+        self.closed: bool = False
+        self.healthy: bool = True
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """ConnectionPool with stand-in connections."""
+
+    def get_pool(self, **kwargs: Any) -> ConnectionPool:
+        self.opened: list[StandInConnection] = []
+
+        def connect() -> StandInConnection:
+            connection: StandInConnection = StandInConnection()
+            self.opened.append(connection)
+            return connection
+
+        return ConnectionPool(**{
+            "alias": "test",
+            "connect": connect,
+            "check": lambda connection: connection.healthy,
+            "reset": lambda connection: not connection.closed,
+            "max_size": 2,
+            "max_lifetime": 60,
+            "health_check_interval": 60,
+            "timeout": 0.05,
+            **kwargs,
+        })
+
+    def test_released_connection_is_reused(self) -> None:
+        pool: ConnectionPool = self.get_pool()
+        connection: StandInConnection = pool.acquire()
+        pool.release(connection)
+        self.assertIs(pool.acquire(), connection)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_acquire_times_out_at_max_size(self) -> None:
+        pool: ConnectionPool = self.get_pool()
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(len(self.opened), 2)
+
+    def test_release_wakes_waiting_acquire(self) -> None:
+        pool: ConnectionPool = self.get_pool(max_size=1, timeout=5)
+        connection: StandInConnection = pool.acquire()
+        acquired: list[StandInConnection] = []
+        waiter: Thread = Thread(
+            target=lambda: acquired.append(pool.acquire())
+        )
+        waiter.start()
+        sleep(0.05)
+        pool.release(connection)
+        waiter.join(timeout=5)
+        self.assertEqual(acquired, [connection])
+
+    def test_old_connection_is_recycled(self) -> None:
+        pool: ConnectionPool = self.get_pool(max_lifetime=0)
+        connection: StandInConnection = pool.acquire()
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.get_stats()["idle"], 0)
+
+    def test_failed_health_check_replaces_connection(self) -> None:
+        pool: ConnectionPool = self.get_pool(health_check_interval=0)
+        connection: StandInConnection = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+        replacement: StandInConnection = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["in_use"], 1)
+
+    def test_failed_reset_discards_connection(self) -> None:
+        pool: ConnectionPool = self.get_pool()
+        connection: StandInConnection = pool.acquire()
+        connection.closed = True
+        pool.release(connection)
+        self.assertEqual(pool.get_stats(), {
+            "idle": 0,
+            "in_use": 0,
+            "max_size": 2,
+        })
+
+    def test_unknown_connection_is_closed(self) -> None:
+        pool: ConnectionPool = self.get_pool()
+        pool.release(pool.acquire())
+        foreign: StandInConnection = StandInConnection()
+        pool.release(foreign)
+        self.assertTrue(foreign.closed)
+        self.assertEqual(pool.get_stats()["idle"], 1)
+
+
+LOCAL_CACHES: dict[str, dict[str, str]] = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+SHARED_CACHES: dict[str, dict[str, str]] = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://127.0.0.1:6379/1",
+    },
+}
+
+
+class CheckSharedCachesTests(SimpleTestCase):
+    """check_shared_caches in development and in production."""
+
+    @override_settings(DEBUG=True, CACHES=LOCAL_CACHES)
+    def test_local_cache_in_development(self) -> None:
+        check_shared_caches()
+
+    @override_settings(DEBUG=False, CACHES=LOCAL_CACHES)
+    def test_local_cache_in_production(self) -> None:
+        with self.assertRaisesMessage(
+            ImproperlyConfigured,
+            'REFERENCE_DATA["CACHE"]'
+        ):
+            check_shared_caches()
+
+    @override_settings(
+        DEBUG=False,
+        CACHES={
+            **SHARED_CACHES,
+            "sticky": {
+                "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+            },
+        },
+        DATABASE_ROUTING={"STICKY_CACHE": "sticky"}
+    )
+    def test_dummy_sticky_cache_in_production(self) -> None:
+        with self.assertRaisesMessage(
+            ImproperlyConfigured,
+            'DATABASE_ROUTING["STICKY_CACHE"]'
+        ):
+            check_shared_caches()
+
+    @override_settings(DEBUG=False, CACHES=SHARED_CACHES)
+    def test_shared_cache_in_production(self) -> None:
+        check_shared_caches()
+
+
+class ParseRangeTests(SimpleTestCase):
+    """parse_range of single byte ranges of a 100 byte file."""
+
+    def test_ranges(self) -> None:
+        header: str
+        expected: tuple[int, int]
+        for header, expected in (
+            ("bytes=0-9", (0, 9)),
+            ("bytes=90-", (90, 99)),
+            ("bytes=-10", (90, 99)),
+            ("bytes=-500", (0, 99)),
+            ("bytes=50-500", (50, 99)),
+            (" bytes=5-5 ", (5, 5)),
+        ):
+            self.assertEqual(parse_range(header, 100), expected, header)
+
+    def test_unsatisfiable_ranges(self) -> None:
+        header: str
+        for header in ("bytes=100-", "bytes=200-300", "bytes=-0"):
+            self.assertEqual(parse_range(header, 100), (100, 100), header)
+
+    def test_ignored_ranges(self) -> None:
+        header: str
+        for header in (
+            "bytes=-",
+            "bytes=9-0",
+            "bytes=0-9,20-29",
+            "items=0-9",
+            "bytes=a-b",
+        ):
+            self.assertIsNone(parse_range(header, 100), header)
+
+
+@override_settings(FILE_DOWNLOADS={"CHUNK_SIZE": 4, "OFFLOAD": None})
+class GetFileResponseTests(SimpleTestCase):
+    """Range requests of get_file_response with If-Range."""
+
+    def setUp(self) -> None:
+        self.directory: TemporaryDirectory = TemporaryDirectory()
+        storage: FileSystemStorage = FileSystemStorage(
+            location=self.directory.name
+        )
+        storage.save("file.txt", ContentFile(b"0123456789"))
+        self.file: FieldFile = FieldFile(
+            instance=None,
+            field=FileField(storage=storage),
+            name="file.txt"
+        )
+
+    def tearDown(self) -> None:
+        self.file.close()
+        self.directory.cleanup()
+
+    def get(self, **headers: str) -> HttpResponseBase:
+        return get_file_response(
+            RequestFactory().get("/", **headers),
+            self.file
+        )
+
+    def get_etag(self) -> str:
+        return self.get()["ETag"]
+
+    def test_range_is_partial(self) -> None:
+        response: HttpResponseBase = self.get(HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+
+    def test_unread_range_leaves_file_closed(self) -> None:
+        response: HttpResponseBase = self.get(HTTP_RANGE="bytes=2-5")
+        # The client went away before the first chunk
+        response.close()
+        self.assertTrue(self.file.closed)
+
+    def test_matching_if_range_is_partial(self) -> None:
+        response: HttpResponseBase = self.get(
+            HTTP_RANGE="bytes=-3",
+            HTTP_IF_RANGE=self.get_etag()
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+    def test_stale_if_range_is_full(self) -> None:
+        response: HttpResponseBase = self.get(
+            HTTP_RANGE="bytes=-3",
+            HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            b"0123456789"
+        )
+
+    def test_unsatisfiable_range(self) -> None:
+        response: HttpResponseBase = self.get(HTTP_RANGE="bytes=10-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+
+@patch("abstracts.routers.REPLICAS", ("replica",))
+class ReplicaRouterTests(SimpleTestCase):
+    """Reads of a request routed by ReplicaRouter."""
+
+    def setUp(self) -> None:
+        self.router: ReplicaRouter = ReplicaRouter()
+        self.token: Token = routing_state.set(RoutingState())
+
+    def tearDown(self) -> None:
+        routing_state.reset(self.token)
+        cache.delete(get_sticky_key(1))
+
+    def test_hinted_reads_go_to_replica(self) -> None:
+        self.assertIsNone(self.router.db_for_read(CustomUser))
+        self.assertEqual(use_replica(user_id=1), "replica")
+        self.assertEqual(self.router.db_for_read(CustomUser), "replica")
+
+    def test_write_sends_reads_to_primary(self) -> None:
+        use_replica(user_id=1)
+        self.assertEqual(
+            self.router.db_for_write(CustomUser),
+            DEFAULT_DB_ALIAS
+        )
+        self.assertIsNone(self.router.db_for_read(CustomUser))
+        self.assertIsNone(use_replica(user_id=1))
+
+    def test_writer_sticks_to_primary(self) -> None:
+        stick_to_primary(user_id=1)
+        self.assertIsNone(use_replica(user_id=1))
+        self.assertIsNone(self.router.db_for_read(CustomUser))
+        self.assertEqual(use_replica(user_id=2), "replica")
+
+    def test_reads_outside_request_stay_on_primary(self) -> None:
+        routing_state.reset(self.token)
+        self.token = routing_state.set(None)
+        self.assertIsNone(use_replica(user_id=1))
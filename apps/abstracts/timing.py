@@ -0,0 +1,63 @@
+"""Per-request timing data shared by middleware and response handlers."""
+from contextlib import contextmanager
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Optional,
+)
+
+
+class RequestTiming:
+    """Query count and stage durations of a single request."""
+
+    def __init__(self) -> None:
+        self.started: float = perf_counter()
+        self.view_name: str = ""
+        self.queries: int = 0
+        self.db_time: float = 0.0
+        self.stages: dict[str, float] = {}
+
+    @property
+    def total_time(self) -> float:
+        return perf_counter() - self.started
+
+    def add_stage(self, name: str, duration: float) -> None:
+        """Add duration to the stage."""
+        self.stages[name] = self.stages.get(name, 0.0) + duration
+
+    def execute_wrapper(
+        self,
+        execute: Callable,
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any]
+    ) -> Any:
+        """Count and time statements (connection.execute_wrapper)."""
+        start: float = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += perf_counter() - start
+
+
+def get_request_timing(request: Any) -> Optional[RequestTiming]:
+    """Get timing of the sampled request (Django or DRF request)."""
+    return getattr(request, "timing", None)
+
+
+@contextmanager
+def track_stage(request: Any, name: str) -> Iterator[None]:
+    """Measure the block as the named stage of the request."""
+    timing: Optional[RequestTiming] = get_request_timing(request)
+    if not timing:
+        yield
+        return
+    start: float = perf_counter()
+    try:
+        yield
+    finally:
+        timing.add_stage(name, perf_counter() - start)
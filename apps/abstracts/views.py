@@ -1,3 +1,31 @@
-from django.shortcuts import render
+from typing import (
+    Any,
+    Optional,
+)
 
-# Create your views here.
+from django.conf import settings
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotFound,
+)
+from django.views.decorators.http import require_GET
+
+from abstracts.metrics import registry
+
+
+@require_GET
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Expose metrics in the Prometheus text format."""
+    config: dict[str, Any] = settings.METRICS
+    if not config.get("ENABLED", True):
+        return HttpResponseNotFound()
+    allowed_ips: Optional[list[str]] = config.get("ALLOWED_IPS")
+    if allowed_ips is not None and \
+            request.META.get("REMOTE_ADDR") not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
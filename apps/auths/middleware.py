@@ -0,0 +1,66 @@
+from typing import (
+    Any,
+    Optional,
+)
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    InvalidToken,
+    TokenError,
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.base_user import AbstractBaseUser
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Set scope user of sockets from a JWT access token.
+
+    Browsers can not set headers of sockets, so the token is taken from the
+    ``token`` query parameter or else from the Authorization header.
+    Sockets without a valid token get AnonymousUser.
+    """
+
+    authentication: JWTAuthentication = JWTAuthentication()
+
+    def get_raw_token(self, scope: dict[str, Any]) -> Optional[bytes]:
+        tokens: list[str] = parse_qs(
+            scope.get("query_string", b"").decode()
+        ).get("token", [])
+        if tokens:
+            return tokens[0].encode()
+        header: bytes
+        value: bytes
+        for header, value in scope.get("headers", ()):
+            if header == b"authorization":
+                return self.authentication.get_raw_token(value)
+        return None
+
+    async def get_user(
+        self,
+        raw_token: bytes
+    ) -> Optional[AbstractBaseUser]:
+        """Get active non-deleted user of the token."""
+        try:
+            user_id: Any = self.authentication.get_validated_token(
+                raw_token
+            )[jwt_settings.USER_ID_CLAIM]
+        except (InvalidToken, TokenError, KeyError):
+            return None
+        return await get_user_model().objects.filter(
+            **{jwt_settings.USER_ID_FIELD: user_id},
+            is_active=True,
+            datetime_deleted__isnull=True
+        ).afirst()
+
+    async def __call__(self, scope: dict[str, Any], receive, send) -> Any:
+        scope = dict(scope)
+        raw_token: Optional[bytes] = self.get_raw_token(scope)
+        user: Optional[AbstractBaseUser] = await self.get_user(raw_token) \
+            if raw_token else None
+        scope["user"] = user or AnonymousUser()
+        return await self.inner(scope, receive, send)
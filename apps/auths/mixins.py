@@ -13,8 +13,6 @@ class EmailObjectMixin:
             obj = CustomUser.objects.select_related(
                 "student",
                 "teacher",
-                "teacher__subscription",
-                "teacher__status_subscription",
             ).get(email=email)
             return obj
         except CustomUser.DoesNotExist:
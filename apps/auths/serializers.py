@@ -1,4 +1,7 @@
-from typing import Union
+from typing import (
+    Optional,
+    Union,
+)
 from datetime import datetime
 import pytz
 from dateutil.relativedelta import relativedelta
@@ -13,11 +16,13 @@ from rest_framework.serializers import (
 )
 
 from auths.models import CustomUser
+from abstracts.reference import reference_data
 from abstracts.serializers import AbstractDateTimeSerializer
 from subjectss.serializers import StudentForeignSerializer
 from teaching.serializers import TeacherForeignModelSerializer
 from subjectss.models import Student
 from teaching.models import Teacher
+from subscriptions.models import Subscription
 
 
 class CustomUserSerializer(
@@ -248,11 +253,15 @@ class TeacherListModelSerializer(TeacherForeignModelSerializer):
 
     def get_is_expired_subscription(self, obj: Teacher) -> bool:
         """Get if the subscription is expired or not."""
-        if not obj.subscription or not obj.datetime_created:
+        subscription: Optional[Subscription] = reference_data.get(
+            Subscription,
+            obj.subscription_id
+        )
+        if not subscription or not obj.datetime_created:
             return None
         cur_datetime: datetime = datetime.now(tz=utc)
         expired_datetime: datetime = (obj.datetime_created + relativedelta(
-            months=obj.subscription.duration
+            months=subscription.duration
         ))
         # expired_datetime = expired_datetime.replace(tzinfo=utc)
 
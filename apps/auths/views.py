@@ -115,8 +115,6 @@ class CustomUserViewSet(
             ).select_related(
                 "student",
                 "teacher",
-                "teacher__subscription",
-                "teacher__status_subscription",
             ),
             is_deleted=is_deleted
         )
@@ -260,7 +258,7 @@ class CustomUserViewSet(
             )
 
         deleted_objs: int = 0
-        deleted_objs = CustomUser.objects.get_not_deleted.filter(
+        deleted_objs = CustomUser.objects.get_not_deleted().filter(
             id__in=user_ids
         ).update(
             datetime_deleted=datetime.now()
@@ -402,9 +400,7 @@ class CustomUserViewSet(
         teachers: QuerySet[CustomUser] = self.get_queryset(
             is_deleted=is_deleted
         ).filter(teacher__isnull=False).select_related(
-            "teacher",
-            "teacher__subscription",
-            "teacher__status_subscription"
+            "teacher"
         )
 
         return self.get_drf_response(
@@ -13,6 +13,7 @@ from django.core.handlers.wsgi import WSGIRequest
 from abstracts.admin import AbstractAdminIsDeleted
 from abstracts.filters import DeletedStateFilter
 from chats.models import (
+    ArchivedMessage,
     Message,
     PersonalChat,
 )
@@ -111,3 +112,34 @@ class PersonalChatAdmin(AbstractAdminIsDeleted, ModelAdmin):
         if obj:
             return self.readonly_fields + ("student", "teacher",)
         return self.readonly_fields
+
+
+@register(ArchivedMessage)
+class ArchivedMessageAdmin(AbstractAdminIsDeleted, ModelAdmin):
+    date_hierarchy: str = "datetime_created"
+    list_display: tuple[str] = (
+        "id",
+        "get_content",
+        "owner",
+        "to_chat",
+        "get_is_deleted_obj",
+    )
+    list_display_links: tuple[str] = ("id", "get_content",)
+    search_fields: tuple[str] = (
+        "content",
+        "owner__email",
+    )
+    list_per_page: int = 15
+
+    def has_add_permission(self, request: WSGIRequest) -> bool:
+        return False
+
+    def has_change_permission(
+        self,
+        request: WSGIRequest,
+        obj: Optional[ArchivedMessage] = None
+    ) -> bool:
+        return False
+
+    def get_content(self, obj: Optional[ArchivedMessage] = None) -> str:
+        return f"{obj.content[:50]}..."
@@ -0,0 +1,62 @@
+"""Flow control of frames sent to a socket by the ASGI server.
+
+ASGI sends have no flow control under daphne: every frame is handed to the
+Twisted transport at once, so frames of a client that stopped reading pile
+up in the transport's write buffer and the consumer's queue never fills.
+Twisted pauses a push producer registered on the transport while the buffer
+is over its bufferSize (64 KiB) and resumes it when the buffer is drained;
+ServerBackpressure is such a producer, so the writer of the socket can wait
+for it. Servers whose send waits for the buffer by itself need no producer.
+"""
+import asyncio
+from typing import (
+    Any,
+    Callable,
+    Optional,
+)
+
+
+class ServerBackpressure:
+    """Push producer of a daphne socket, writable while the buffer drains."""
+
+    def __init__(self, protocol: Any) -> None:
+        self.protocol = protocol
+        self.writable: asyncio.Event = asyncio.Event()
+        self.writable.set()
+
+    @classmethod
+    def register(cls, send: Callable) -> Optional["ServerBackpressure"]:
+        """Register on the socket behind the ASGI send of daphne.
+
+        Daphne passes partial(server.handle_reply, protocol) as send; other
+        servers get None.
+        """
+        protocol: Any = next(iter(getattr(send, "args", ())), None)
+        if not hasattr(protocol, "registerProducer"):
+            return None
+        backpressure: ServerBackpressure = cls(protocol)
+        try:
+            protocol.registerProducer(backpressure, True)
+        except RuntimeError:
+            # Another producer is registered on the transport
+            return None
+        return backpressure
+
+    def unregister(self) -> None:
+        self.writable.set()
+        if getattr(self.protocol, "transport", None) is not None:
+            self.protocol.unregisterProducer()
+
+    async def wait(self) -> None:
+        """Wait until the server's write buffer is drained."""
+        await self.writable.wait()
+
+    def pauseProducing(self) -> None:
+        self.writable.clear()
+
+    def resumeProducing(self) -> None:
+        self.writable.set()
+
+    def stopProducing(self) -> None:
+        # Connection lost, the consumer is disconnected anyway
+        self.writable.set()
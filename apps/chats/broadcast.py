@@ -0,0 +1,142 @@
+"""Chats of a teacher with the students of a class subject.
+
+Missing chats are created with one INSERT ... SELECT ignoring the existing
+student-teacher pairs, and an announcement to the chats is one bulk insert
+of messages. Their chat_message events are sent to the chat groups after
+commit in batches of CHAT_BROADCAST["BATCH_SIZE"]; DatabaseChannelLayer
+publishes a batch as one broadcast instead of one per chat.
+"""
+from functools import partial
+from typing import Any
+
+from asgiref.sync import async_to_sync
+from channels.layers import (
+    BaseChannelLayer,
+    get_channel_layer,
+)
+
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from abstracts.metrics import (
+    channel_layer_send_duration,
+    chat_messages,
+)
+from chats.consumers import (
+    get_chat_group_name,
+    group_send_many,
+)
+from chats.models import (
+    Message,
+    PersonalChat,
+)
+from subjectss.models import StudentRegisteredSubjects
+
+BATCH_SIZE: int = settings.CHAT_BROADCAST.get("BATCH_SIZE", 500)
+MAX_CONTENT_LENGTH: int = settings.CHAT_LIMITS.get(
+    "MAX_CONTENT_LENGTH",
+    4000
+)
+
+
+def get_cohort_registrations(
+    class_subject_id: int
+) -> QuerySet[StudentRegisteredSubjects]:
+    """Get registrations of active students for the class subject."""
+    return StudentRegisteredSubjects.objects.filter(
+        class_subject_id=class_subject_id,
+        student__user__is_active=True,
+        student__user__datetime_deleted__isnull=True
+    )
+
+
+def provision_chats(teacher_id: int, class_subject_id: int) -> int:
+    """Create chats of the teacher with the cohort, get new chats count.
+
+    Existing chats, including ones created by a concurrent request, are
+    skipped by the unique student-teacher constraint and not counted.
+    """
+    cohort_sql: str
+    cohort_params: tuple[Any, ...]
+    cohort_sql, cohort_params = get_cohort_registrations(
+        class_subject_id
+    ).values("student_id").query.sql_with_params()
+    now: Any = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        # SQLite needs the WHERE clause to parse ON CONFLICT after SELECT
+        cursor.execute(
+            f"INSERT INTO {PersonalChat._meta.db_table} "
+            f"(student_id, teacher_id, archived_messages_count, "
+            f"datetime_created, datetime_updated) "
+            f"SELECT DISTINCT c.student_id, %s, 0, %s, %s "
+            f"FROM ({cohort_sql}) c WHERE c.student_id IS NOT NULL "
+            f"ON CONFLICT (student_id, teacher_id) DO NOTHING",
+            [teacher_id, now, now, *cohort_params]
+        )
+        return cursor.rowcount
+
+
+def get_cohort_chats(
+    teacher_id: int,
+    class_subject_id: int
+) -> QuerySet[PersonalChat]:
+    """Get non deleted chats of the teacher with the cohort."""
+    return PersonalChat.objects.get_not_deleted().filter(
+        teacher_id=teacher_id,
+        student_id__in=get_cohort_registrations(
+            class_subject_id
+        ).values("student_id")
+    )
+
+
+async def send_chat_events(
+    events: list[tuple[str, dict[str, Any]]]
+) -> None:
+    """Send events to the chat groups in batches."""
+    channel_layer: BaseChannelLayer = get_channel_layer()
+    if channel_layer is None:
+        return
+    start: int
+    for start in range(0, len(events), BATCH_SIZE):
+        batch: list[tuple[str, dict[str, Any]]] = \
+            events[start:start + BATCH_SIZE]
+        with channel_layer_send_duration.time(consumer="broadcast"):
+            await group_send_many(channel_layer, batch)
+
+
+def broadcast_message(
+    owner_id: int,
+    chat_ids: list[int],
+    content: str
+) -> list[Message]:
+    """Add the message to every chat and send it to the chat sockets."""
+    messages: list[Message] = Message.objects.bulk_create(
+        [
+            Message(content=content, owner_id=owner_id, to_chat_id=chat_id)
+            for chat_id in chat_ids
+        ],
+        batch_size=BATCH_SIZE
+    )
+    chat_messages.inc(len(messages), consumer="broadcast")
+    events: list[tuple[str, dict[str, Any]]] = [
+        (
+            get_chat_group_name(message.to_chat_id),
+            {
+                'type': 'chat_message',
+                'message_id': message.id,
+                'content': content,
+                'chat_id': message.to_chat_id,
+                'user_id': owner_id,
+                'user': None,
+            },
+        )
+        for message in messages
+    ]
+    # Sockets must not get messages of a rolled back request
+    transaction.on_commit(partial(async_to_sync(send_chat_events), events))
+    return messages
@@ -1,4 +1,6 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from typing import (
     Optional,
@@ -6,84 +8,290 @@ from typing import (
     Any,
 )
 
+from django.conf import settings
+from django.db.models import (
+    Q,
+    QuerySet,
+)
+
+from abstracts.metrics import (
+    channel_layer_send_duration,
+    chat_ephemeral_events,
+    chat_limit_hits,
+    chat_messages,
+    websocket_connections,
+)
+from chats.backpressure import ServerBackpressure
+from chats.limits import (
+    TokenBucket,
+    user_message_buckets,
+)
 from chats.models import (
     Message,
     PersonalChat,
 )
+from chats.presence import chat_presence
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
-    """ChatConsumer."""
+# Close code of sockets whose client does not read its frames
+SLOW_CLIENT_CLOSE_CODE = 4008
 
-    async def connect(
+
+def get_chat_group_name(chat_id: int) -> str:
+    return f'chat_{chat_id}'
+
+
+async def group_send_many(
+    channel_layer: Any,
+    messages: list[tuple[str, dict[str, Any]]]
+) -> None:
+    """Send messages to their groups, in one broadcast if the layer can."""
+    if hasattr(channel_layer, "group_send_many"):
+        await channel_layer.group_send_many(messages)
+    else:
+        await asyncio.gather(*(
+            channel_layer.group_send(group, message)
+            for group, message in messages
+        ))
+
+
+class BaseChatConsumer(AsyncWebsocketConsumer):
+    """Limits, outgoing queue and chat events shared by chat sockets.
+
+    Outgoing frames go through a bounded queue drained by a writer task,
+    so a client reading slowly does not block delivery to the consumer.
+    The writer waits while the server's write buffer of the socket is full,
+    so the queue holds the frames the client has not read. Over
+    CHAT_LIMITS["MAX_OUTBOUND_FRAMES"] queued frames the socket is closed
+    or, with CHAT_LIMITS["SLOW_CLIENT"] = "drop", new frames are dropped.
+    """
+
+    outbox: Optional[asyncio.Queue] = None
+    writer: Optional[asyncio.Task] = None
+    backpressure: Optional[ServerBackpressure] = None
+    frame_bucket: Optional[TokenBucket] = None
+    # Ids of messages sent by the sync, their live events are skipped
+    synced_ids: frozenset[int] = frozenset()
+
+    def get_chat_group_name(self, chat_id: int) -> str:
+        return get_chat_group_name(chat_id)
+
+    def start_limits(self) -> None:
+        """Start the writer and the frame bucket of an accepted socket."""
+        self.start_writer()
+        self.frame_bucket = TokenBucket(
+            rate=settings.CHAT_LIMITS.get("CONNECTION_RATE", 10),
+            burst=settings.CHAT_LIMITS.get("CONNECTION_BURST", 20)
+        )
+
+    def start_writer(self) -> None:
+        self.outbox = asyncio.Queue(
+            maxsize=settings.CHAT_LIMITS.get("MAX_OUTBOUND_FRAMES", 100)
+        )
+        self.backpressure = ServerBackpressure.register(self.base_send)
+        self.writer = asyncio.create_task(self.write_outbox())
+
+    def stop_writer(self) -> None:
+        self.outbox = None
+        if self.writer:
+            self.writer.cancel()
+            self.writer = None
+        if self.backpressure:
+            self.backpressure.unregister()
+            self.backpressure = None
+
+    async def write_outbox(self) -> None:
+        """Send queued frames to the client in order."""
+        outbox: asyncio.Queue = self.outbox
+        backpressure: Optional[ServerBackpressure] = self.backpressure
+        while True:
+            text_data, bytes_data = await outbox.get()
+            await super().send(text_data=text_data, bytes_data=bytes_data)
+            if backpressure:
+                await backpressure.wait()
+
+    async def send(
         self,
-        *args: tuple[Any],
-        **kwargs: dict[Any, Any]
+        text_data: Optional[str] = None,
+        bytes_data: Optional[bytes] = None,
+        close: bool = False
     ) -> None:
-        """Get in touch with chat."""
-        print("You are connected")
-        self.chat_id = self.scope['url_route']['kwargs']['chat_id']
+        """Queue a frame for the writer."""
+        if self.outbox is None or close:
+            await super().send(
+                text_data=text_data,
+                bytes_data=bytes_data,
+                close=close
+            )
+            return
+        if self.outbox.full():
+            chat_limit_hits.inc(limit="outbound_queue")
+            if settings.CHAT_LIMITS.get("SLOW_CLIENT", "close") == "close":
+                self.stop_writer()
+                await self.close(code=SLOW_CLIENT_CLOSE_CODE)
+            return
+        self.outbox.put_nowait((text_data, bytes_data))
 
-        self.chat: Optional[PersonalChat] = None
+    async def send_error(
+        self,
+        limit: str,
+        code: str,
+        message: str,
+        retry_after: float = 0.0
+    ) -> None:
+        """Report a rejected frame to the client."""
+        chat_limit_hits.inc(limit=limit)
+        frame: Dict[str, Any] = {
+            'type': 'error',
+            'code': code,
+            'message': message,
+        }
+        if retry_after:
+            frame['retry_after'] = round(retry_after, 3)
+        await self.send(text_data=json.dumps(frame))
+
+    async def parse_frame(
+        self,
+        text_data: Optional[str],
+        bytes_data: Optional[bytes]
+    ) -> Optional[Dict[str, Any]]:
+        """Get data of a frame within the limits or report the limit."""
+        if len((text_data or "").encode()) + len(bytes_data or b"") > \
+                settings.CHAT_LIMITS.get("MAX_FRAME_BYTES", 16384):
+            await self.send_error(
+                limit="frame_size",
+                code="frame_too_large",
+                message="Слишком большой кадр"
+            )
+            return None
+        retry_after: float = self.frame_bucket.consume()
+        if retry_after:
+            await self.send_error(
+                limit="connection_rate",
+                code="rate_limited",
+                message="Слишком много кадров, повторите позже",
+                retry_after=retry_after
+            )
+            return None
         try:
-            self.chat = await PersonalChat.objects.aget(id=self.chat_id)
-        except Exception:
-            self.chat = None
+            data: Optional[Dict[str, Any]] = json.loads(s=text_data or "")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            await self.send_error(
+                limit="invalid_frame",
+                code="invalid_frame",
+                message="Некорректный кадр"
+            )
+            return None
+        return data
 
-        if self.chat:
-            self.chat_group_name = f'chat_{self.chat_id}'
+    def get_presence_event(
+        self,
+        chat_id: int,
+        online: bool
+    ) -> tuple[str, Dict[str, Any]]:
+        """Get group and event with presence of the user in the chat."""
+        chat_ephemeral_events.inc(event="presence", outcome="broadcast")
+        return (
+            self.get_chat_group_name(chat_id),
+            {
+                'type': 'member_presence',
+                'chat_id': chat_id,
+                'user_id': self.scope["user"].id,
+                'online': online,
+                'sender_channel': self.channel_name,
+            },
+        )
 
-            await self.channel_layer.group_add(
-                self.chat_group_name,
-                self.channel_name
-            )
+    async def send_presence(self, chat_id: int, online: bool) -> None:
+        """Broadcast presence of the user to other sockets of the chat."""
+        await self.channel_layer.group_send(
+            *self.get_presence_event(chat_id=chat_id, online=online)
+        )
 
-            await self.accept()
-            await self.send(text_data=json.dumps({
-                'type': 'connection_established',
-                'message': 'You are now connected!'
-            }))
+    async def join_presence(self, chat_id: int) -> None:
+        """Register the socket as a member of the chat and broadcast it."""
+        chat_presence.connect(chat_id, self.scope["user"].id)
+        await self.send_presence(chat_id=chat_id, online=True)
 
-    # async def disconnect(
-    #     self,
-    #     code: int,
-    #     *args: tuple[Any],
-    #     **kwargs: dict[Any, Any]
-    # ) -> None:
-    #     """Disconnect."""
-    #     if self.chat_group_name:
-    #         await self.channel_layer.group_discard(
-    #             self.chat_group_name,
-    #             self.channel_name
-    #         )
-    #     else:
-    #         return await super().disconnect(code)
+    async def leave_presence(self, chat_id: int) -> None:
+        """Unregister the socket, broadcast if the member went offline."""
+        if chat_presence.disconnect(chat_id, self.scope["user"].id):
+            await self.send_presence(chat_id=chat_id, online=False)
 
-    async def receive(
+    async def receive_heartbeat(self, chat_id: int) -> None:
+        """Refresh presence, broadcasting it at most once per interval."""
+        if chat_presence.heartbeat(chat_id, self.scope["user"].id):
+            await self.send_presence(chat_id=chat_id, online=True)
+        else:
+            chat_ephemeral_events.inc(event="presence", outcome="coalesced")
+
+    async def receive_typing(self, chat_id: int) -> None:
+        """Broadcast typing of the user at most once per interval."""
+        if not chat_presence.allow_typing(chat_id, self.scope["user"].id):
+            chat_ephemeral_events.inc(event="typing", outcome="coalesced")
+            return
+        chat_ephemeral_events.inc(event="typing", outcome="broadcast")
+        await self.channel_layer.group_send(
+            self.get_chat_group_name(chat_id),
+            {
+                'type': 'member_typing',
+                'chat_id': chat_id,
+                'user_id': self.scope["user"].id,
+                'sender_channel': self.channel_name,
+            }
+        )
+
+    async def receive_message(
         self,
-        text_data=None,
-        bytes_data=None,
-        *args: tuple[Any],
-        **kwargs: dict[Any, Any]
+        chat_id: int,
+        content: Any,
+        user: Optional[Any]
     ) -> None:
-        """receive."""
-        data: Dict[str, Any] = json.loads(s=text_data)
-        content: Optional[str] = data.get('content', None)
-        chat_id: Optional[int] = data.get('chat_id', None)
-        user_id: Optional[int] = data.get('user_id', None)
-        user: Optional[Any] = data.get('user', None)
-
-        if content and user_id and chat_id and self.chat:
-            await self.save_message(
-                chat_id=chat_id,
-                user_id=user_id,
-                content=content
+        """Save a message of the user and send it to the chat group."""
+        # Sender comes from the authenticated connection,
+        # not from the payload
+        user_id: int = self.scope["user"].id
+        if not isinstance(content, str):
+            await self.send_error(
+                limit="invalid_frame",
+                code="invalid_frame",
+                message="Некорректный кадр"
             )
+            return
+        if len(content) > \
+                settings.CHAT_LIMITS.get("MAX_CONTENT_LENGTH", 4000):
+            await self.send_error(
+                limit="content_size",
+                code="content_too_large",
+                message="Сообщение слишком длинное"
+            )
+            return
+        retry_after: float = user_message_buckets.consume(user_id)
+        if retry_after:
+            await self.send_error(
+                limit="user_rate",
+                code="rate_limited",
+                message="Слишком много сообщений, повторите позже",
+                retry_after=retry_after
+            )
+            return
+        chat_messages.inc(consumer=self.__class__.__name__)
+        message: Message = await self.save_message(
+            chat_id=chat_id,
+            user_id=user_id,
+            content=content
+        )
 
+        with channel_layer_send_duration.time(
+            consumer=self.__class__.__name__
+        ):
             await self.channel_layer.group_send(
-                self.chat_group_name,
+                self.get_chat_group_name(chat_id),
                 {
                     'type': 'chat_message',
+                    'message_id': message.id,
                     'content': content,
                     'chat_id': chat_id,
                     'user_id': user_id,
@@ -93,6 +301,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event) -> None:
         """chat_message."""
+        message_id: Optional[int] = event.get('message_id')
+        if message_id in self.synced_ids:
+            return
         content: str = event['content']
         chat_id: int = event['chat_id']
         user_id: int = event['user_id']
@@ -100,6 +311,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         await self.send(text_data=json.dumps(
             {
+                'id': message_id,
                 'content': content,
                 'chat': chat_id,
                 'user_id': user_id,
@@ -108,15 +320,400 @@ class ChatConsumer(AsyncWebsocketConsumer):
             }
         ))
 
+    async def member_presence(self, event) -> None:
+        """member_presence."""
+        # Own events were applied on send, a late echo must not undo a leave
+        if event['sender_channel'] == self.channel_name:
+            return
+        chat_presence.apply(
+            event['chat_id'],
+            event['user_id'],
+            event['online']
+        )
+        await self.send(text_data=json.dumps(
+            {
+                'type': 'presence',
+                'chat': event['chat_id'],
+                'user_id': event['user_id'],
+                'online': event['online'],
+            }
+        ))
+
+    async def member_typing(self, event) -> None:
+        """member_typing."""
+        if event['sender_channel'] == self.channel_name:
+            return
+        await self.send(text_data=json.dumps(
+            {
+                'type': 'typing',
+                'chat': event['chat_id'],
+                'user_id': event['user_id'],
+            }
+        ))
+
     async def save_message(
         self,
         chat_id: int,
         user_id: int,
         content: str
-    ) -> Any:
+    ) -> Message:
         """Save message in db."""
         return await Message.objects.acreate(
             content=content,
             to_chat_id=chat_id,
             owner_id=user_id
         )
+
+
+class ChatConsumer(BaseChatConsumer):
+    """ChatConsumer.
+
+    A reconnecting client passes the ``last_seen_message_id`` query
+    parameter and gets the missed messages in ``sync`` frames before live
+    ones. The socket joins the chat group before the missed messages are
+    read, so messages saved meanwhile arrive live and the ones already
+    synced are skipped.
+    """
+
+    async def connect(
+        self,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """Get in touch with chat."""
+        self.chat_id = self.scope['url_route']['kwargs']['chat_id']
+
+        self.chat: Optional[PersonalChat] = None
+        user: Optional[Any] = self.scope.get("user")
+        if user and user.is_authenticated:
+            try:
+                self.chat = await PersonalChat.objects.select_related(
+                    "student",
+                    "teacher"
+                ).aget(id=self.chat_id)
+            except Exception:
+                self.chat = None
+        if self.chat and not self.is_chat_member(user):
+            self.chat = None
+
+        if not self.chat:
+            await self.close()
+        else:
+            self.chat_group_name = self.get_chat_group_name(self.chat_id)
+
+            await self.channel_layer.group_add(
+                self.chat_group_name,
+                self.channel_name
+            )
+
+            await self.accept()
+            self.start_limits()
+            websocket_connections.inc(consumer=self.__class__.__name__)
+            chat_presence.connect(self.chat.id, user.id)
+            await self.send(text_data=json.dumps({
+                'type': 'connection_established',
+                'message': 'You are now connected!',
+                'online': chat_presence.get_online(self.chat.id),
+            }))
+            await self.send_presence(chat_id=self.chat.id, online=True)
+            await self.sync_missed_messages()
+
+    def is_chat_member(self, user: Any) -> bool:
+        """Return true if the user is in the chat."""
+        return bool(
+            self.chat.student.user_id == user.id or
+            self.chat.teacher.user_id == user.id or
+            user.is_superuser
+        )
+
+    async def disconnect(
+        self,
+        code: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """Disconnect."""
+        self.stop_writer()
+        if getattr(self, "chat", None):
+            websocket_connections.dec(consumer=self.__class__.__name__)
+            await self.leave_presence(chat_id=self.chat.id)
+            await self.channel_layer.group_discard(
+                self.chat_group_name,
+                self.channel_name
+            )
+
+    def get_last_seen_message_id(self) -> Optional[int]:
+        values: list[str] = parse_qs(
+            self.scope.get("query_string", b"").decode()
+        ).get("last_seen_message_id", [])
+        if not values:
+            return None
+        try:
+            return max(int(values[0]), 0)
+        except ValueError:
+            return None
+
+    async def sync_missed_messages(self) -> None:
+        """Send messages after the last seen one in bounded batches."""
+        cursor: Optional[int] = self.get_last_seen_message_id()
+        if cursor is None:
+            return
+        batch_size: int = settings.CHAT_SYNC.get("BATCH_SIZE", 100)
+        max_messages: int = settings.CHAT_SYNC.get("MAX_MESSAGES", 1000)
+        synced: set[int] = set()
+        truncated: bool = False
+        while True:
+            if len(synced) >= max_messages:
+                truncated = True
+                break
+            batch: list[Dict[str, Any]] = [
+                message async for message in Message.objects.filter(
+                    to_chat_id=self.chat.id,
+                    id__gt=cursor,
+                    datetime_deleted__isnull=True
+                ).order_by("id").values(
+                    "id",
+                    "content",
+                    "owner_id",
+                    "datetime_created"
+                )[:min(batch_size, max_messages - len(synced))]
+            ]
+            if not batch:
+                break
+            cursor = batch[-1]["id"]
+            synced.update(message["id"] for message in batch)
+            await self.send(text_data=json.dumps(
+                {
+                    'type': 'sync',
+                    'chat': self.chat.id,
+                    'messages': [
+                        {
+                            'id': message["id"],
+                            'content': message["content"],
+                            'user_id': message["owner_id"],
+                            'datetime_created':
+                                message["datetime_created"].isoformat(),
+                        }
+                        for message in batch
+                    ],
+                }
+            ))
+        self.synced_ids = frozenset(synced)
+        await self.send(text_data=json.dumps(
+            {
+                'type': 'sync_complete',
+                'chat': self.chat.id,
+                'last_message_id': cursor,
+                'truncated': truncated,
+            }
+        ))
+
+    async def receive(
+        self,
+        text_data=None,
+        bytes_data=None,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """receive."""
+        if not self.chat:
+            return
+        data: Optional[Dict[str, Any]] = await self.parse_frame(
+            text_data=text_data,
+            bytes_data=bytes_data
+        )
+        if data is None:
+            return
+        if data.get('type') == 'heartbeat':
+            await self.receive_heartbeat(chat_id=self.chat.id)
+            return
+        if data.get('type') == 'typing':
+            await self.receive_typing(chat_id=self.chat.id)
+            return
+        content: Optional[str] = data.get('content', None)
+        if content:
+            await self.receive_message(
+                chat_id=self.chat.id,
+                content=content,
+                user=data.get('user', None)
+            )
+
+
+class UserChatsConsumer(BaseChatConsumer):
+    """One socket of a user for all of their chats.
+
+    The socket joins the groups of the user's chats, so events of every
+    chat arrive tagged with the ``chat`` id. Clients send
+    ``subscribe``/``unsubscribe`` frames with a ``chat`` id to change the
+    set, and messages, heartbeats and typing with the ``chat`` id of one
+    of the subscribed chats. The user is present in every subscribed chat
+    like with a ChatConsumer socket of each.
+    """
+
+    chat_ids: set[int] = set()
+
+    def get_user_chats(self, user: Any) -> QuerySet[PersonalChat]:
+        return PersonalChat.objects.get_not_deleted().filter(
+            Q(student__user=user) | Q(teacher__user=user)
+        )
+
+    async def connect(
+        self,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """Subscribe to the most recent chats of the user."""
+        user: Optional[Any] = self.scope.get("user")
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+        self.chat_ids = set()
+        chat_id: int
+        async for chat_id in self.get_user_chats(user).order_by(
+            "-datetime_updated"
+        ).values_list("id", flat=True)[
+            :settings.CHAT_LIMITS.get("MAX_SUBSCRIPTIONS", 500)
+        ]:
+            await self.channel_layer.group_add(
+                self.get_chat_group_name(chat_id),
+                self.channel_name
+            )
+            self.chat_ids.add(chat_id)
+
+        await self.accept()
+        self.start_limits()
+        websocket_connections.inc(consumer=self.__class__.__name__)
+        for chat_id in self.chat_ids:
+            chat_presence.connect(chat_id, user.id)
+        await self.send(text_data=json.dumps({
+            'type': 'connection_established',
+            'message': 'You are now connected!',
+            'chats': sorted(self.chat_ids),
+            'online': {
+                chat_id: chat_presence.get_online(chat_id)
+                for chat_id in sorted(self.chat_ids)
+            },
+        }))
+        await group_send_many(self.channel_layer, [
+            self.get_presence_event(chat_id=chat_id, online=True)
+            for chat_id in sorted(self.chat_ids)
+        ])
+
+    async def disconnect(
+        self,
+        code: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """Leave the groups of the subscribed chats."""
+        self.stop_writer()
+        # Presence is registered once the socket is accepted
+        accepted: bool = self.frame_bucket is not None
+        if accepted:
+            websocket_connections.dec(consumer=self.__class__.__name__)
+        chat_id: int
+        for chat_id in self.chat_ids:
+            if accepted:
+                await self.leave_presence(chat_id=chat_id)
+            await self.channel_layer.group_discard(
+                self.get_chat_group_name(chat_id),
+                self.channel_name
+            )
+        self.chat_ids = set()
+
+    async def subscribe(self, chat_id: int) -> None:
+        """Join the group of a chat of the user."""
+        user: Any = self.scope["user"]
+        if chat_id not in self.chat_ids:
+            if len(self.chat_ids) >= \
+                    settings.CHAT_LIMITS.get("MAX_SUBSCRIPTIONS", 500):
+                await self.send_error(
+                    limit="subscriptions",
+                    code="too_many_subscriptions",
+                    message="Слишком много подписок на чаты"
+                )
+                return
+            chats: QuerySet[PersonalChat] = (
+                PersonalChat.objects.get_not_deleted()
+                if user.is_superuser else self.get_user_chats(user)
+            ).filter(id=chat_id)
+            if not await chats.aexists():
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'code': 'chat_not_found',
+                    'message': 'Чат не найден',
+                    'chat': chat_id,
+                }))
+                return
+            await self.channel_layer.group_add(
+                self.get_chat_group_name(chat_id),
+                self.channel_name
+            )
+            self.chat_ids.add(chat_id)
+            await self.join_presence(chat_id=chat_id)
+        await self.send(text_data=json.dumps({
+            'type': 'subscribed',
+            'chat': chat_id,
+        }))
+
+    async def unsubscribe(self, chat_id: int) -> None:
+        """Leave the group of a chat."""
+        if chat_id in self.chat_ids:
+            self.chat_ids.discard(chat_id)
+            await self.leave_presence(chat_id=chat_id)
+            await self.channel_layer.group_discard(
+                self.get_chat_group_name(chat_id),
+                self.channel_name
+            )
+        await self.send(text_data=json.dumps({
+            'type': 'unsubscribed',
+            'chat': chat_id,
+        }))
+
+    async def receive(
+        self,
+        text_data=None,
+        bytes_data=None,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> None:
+        """Handle commands and messages tagged with a chat id."""
+        data: Optional[Dict[str, Any]] = await self.parse_frame(
+            text_data=text_data,
+            bytes_data=bytes_data
+        )
+        if data is None:
+            return
+        chat_id: Any = data.get('chat')
+        if not isinstance(chat_id, int) or isinstance(chat_id, bool):
+            await self.send_error(
+                limit="invalid_frame",
+                code="invalid_frame",
+                message="Некорректный кадр"
+            )
+            return
+        frame_type: Optional[str] = data.get('type')
+        if frame_type == 'subscribe':
+            await self.subscribe(chat_id=chat_id)
+            return
+        if frame_type == 'unsubscribe':
+            await self.unsubscribe(chat_id=chat_id)
+            return
+        if chat_id not in self.chat_ids:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'code': 'not_subscribed',
+                'message': 'Сначала подпишитесь на чат',
+                'chat': chat_id,
+            }))
+            return
+        if frame_type == 'heartbeat':
+            await self.receive_heartbeat(chat_id=chat_id)
+        elif frame_type == 'typing':
+            await self.receive_typing(chat_id=chat_id)
+        elif data.get('content'):
+            await self.receive_message(
+                chat_id=chat_id,
+                content=data['content'],
+                user=data.get('user', None)
+            )
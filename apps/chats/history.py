@@ -0,0 +1,217 @@
+"""Message history of a chat over the messages table and the archive.
+
+Messages older than CHAT_ARCHIVE["HOT_MONTHS"] are moved to the archive
+table by the archive_messages command, so the history newest first is the
+hot messages followed by the archived ones. MessageHistory is a sequence
+for Django paginators: pages within the hot messages query only the
+messages table, and the archive is read only by pages reaching past them.
+The archived count is kept on the chat, so counting needs no archive query.
+"""
+from collections import Counter
+from datetime import datetime
+from itertools import chain
+from typing import (
+    Any,
+    AsyncIterator,
+    Iterator,
+    Optional,
+)
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Count,
+    OuterRef,
+    QuerySet,
+    Subquery,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from abstracts.tools import conver_to_int_or_none
+from chats.models import (
+    ArchivedMessage,
+    Message,
+    PersonalChat,
+)
+
+# Messages per history page and the most a client may request with "size"
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+
+class HistorySlice:
+    """Lazy slice of a history, iterable with sync and async ORM."""
+
+    def __init__(
+        self,
+        hot: QuerySet[Message],
+        cold: Optional[QuerySet[ArchivedMessage]]
+    ) -> None:
+        self.hot = hot
+        self.cold = cold
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain(self.hot, self.cold if self.cold is not None else ())
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        message: Any
+        async for message in self.hot:
+            yield message
+        if self.cold is not None:
+            async for message in self.cold:
+                yield message
+
+
+class MessageHistory:
+    """Messages of a chat newest first, hot ones before archived ones."""
+
+    def __init__(self, chat: PersonalChat) -> None:
+        self.chat = chat
+        self.hot: QuerySet[Message] = Message.objects.filter(
+            to_chat_id=chat.id
+        ).select_related("owner").order_by("-datetime_created")
+        self.cold: QuerySet[ArchivedMessage] = ArchivedMessage.objects.filter(
+            to_chat_id=chat.id
+        ).select_related("owner").order_by("-datetime_created")
+        self.hot_count: Optional[int] = None
+
+    def count(self) -> int:
+        self.hot_count = self.hot.count()
+        return self.hot_count + self.chat.archived_messages_count
+
+    async def acount(self) -> int:
+        self.hot_count = await self.hot.acount()
+        return self.hot_count + self.chat.archived_messages_count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index: slice) -> HistorySlice:
+        if not isinstance(index, slice) or index.step:
+            raise TypeError("MessageHistory supports only plain slices")
+        if self.hot_count is None:
+            self.count()
+        start: int = index.start or 0
+        stop: int = index.stop if index.stop is not None \
+            else self.hot_count + self.chat.archived_messages_count
+        if stop <= self.hot_count:
+            return HistorySlice(hot=self.hot[start:stop], cold=None)
+        return HistorySlice(
+            hot=self.hot[start:self.hot_count] if start < self.hot_count
+            else self.hot.none(),
+            cold=self.cold[
+                max(start - self.hot_count, 0):stop - self.hot_count
+            ]
+        )
+
+
+ARCHIVED_COLUMNS: tuple[str, ...] = (
+    "id",
+    "content",
+    "owner_id",
+    "to_chat_id",
+    "datetime_created",
+    "datetime_updated",
+    "datetime_deleted",
+)
+
+
+def get_page_size(size: Optional[str]) -> int:
+    """Get messages per page requested by the "size" query parameter."""
+    page_size: Optional[int] = conver_to_int_or_none(size or "")
+    if page_size is None or page_size < 1:
+        return PAGE_SIZE
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def get_archive_cutoff(
+    hot_months: int,
+    now: Optional[datetime] = None
+) -> datetime:
+    """Get start of the oldest month kept in the messages table."""
+    now = timezone.localtime(now)
+    months: int = now.year * 12 + now.month - 1 - hot_months
+    return now.replace(
+        year=months // 12,
+        month=months % 12 + 1,
+        day=1,
+        hour=0,
+        minute=0,
+        second=0,
+        microsecond=0
+    )
+
+
+def move_messages(ids: list[int]) -> None:
+    """Move messages to the archive table in the current transaction."""
+    columns: str = ", ".join(ARCHIVED_COLUMNS)
+    hot_table: str = Message._meta.db_table
+    cold_table: str = ArchivedMessage._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # One pass over the rows: deleted rows feed the insert
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {hot_table} "
+                f"WHERE id = ANY(%s) RETURNING {columns}) "
+                f"INSERT INTO {cold_table} ({columns}) "
+                f"SELECT {columns} FROM moved",
+                [ids]
+            )
+            return
+        placeholders: str = ", ".join(["%s"] * len(ids))
+        cursor.execute(
+            f"INSERT INTO {cold_table} ({columns}) "
+            f"SELECT {columns} FROM {hot_table} WHERE id IN ({placeholders})",
+            ids
+        )
+        cursor.execute(
+            f"DELETE FROM {hot_table} WHERE id IN ({placeholders})",
+            ids
+        )
+
+
+def archive_messages(before: datetime, batch_size: int) -> Counter[str]:
+    """Move messages created before the date to the archive.
+
+    Batches walk the primary key, so every batch is an index range scan
+    and one transaction. Returns moved messages per month.
+    """
+    moved: Counter[str] = Counter()
+    last_id: int = 0
+    while True:
+        with transaction.atomic():
+            rows: list[tuple[int, int, datetime]] = list(
+                Message.objects.filter(
+                    id__gt=last_id,
+                    datetime_created__lt=before
+                ).order_by("id").values_list(
+                    "id",
+                    "to_chat_id",
+                    "datetime_created"
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            move_messages(ids=[row[0] for row in rows])
+            PersonalChat.objects.filter(
+                id__in={row[1] for row in rows}
+            ).update(
+                archived_messages_count=Coalesce(
+                    Subquery(
+                        ArchivedMessage.objects.filter(
+                            to_chat_id=OuterRef("id")
+                        ).order_by().values("to_chat_id").annotate(
+                            count=Count("id")
+                        ).values("count")
+                    ),
+                    0
+                )
+            )
+        last_id = rows[-1][0]
+        moved.update(
+            timezone.localtime(row[2]).strftime("%Y-%m") for row in rows
+        )
+    return moved
@@ -0,0 +1,497 @@
+"""Channel layer broadcasting between workers through the database.
+
+Every worker keeps its channels and group members in memory, like
+InMemoryChannelLayer. Group sends and sends to channels of other workers are
+broadcast: events sent within ``batch_interval`` or together with
+``group_send_many`` are packed into payloads of at most MAX_PAYLOAD_BYTES,
+every worker receives all payloads and delivers the events to its own
+channels. Members of the sending worker get the message
+directly, without the round trip.
+
+With PostgreSQL payloads are sent with NOTIFY and received with LISTEN on a
+dedicated connection; an event over the 8000 bytes NOTIFY limit is written to
+the ChannelLayerSpill table and only its id is notified. The SQLite transport
+appends payloads to a table of a separate database file polled by the
+workers of the box, for local multi-process runs. Spilled and polled rows
+are deleted after ``expiry`` seconds.
+"""
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import string
+from abc import (
+    ABC,
+    abstractmethod,
+)
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Optional,
+)
+
+from channels.exceptions import ChannelFull
+from channels.layers import InMemoryChannelLayer
+
+from django.db import connections
+
+from chats.models import ChannelLayerSpill
+
+logger: logging.Logger = logging.getLogger("chats.layers")
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+SPILL_PREFIX = "#"
+
+Deliver = Callable[[str], Awaitable[None]]
+
+
+class Transport(ABC):
+    """Broadcast of payloads between the workers.
+
+    Blocking database calls run in a single thread, which also keeps the
+    payloads of a worker in order.
+    """
+
+    def __init__(self, expiry: int) -> None:
+        self.expiry = expiry
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="channel-layer"
+        )
+        self.cleaned_at: float = 0.0
+        self.connection: Any = None
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    async def publish(self, payloads: list[str]) -> None:
+        await self.run(self.write, payloads)
+
+    @abstractmethod
+    def write(self, payloads: list[str]) -> None:
+        """Send the payloads to all workers."""
+
+    @abstractmethod
+    async def listen(self, deliver: Deliver) -> None:
+        """Pass payloads of all workers to deliver until cancelled."""
+
+    def is_cleanup_due(self) -> bool:
+        if time() - self.cleaned_at < self.expiry / 2:
+            return False
+        self.cleaned_at = time()
+        return True
+
+    def disconnect(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def close(self) -> None:
+        # Connections are used by the executor thread only
+        self.executor.submit(self.disconnect)
+        self.executor.shutdown(wait=False)
+
+
+class PostgresTransport(Transport):
+    """NOTIFY/LISTEN transport with a spill table for large payloads."""
+
+    def __init__(
+        self,
+        expiry: int,
+        alias: str,
+        channel: str
+    ) -> None:
+        super().__init__(expiry=expiry)
+        self.alias = alias
+        self.channel = channel
+        # Created by the migrations of the chats app
+        self.spill_table: str = ChannelLayerSpill._meta.db_table
+
+    def connect(self) -> Any:
+        """Get a new autocommit psycopg2 connection of the alias."""
+        import psycopg2
+
+        connection: Any = psycopg2.connect(
+            **connections[self.alias].get_connection_params()
+        )
+        connection.autocommit = True
+        return connection
+
+    def get_connection(self) -> Any:
+        if self.connection is None or self.connection.closed:
+            self.connection = self.connect()
+        return self.connection
+
+    def write(self, payloads: list[str]) -> None:
+        with self.get_connection().cursor() as cursor:
+            notified: list[str] = []
+            payload: str
+            for payload in payloads:
+                if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+                    cursor.execute(
+                        f"INSERT INTO {self.spill_table} (payload, created) "
+                        "VALUES (%s, now()) RETURNING id",
+                        [payload]
+                    )
+                    payload = f"{SPILL_PREFIX}{cursor.fetchone()[0]}"
+                notified.append(payload)
+            cursor.execute(
+                "SELECT " + ", ".join(
+                    ["pg_notify(%s, %s)"] * len(notified)
+                ),
+                [
+                    value
+                    for payload in notified
+                    for value in (self.channel, payload)
+                ]
+            )
+            if self.is_cleanup_due():
+                cursor.execute(
+                    f"DELETE FROM {self.spill_table} "
+                    "WHERE created < now() - make_interval(secs => %s)",
+                    [self.expiry]
+                )
+
+    def read_spilled(self, spill_id: int) -> Optional[str]:
+        with self.get_connection().cursor() as cursor:
+            cursor.execute(
+                f"SELECT payload FROM {self.spill_table} WHERE id = %s",
+                [spill_id]
+            )
+            row: Optional[tuple[str]] = cursor.fetchone()
+        return row[0] if row else None
+
+    def start_listening(self) -> Any:
+        connection: Any = self.connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return connection
+
+    async def listen(self, deliver: Deliver) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        connection: Any = await self.run(self.start_listening)
+        received: asyncio.Queue = asyncio.Queue()
+
+        def on_readable() -> None:
+            connection.poll()
+            while connection.notifies:
+                received.put_nowait(connection.notifies.pop(0).payload)
+
+        loop.add_reader(connection.fileno(), on_readable)
+        try:
+            while True:
+                payload: Optional[str] = await received.get()
+                if payload.startswith(SPILL_PREFIX):
+                    payload = await self.run(
+                        self.read_spilled,
+                        int(payload[len(SPILL_PREFIX):])
+                    )
+                    if payload is None:
+                        logger.warning("Сообщение слоя каналов истекло")
+                        continue
+                await deliver(payload)
+        finally:
+            loop.remove_reader(connection.fileno())
+            connection.close()
+
+
+class SQLiteTransport(Transport):
+    """Table of a shared SQLite file polled by all workers."""
+
+    def __init__(
+        self,
+        expiry: int,
+        path: str,
+        poll_interval: float
+    ) -> None:
+        super().__init__(expiry=expiry)
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def get_connection(self) -> Any:
+        if self.connection is None:
+            self.connection = sqlite3.connect(
+                self.path,
+                timeout=10,
+                isolation_level=None
+            )
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS channel_layer_event ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "payload TEXT NOT NULL, "
+                "created REAL NOT NULL)"
+            )
+        return self.connection
+
+    def write(self, payloads: list[str]) -> None:
+        connection: Any = self.get_connection()
+        created: float = time()
+        connection.executemany(
+            "INSERT INTO channel_layer_event (payload, created) "
+            "VALUES (?, ?)",
+            [(payload, created) for payload in payloads]
+        )
+        if self.is_cleanup_due():
+            connection.execute(
+                "DELETE FROM channel_layer_event WHERE created < ?",
+                [created - self.expiry]
+            )
+
+    def get_last_id(self) -> int:
+        return self.get_connection().execute(
+            "SELECT COALESCE(MAX(id), 0) FROM channel_layer_event"
+        ).fetchone()[0]
+
+    def read_after(self, last_id: int) -> list[tuple[int, str]]:
+        return self.get_connection().execute(
+            "SELECT id, payload FROM channel_layer_event "
+            "WHERE id > ? ORDER BY id",
+            [last_id]
+        ).fetchall()
+
+    async def listen(self, deliver: Deliver) -> None:
+        last_id: int = await self.run(self.get_last_id)
+        while True:
+            rows: list[tuple[int, str]] = await self.run(
+                self.read_after, last_id
+            )
+            payload: str
+            for last_id, payload in rows:
+                await deliver(payload)
+            if not rows:
+                await asyncio.sleep(self.poll_interval)
+
+
+class DatabaseChannelLayer(InMemoryChannelLayer):
+    """Channel layer of several workers sharing a database.
+
+    CONFIG:
+        backend: "postgresql" (NOTIFY/LISTEN) or "sqlite" (polled file).
+        alias: Django database alias of the PostgreSQL server.
+        path: SQLite file shared by the workers.
+        batch_interval: seconds events are collected before a broadcast.
+        poll_interval: seconds between polls of the SQLite file.
+    """
+
+    def __init__(
+        self,
+        backend: str = "postgresql",
+        alias: str = "default",
+        path: Optional[str] = None,
+        channel: str = "channel_layer",
+        batch_interval: float = 0.005,
+        poll_interval: float = 0.02,
+        expiry: int = 60,
+        **kwargs: Any
+    ) -> None:
+        super().__init__(expiry=expiry, **kwargs)
+        self.transport: Transport
+        if backend == "postgresql":
+            self.transport = PostgresTransport(
+                expiry=expiry,
+                alias=alias,
+                channel=channel
+            )
+        elif backend == "sqlite":
+            if not path:
+                raise ValueError("Для SQLite укажите путь к файлу (path)")
+            self.transport = SQLiteTransport(
+                expiry=expiry,
+                path=path,
+                poll_interval=poll_interval
+            )
+        else:
+            raise ValueError(f"Неизвестный backend слоя каналов: {backend}")
+        self.batch_interval = batch_interval
+        self.worker_id: str = "".join(
+            random.choice(string.ascii_letters) for _ in range(12)
+        )
+        # Loop of the consumers of the worker; local queues belong to it
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.listener: Optional[asyncio.Task] = None
+        self.outbox: list[str] = []
+        self.flusher: Optional[asyncio.Task] = None
+
+    # ------------------------------------------
+    # Loop binding
+    #
+    def is_own_loop(self) -> bool:
+        """Get whether the running loop is the one of the consumers.
+
+        Sync code calls the layer through async_to_sync in short-lived
+        loops; those only publish.
+        """
+        return self.loop is not None and not self.loop.is_closed() and \
+            self.loop is asyncio.get_running_loop()
+
+    def ensure_listening(self) -> None:
+        """Bind the layer to the running loop and start the listener."""
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        if self.loop is None or self.loop.is_closed():
+            self.loop = loop
+            self.listener = None
+            self.outbox = []
+            self.flusher = None
+        if self.loop is loop and (
+            self.listener is None or self.listener.done()
+        ):
+            self.listener = loop.create_task(self.listen())
+
+    async def listen(self) -> None:
+        """Receive payloads, reconnecting after transport errors."""
+        while True:
+            try:
+                await self.transport.listen(self.receive_payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка получения сообщений слоя каналов")
+                await asyncio.sleep(1)
+
+    # ------------------------------------------
+    # Channel layer API
+    #
+    async def new_channel(self, prefix: str = "specific.") -> str:
+        return "%s.%s!%s" % (
+            prefix,
+            self.worker_id,
+            "".join(random.choice(string.ascii_letters) for _ in range(12)),
+        )
+
+    def is_local_channel(self, channel: str) -> bool:
+        return f".{self.worker_id}!" in channel or channel in self.channels
+
+    async def receive(self, channel: str) -> dict[str, Any]:
+        self.ensure_listening()
+        return await super().receive(channel)
+
+    async def send(self, channel: str, message: dict[str, Any]) -> None:
+        if self.is_own_loop() and self.is_local_channel(channel):
+            await super().send(channel, message)
+            return
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self.broadcast({"c": channel, "m": message})
+
+    async def group_add(self, group: str, channel: str) -> None:
+        self.ensure_listening()
+        await super().group_add(group, channel)
+
+    async def group_send(self, group: str, message: dict[str, Any]) -> None:
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Invalid group name"
+        if self.is_own_loop():
+            await super().group_send(group, message)
+        await self.broadcast({"g": group, "m": message})
+
+    async def group_send_many(
+        self,
+        messages: list[tuple[str, dict[str, Any]]]
+    ) -> None:
+        """Send messages to their groups with a single broadcast."""
+        group: str
+        message: dict[str, Any]
+        for group, message in messages:
+            assert isinstance(message, dict), "Message is not a dict"
+            assert self.valid_group_name(group), "Invalid group name"
+            if self.is_own_loop():
+                await super().group_send(group, message)
+        await self.broadcast(
+            *({"g": group, "m": message} for group, message in messages)
+        )
+
+    async def flush(self) -> None:
+        await super().flush()
+        self.outbox = []
+
+    async def close(self) -> None:
+        if self.listener and not self.listener.done():
+            self.listener.cancel()
+        self.transport.close()
+
+    # ------------------------------------------
+    # Broadcast
+    #
+    async def broadcast(self, *events: dict[str, Any]) -> None:
+        """Queue events for the other workers.
+
+        Events of a foreign loop are published at once and delivered by
+        the listener of this worker too.
+        """
+        serialized: list[str] = [
+            json.dumps(event, ensure_ascii=False) for event in events
+        ]
+        if not serialized:
+            return
+        if not self.is_own_loop():
+            await self.transport.publish(
+                self.pack(origin="", events=serialized)
+            )
+            return
+        self.outbox.extend(serialized)
+        if self.flusher is None or self.flusher.done():
+            self.flusher = self.loop.create_task(self.flush_outbox())
+
+    async def flush_outbox(self) -> None:
+        if self.batch_interval:
+            await asyncio.sleep(self.batch_interval)
+        events: list[str] = self.outbox
+        self.outbox = []
+        if events:
+            await self.transport.publish(
+                self.pack(origin=self.worker_id, events=events)
+            )
+
+    def pack(self, origin: str, events: list[str]) -> list[str]:
+        """Pack serialized events into as few payloads as fit the limit.
+
+        An event longer than the limit gets a payload of its own, which
+        the transport spills.
+        """
+        head: str = '{"o": %s, "e": [' % json.dumps(origin)
+        payloads: list[str] = []
+        batch: list[str] = []
+        size: int = len(head) + 2
+        event: str
+        for event in events:
+            event_size: int = len(event.encode()) + 2
+            if batch and size + event_size > MAX_PAYLOAD_BYTES:
+                payloads.append(head + ", ".join(batch) + "]}")
+                batch = []
+                size = len(head) + 2
+            batch.append(event)
+            size += event_size
+        if batch:
+            payloads.append(head + ", ".join(batch) + "]}")
+        return payloads
+
+    async def receive_payload(self, payload: str) -> None:
+        """Deliver events of a payload to the channels of this worker."""
+        try:
+            data: dict[str, Any] = json.loads(payload)
+        except ValueError:
+            logger.warning("Некорректное сообщение слоя каналов")
+            return
+        if data["o"] == self.worker_id:
+            return
+        event: dict[str, Any]
+        for event in data["e"]:
+            if "g" in event:
+                await InMemoryChannelLayer.group_send(
+                    self, event["g"], event["m"]
+                )
+            elif self.is_local_channel(event["c"]):
+                try:
+                    await InMemoryChannelLayer.send(
+                        self, event["c"], event["m"]
+                    )
+                except ChannelFull:
+                    pass
@@ -0,0 +1,86 @@
+"""In-memory token buckets limiting frames of chat sockets.
+
+Every socket has its own bucket for all incoming frames, which protects
+the worker, and every user has a bucket for chat messages shared by all
+sockets of the user in the process, which protects the database. Buckets
+refill continuously at RATE tokens per second up to BURST tokens; user
+buckets idle long enough to be full again are dropped.
+"""
+from threading import RLock
+from time import monotonic
+from typing import Optional
+
+from django.conf import settings
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens: float = burst
+        self.updated: float = monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(
+            self.burst,
+            self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def consume(self, now: Optional[float] = None) -> float:
+        """Take a token, return 0 or seconds to wait for the next one."""
+        self.refill(monotonic() if now is None else now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class UserBuckets:
+    """Token buckets of users of the process."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        prune_interval: float = 60
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.prune_interval = prune_interval
+        self.lock: RLock = RLock()
+        self.buckets: dict[int, TokenBucket] = {}
+        self.pruned_at: float = monotonic()
+
+    def consume(self, user_id: int) -> float:
+        """Take a token of the user, return 0 or seconds to wait."""
+        now: float = monotonic()
+        with self.lock:
+            if now - self.pruned_at >= self.prune_interval:
+                self.prune(now)
+            bucket: Optional[TokenBucket] = self.buckets.get(user_id)
+            if bucket is None:
+                bucket = self.buckets[user_id] = TokenBucket(
+                    rate=self.rate,
+                    burst=self.burst
+                )
+            return bucket.consume(now)
+
+    def prune(self, now: float) -> None:
+        """Drop buckets of idle users, they start full anyway."""
+        self.buckets = {
+            user_id: bucket for user_id, bucket in self.buckets.items()
+            if not bucket.is_full(now)
+        }
+        self.pruned_at = now
+
+
+user_message_buckets: UserBuckets = UserBuckets(
+    rate=settings.CHAT_LIMITS.get("USER_MESSAGE_RATE", 2),
+    burst=settings.CHAT_LIMITS.get("USER_MESSAGE_BURST", 10)
+)
@@ -0,0 +1,76 @@
+from datetime import datetime
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from chats.history import (
+    archive_messages,
+    get_archive_cutoff,
+)
+from chats.models import Message
+
+
+class Command(BaseCommand):
+    """Move messages of cold months to the archive table."""
+
+    help = "Перенос старых сообщений в архив"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--hot-months",
+            type=int,
+            default=settings.CHAT_ARCHIVE.get("HOT_MONTHS", 6),
+            help="Сколько последних месяцев оставить в таблице сообщений"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.CHAT_ARCHIVE.get("BATCH_SIZE", 5000),
+            help="Количество сообщений в одной транзакции"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать сообщения по месяцам"
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Archive the messages month by month in batches."""
+        start_time: datetime = datetime.now()
+        before: datetime = get_archive_cutoff(hot_months=options["hot_months"])
+        if options["dry_run"]:
+            months: dict[str, int] = {
+                row["month"].strftime("%Y-%m"): row["count"]
+                for row in Message.objects.filter(
+                    datetime_created__lt=before
+                ).annotate(
+                    month=TruncMonth("datetime_created")
+                ).order_by().values("month").annotate(
+                    count=Count("id")
+                )
+            }
+        else:
+            months = archive_messages(
+                before=before,
+                batch_size=options["batch_size"]
+            )
+        month: str
+        for month in sorted(months):
+            print(f"{month}: {months[month]}")
+        print(
+            "Сообщений до {}: {}, за {} секунд".format(
+                before.date(),
+                sum(months.values()),
+                (datetime.now()-start_time).total_seconds()
+            )
+        )
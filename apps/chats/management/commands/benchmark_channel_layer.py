@@ -0,0 +1,171 @@
+import asyncio
+import os
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from channels.layers import (
+    BaseChannelLayer,
+    InMemoryChannelLayer,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+
+from chats.layers import DatabaseChannelLayer
+
+
+class Command(BaseCommand):
+    """Compare group_send throughput of the channel layers."""
+
+    help = "Сравнение пропускной способности слоев каналов"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--messages",
+            type=int,
+            default=2000,
+            help="Количество group_send"
+        )
+        parser.add_argument(
+            "--groups",
+            type=int,
+            default=20,
+            help="Количество групп (чатов)"
+        )
+        parser.add_argument(
+            "--members",
+            type=int,
+            default=2,
+            help="Количество каналов в группе"
+        )
+        parser.add_argument(
+            "--payload-size",
+            type=int,
+            default=200,
+            help="Размер текста сообщения в символах"
+        )
+        parser.add_argument(
+            "--backend",
+            choices=("sqlite", "postgresql"),
+            default="sqlite",
+            help="Транспорт DatabaseChannelLayer"
+        )
+        parser.add_argument(
+            "--alias",
+            default="default",
+            help="База данных PostgreSQL"
+        )
+
+    async def measure(
+        self,
+        sender: BaseChannelLayer,
+        receiver: BaseChannelLayer,
+        options: Dict[str, Any]
+    ) -> Tuple[float, float, float, int]:
+        """Get sent and delivered messages per second, p95 ms and losses.
+
+        Members are added to the receiving layer, so with two database
+        layers every message crosses the transport as between workers.
+        """
+        groups: list[str] = [
+            f"benchmark_{index}" for index in range(options["groups"])
+        ]
+        members: list[tuple[str, str]] = []
+        group: str
+        for group in groups:
+            for _ in range(options["members"]):
+                channel: str = await receiver.new_channel()
+                await receiver.group_add(group, channel)
+                members.append((group, channel))
+        # The sender batches on the loop of its own consumers
+        await sender.group_add("benchmark_sender", await sender.new_channel())
+
+        per_group: dict[str, int] = dict.fromkeys(groups, 0)
+        index: int
+        for index in range(options["messages"]):
+            per_group[groups[index % len(groups)]] += 1
+        latencies: list[float] = []
+
+        async def consume(group: str, channel: str) -> None:
+            for _ in range(per_group[group]):
+                message: dict[str, Any] = await receiver.receive(channel)
+                latencies.append(perf_counter() - message["sent_at"])
+
+        consumers: list[asyncio.Task] = [
+            asyncio.create_task(consume(group, channel))
+            for group, channel in members
+        ]
+        content: str = "x" * options["payload_size"]
+        start: float = perf_counter()
+        for index in range(options["messages"]):
+            await sender.group_send(
+                groups[index % len(groups)],
+                {
+                    "type": "chat_message",
+                    "content": content,
+                    "sent_at": perf_counter(),
+                }
+            )
+        sent: float = perf_counter() - start
+        await asyncio.wait(consumers, timeout=30)
+        delivered: float = perf_counter() - start
+        consumer: asyncio.Task
+        for consumer in consumers:
+            consumer.cancel()
+        expected: int = options["messages"] * options["members"]
+        latencies.sort()
+        return (
+            options["messages"] / sent,
+            len(latencies) / delivered,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000
+            if latencies else 0.0,
+            expected - len(latencies)
+        )
+
+    async def run(self, path: str, options: Dict[str, Any]) -> None:
+        capacity: int = options["messages"]
+        memory_layer: InMemoryChannelLayer = InMemoryChannelLayer(
+            capacity=capacity
+        )
+        config: dict[str, Any] = {
+            "backend": options["backend"],
+            "alias": options["alias"],
+            "path": path,
+            "capacity": capacity,
+        }
+        sender: DatabaseChannelLayer = DatabaseChannelLayer(**config)
+        receiver: DatabaseChannelLayer = DatabaseChannelLayer(**config)
+        layers: tuple[tuple[str, BaseChannelLayer, BaseChannelLayer]] = (
+            ("InMemoryChannelLayer", memory_layer, memory_layer),
+            (f"DatabaseChannelLayer ({options['backend']})", sender, receiver),
+        )
+        name: str
+        for name, sender_layer, receiver_layer in layers:
+            result: Tuple[float, float, float, int] = await self.measure(
+                sender=sender_layer,
+                receiver=receiver_layer,
+                options=options
+            )
+            self.stdout.write(
+                "{0:<36} отправка={1:>9.0f}/с доставка={2:>9.0f}/с "
+                "p95={3:>8.2f}мс потеряно={4}".format(name, *result)
+            )
+        await sender.close()
+        await receiver.close()
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Run the benchmark in a temporary SQLite file."""
+        with TemporaryDirectory() as directory:
+            asyncio.run(
+                self.run(
+                    path=os.path.join(directory, "channel_layer.sqlite3"),
+                    options=options
+                )
+            )
@@ -1,13 +1,21 @@
 from typing import Any
 
 from django.db.models import (
+    BigIntegerField,
+    DateTimeField,
+    Model,
+    PositiveIntegerField,
     TextField,
     ForeignKey,
+    Index,
     UniqueConstraint,
     CASCADE,
 )
 
-from abstracts.models import AbstractDateTime
+from abstracts.models import (
+    AbstractDateTime,
+    AbstractDateTimeQuerySet,
+)
 from auths.models import CustomUser
 from subjectss.models import Student
 from teaching.models import Teacher
@@ -26,6 +34,11 @@ class PersonalChat(AbstractDateTime):
         related_name="personal_chats",
         verbose_name="Преподаватель"
     )
+    # Maintained by the archive_messages command
+    archived_messages_count: PositiveIntegerField = PositiveIntegerField(
+        default=0,
+        verbose_name="Сообщений в архиве"
+    )
 
     class Meta:
         verbose_name: str = "Личный чат"
@@ -63,6 +76,88 @@ class Message(AbstractDateTime):
         verbose_name: str = "Сообщение"
         verbose_name_plural: str = "Сообщения"
         ordering: tuple[str] = ("-datetime_updated",)
+        indexes: tuple[Any] = [
+            # Messages of a chat after a cursor, used by the socket sync
+            Index(
+                fields=['to_chat', 'id'],
+                name="message_chat_id_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Сообщение {self.content[:40]}"
+
+
+class ArchivedMessage(Model):
+    """Message moved out of the messages table by archive_messages."""
+
+    # Id of the message in the messages table
+    id: BigIntegerField = BigIntegerField(
+        primary_key=True
+    )
+    content: TextField = TextField(
+        verbose_name="Текст сообщения"
+    )
+    owner: CustomUser = ForeignKey(
+        to=CustomUser,
+        on_delete=CASCADE,
+        related_name="archived_messages",
+        verbose_name="Владелец/Создатель"
+    )
+    to_chat: PersonalChat = ForeignKey(
+        to=PersonalChat,
+        on_delete=CASCADE,
+        related_name="archived_messages",
+        verbose_name="Чат сообщения"
+    )
+    datetime_created: DateTimeField = DateTimeField(
+        verbose_name="время и дата создания"
+    )
+    datetime_updated: DateTimeField = DateTimeField(
+        verbose_name="время и дата обновления"
+    )
+    datetime_deleted: DateTimeField = DateTimeField(
+        verbose_name="время и дата удаления",
+        null=True,
+        blank=True
+    )
+    objects = AbstractDateTimeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name: str = "Архивное сообщение"
+        verbose_name_plural: str = "Архив сообщений"
+        ordering: tuple[str] = ("-datetime_created",)
+        indexes: tuple[Any] = [
+            # History of a chat, newest first
+            Index(
+                fields=['to_chat', '-datetime_created'],
+                name="archived_message_chat_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Архивное сообщение {self.content[:40]}"
+
+
+class ChannelLayerSpill(Model):
+    """Event of DatabaseChannelLayer over the NOTIFY payload limit.
+
+    Written and read by PostgresTransport with raw SQL and deleted after
+    the expiry of the layer.
+    """
+
+    payload: TextField = TextField(
+        verbose_name="Событие"
+    )
+    created: DateTimeField = DateTimeField(
+        db_index=True,
+        verbose_name="время создания"
+    )
+
+    class Meta:
+        db_table: str = "channel_layer_spill"
+        verbose_name: str = "Событие слоя каналов"
+        verbose_name_plural: str = "События слоя каналов"
+
+    def __str__(self) -> str:
+        return f"Событие слоя каналов {self.id}"
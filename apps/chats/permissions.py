@@ -23,3 +23,21 @@ class IsChatMember(BasePermission):
             obj.teacher.user == request.user or
             request.user.is_superuser
         )
+
+
+class IsChatTeacher(BasePermission):
+    """IsChatTeacher."""
+
+    message: str = "Действие доступно только преподавателю чата."
+
+    def has_object_permission(
+        self,
+        request: DRF_Request,
+        view: Any,
+        obj: PersonalChat
+    ) -> bool:
+        """Return true if user is the teacher of the chat or an admin."""
+        return bool(
+            obj.teacher.user_id == request.user.id or
+            request.user.is_superuser
+        )
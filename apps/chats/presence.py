@@ -0,0 +1,130 @@
+"""In-memory presence and typing state of chat sockets.
+
+Presence is a map of chat -> user -> expiry time kept by every worker.
+Sockets refresh it with heartbeats, and presence events of other workers
+received through the channel layer are applied to it as well, so all
+workers see the same members online without touching the database. Users
+whose heartbeats stop, e.g. because their worker died, expire after
+CHAT_PRESENCE["TTL"] seconds.
+
+Ephemeral events are coalesced per chat and user: a heartbeat is broadcast
+at most once per CHAT_PRESENCE["BROADCAST_INTERVAL"] seconds and a typing
+event at most once per CHAT_PRESENCE["TYPING_INTERVAL"] seconds, the rest
+only refresh the local state.
+"""
+from threading import RLock
+from time import monotonic
+
+from django.conf import settings
+
+MemberKey = tuple[int, int]
+
+
+class ChatPresence:
+    """Online members and typing throttle of the process."""
+
+    def __init__(
+        self,
+        ttl: float,
+        broadcast_interval: float,
+        typing_interval: float
+    ) -> None:
+        self.ttl = ttl
+        self.broadcast_interval = broadcast_interval
+        self.typing_interval = typing_interval
+        self.lock: RLock = RLock()
+        self.expires: dict[int, dict[int, float]] = {}
+        # Open sockets of this process per chat member
+        self.sockets: dict[MemberKey, int] = {}
+        self.broadcasted: dict[MemberKey, float] = {}
+        self.typed: dict[MemberKey, float] = {}
+
+    def touch(self, chat_id: int, user_id: int, now: float) -> bool:
+        """Prolong presence of the member, return true if it was offline."""
+        members: dict[int, float] = self.expires.setdefault(chat_id, {})
+        was_online: bool = members.get(user_id, 0.0) > now
+        members[user_id] = now + self.ttl
+        return not was_online
+
+    def forget(self, chat_id: int, user_id: int) -> None:
+        members: dict[int, float] = self.expires.get(chat_id, {})
+        members.pop(user_id, None)
+        if not members:
+            self.expires.pop(chat_id, None)
+        self.broadcasted.pop((chat_id, user_id), None)
+        self.typed.pop((chat_id, user_id), None)
+
+    def connect(self, chat_id: int, user_id: int) -> None:
+        """Register a socket of the member and mark the member online."""
+        key: MemberKey = (chat_id, user_id)
+        now: float = monotonic()
+        with self.lock:
+            self.sockets[key] = self.sockets.get(key, 0) + 1
+            self.touch(chat_id, user_id, now)
+            self.broadcasted[key] = now
+
+    def disconnect(self, chat_id: int, user_id: int) -> bool:
+        """Unregister a socket, return true if the member went offline."""
+        key: MemberKey = (chat_id, user_id)
+        with self.lock:
+            sockets: int = self.sockets.get(key, 0) - 1
+            if sockets > 0:
+                self.sockets[key] = sockets
+                return False
+            self.sockets.pop(key, None)
+            self.forget(chat_id, user_id)
+            return True
+
+    def heartbeat(self, chat_id: int, user_id: int) -> bool:
+        """Refresh presence, return true if it should be broadcast."""
+        key: MemberKey = (chat_id, user_id)
+        now: float = monotonic()
+        with self.lock:
+            went_online: bool = self.touch(chat_id, user_id, now)
+            if went_online or \
+                    now - self.broadcasted.get(key, float("-inf")) >= \
+                    self.broadcast_interval:
+                self.broadcasted[key] = now
+                return True
+            return False
+
+    def apply(self, chat_id: int, user_id: int, online: bool) -> None:
+        """Apply a presence event received through the channel layer."""
+        with self.lock:
+            if online:
+                self.touch(chat_id, user_id, monotonic())
+            elif (chat_id, user_id) not in self.sockets:
+                # The member may still be connected to this process
+                self.forget(chat_id, user_id)
+
+    def allow_typing(self, chat_id: int, user_id: int) -> bool:
+        """Return true if a typing event of the member should be sent."""
+        key: MemberKey = (chat_id, user_id)
+        now: float = monotonic()
+        with self.lock:
+            self.touch(chat_id, user_id, now)
+            if now - self.typed.get(key, float("-inf")) < \
+                    self.typing_interval:
+                return False
+            self.typed[key] = now
+            return True
+
+    def get_online(self, chat_id: int) -> list[int]:
+        """Get ids of online members of the chat and drop expired ones."""
+        now: float = monotonic()
+        with self.lock:
+            members: dict[int, float] = self.expires.get(chat_id, {})
+            user_id: int
+            for user_id in [
+                user_id for user_id, expires in members.items()
+                if expires <= now
+            ]:
+                self.forget(chat_id, user_id)
+            return sorted(members)
+
+
+chat_presence: ChatPresence = ChatPresence(
+    ttl=settings.CHAT_PRESENCE.get("TTL", 30),
+    broadcast_interval=settings.CHAT_PRESENCE.get("BROADCAST_INTERVAL", 10),
+    typing_interval=settings.CHAT_PRESENCE.get("TYPING_INTERVAL", 2)
+)
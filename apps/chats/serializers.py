@@ -23,6 +23,10 @@ from auths.serializers import (
     CustomUserForeignSerializer,
 )
 from abstracts.paginators import AbstractPageNumberPaginator
+from chats.history import (
+    MessageHistory,
+    get_page_size,
+)
 
 
 class CurrentChatSerializer:
@@ -132,13 +136,11 @@ class PersonalChatDetailSerializer(PersonalChatListSerializer):
     def get_paginated_messages(self, obj: PersonalChat) -> dict[str, Any]:
         """Get paginated messages."""
         paginator: AbstractPageNumberPaginator = AbstractPageNumberPaginator()
-        paginator.page_size = self.context['request'].query_params.get(
-            'size'
-        ) or 30
+        paginator.page_size = get_page_size(
+            self.context['request'].query_params.get('size')
+        )
         objects: list[Any] = paginator.paginate_queryset(
-            queryset=obj.messages.select_related(
-                "owner"
-            ).order_by("-datetime_created"),
+            queryset=MessageHistory(chat=obj),
             request=self.context['request']
         )
         serializer: MessageBaseModelSerializer = MessageBaseModelSerializer(
@@ -1,3 +1,586 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import datetime
+from functools import partial
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Optional,
+)
 
-# Create your tests here.
+from channels.layers import (
+    BaseChannelLayer,
+    get_channel_layer,
+)
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.http import HttpResponse
+from django.utils import timezone
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from auths.models import CustomUser
+from chats.backpressure import ServerBackpressure
+from chats.broadcast import provision_chats
+from chats.consumers import (
+    SLOW_CLIENT_CLOSE_CODE,
+    BaseChatConsumer,
+    UserChatsConsumer,
+    get_chat_group_name,
+)
+from chats.history import (
+    MAX_PAGE_SIZE,
+    PAGE_SIZE,
+    HistorySlice,
+    MessageHistory,
+    archive_messages,
+    get_page_size,
+)
+from chats.layers import (
+    MAX_PAYLOAD_BYTES,
+    DatabaseChannelLayer,
+    Transport,
+)
+from chats.limits import TokenBucket
+from chats.models import (
+    Message,
+    PersonalChat,
+)
+from chats.presence import (
+    ChatPresence,
+    chat_presence,
+)
+from subjectss.models import (
+    Class,
+    ClassSubject,
+    GeneralSubject,
+    Student,
+    StudentRegisteredSubjects,
+    StudentSubjectState,
+)
+from teaching.models import Teacher
+
+
+class GetPageSizeTests(SimpleTestCase):
+    """get_page_size parsing of the "size" query parameter."""
+
+    def test_valid_size(self) -> None:
+        self.assertEqual(get_page_size("5"), 5)
+
+    def test_invalid_size_falls_back(self) -> None:
+        value: object
+        for value in (None, "", "abc", "0", "-3", "1.5"):
+            self.assertEqual(get_page_size(value), PAGE_SIZE)
+
+    def test_size_is_clamped(self) -> None:
+        self.assertEqual(get_page_size("100000"), MAX_PAGE_SIZE)
+
+
+class TokenBucketTests(SimpleTestCase):
+    """TokenBucket with explicit times."""
+
+    def test_burst_then_rate(self) -> None:
+        bucket: TokenBucket = TokenBucket(rate=2, burst=3)
+        now: float = bucket.updated
+        self.assertEqual([bucket.consume(now) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.consume(now), 0.5)
+        # Half a second refills one token
+        self.assertEqual(bucket.consume(now + 0.5), 0)
+        self.assertAlmostEqual(bucket.consume(now + 0.5), 0.5)
+
+    def test_refill_stops_at_burst(self) -> None:
+        bucket: TokenBucket = TokenBucket(rate=10, burst=2)
+        now: float = bucket.updated
+        bucket.consume(now)
+        self.assertTrue(bucket.is_full(now + 60))
+        self.assertEqual(
+            [bucket.consume(now + 60) for _ in range(3)],
+            [0, 0, 0.1]
+        )
+
+
+class StandInProtocol:
+    """Daphne socket whose transport buffer is filled by the test."""
+
+    def __init__(self) -> None:
+        self.transport: object = object()
+        self.producer: Optional[ServerBackpressure] = None
+        self.sent: list[dict[str, Any]] = []
+
+    def registerProducer(self, producer: Any, streaming: bool) -> None:
+        self.producer = producer
+
+    def unregisterProducer(self) -> None:
+        self.producer = None
+
+
+async def handle_reply(
+    protocol: StandInProtocol,
+    message: dict[str, Any]
+) -> None:
+    protocol.sent.append(message)
+
+
+class SlowClientTests(SimpleTestCase):
+    """Frames of a client that stopped reading."""
+
+    def setUp(self) -> None:
+        self.protocol: StandInProtocol = StandInProtocol()
+        self.consumer: BaseChatConsumer = BaseChatConsumer()
+        self.consumer.scope = {"user": SimpleNamespace(id=1)}
+        self.consumer.base_send = partial(handle_reply, self.protocol)
+
+    def get_texts(self) -> list[str]:
+        return [
+            message["text"] for message in self.protocol.sent
+            if message["type"] == "websocket.send"
+        ]
+
+    async def send_to_stalled_reader(self, frames: int) -> None:
+        """Send frames while the server's write buffer is full."""
+        self.consumer.start_writer()
+        self.assertIs(self.protocol.producer, self.consumer.backpressure)
+        self.protocol.producer.pauseProducing()
+        number: int
+        for number in range(frames):
+            await self.consumer.send(text_data=str(number))
+            await asyncio.sleep(0)
+
+    @override_settings(CHAT_LIMITS={
+        "MAX_OUTBOUND_FRAMES": 3,
+        "SLOW_CLIENT": "close",
+    })
+    async def test_stalled_reader_is_closed(self) -> None:
+        await self.send_to_stalled_reader(frames=5)
+        self.assertEqual(self.get_texts(), ["0"])
+        self.assertEqual(
+            self.protocol.sent[-1],
+            {"type": "websocket.close", "code": SLOW_CLIENT_CLOSE_CODE}
+        )
+        self.assertIsNone(self.protocol.producer)
+
+    @override_settings(CHAT_LIMITS={
+        "MAX_OUTBOUND_FRAMES": 3,
+        "SLOW_CLIENT": "drop",
+    })
+    async def test_frames_of_stalled_reader_are_dropped(self) -> None:
+        await self.send_to_stalled_reader(frames=6)
+        self.assertEqual(self.get_texts(), ["0"])
+        self.protocol.producer.resumeProducing()
+        while not self.consumer.outbox.empty():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertEqual(self.get_texts(), ["0", "1", "2", "3"])
+        self.consumer.stop_writer()
+        self.assertIsNone(self.protocol.producer)
+
+    async def test_non_text_content_is_invalid(self) -> None:
+        await self.consumer.receive_message(
+            chat_id=1,
+            content={"text": "Сообщение"},
+            user=None
+        )
+        self.assertEqual(
+            json.loads(self.get_texts()[0])["code"],
+            "invalid_frame"
+        )
+
+
+class ChatPresenceTests(SimpleTestCase):
+    """ChatPresence sockets, heartbeats and remote events."""
+
+    def setUp(self) -> None:
+        self.presence: ChatPresence = ChatPresence(
+            ttl=30,
+            broadcast_interval=10,
+            typing_interval=2
+        )
+
+    def test_member_is_online_until_last_socket_leaves(self) -> None:
+        self.presence.connect(1, 7)
+        self.presence.connect(1, 7)
+        self.assertEqual(self.presence.get_online(1), [7])
+        self.assertFalse(self.presence.disconnect(1, 7))
+        self.assertEqual(self.presence.get_online(1), [7])
+        self.assertTrue(self.presence.disconnect(1, 7))
+        self.assertEqual(self.presence.get_online(1), [])
+
+    def test_heartbeats_are_coalesced(self) -> None:
+        self.presence.connect(1, 7)
+        # connect has just broadcast the member online
+        self.assertFalse(self.presence.heartbeat(1, 7))
+        self.presence.broadcasted[(1, 7)] -= 10
+        self.assertTrue(self.presence.heartbeat(1, 7))
+        self.assertFalse(self.presence.heartbeat(1, 7))
+
+    def test_typing_is_coalesced(self) -> None:
+        self.assertTrue(self.presence.allow_typing(1, 7))
+        self.assertFalse(self.presence.allow_typing(1, 7))
+        self.assertTrue(self.presence.allow_typing(1, 8))
+
+    def test_remote_events(self) -> None:
+        self.presence.apply(1, 8, online=True)
+        self.assertEqual(self.presence.get_online(1), [8])
+        self.presence.apply(1, 8, online=False)
+        self.assertEqual(self.presence.get_online(1), [])
+
+    def test_remote_offline_keeps_local_socket(self) -> None:
+        self.presence.connect(1, 7)
+        # The member left from another worker only
+        self.presence.apply(1, 7, online=False)
+        self.assertEqual(self.presence.get_online(1), [7])
+
+    def test_expired_member_is_offline(self) -> None:
+        self.presence.apply(1, 8, online=True)
+        self.presence.expires[1][8] -= 30
+        self.assertEqual(self.presence.get_online(1), [])
+
+
+class ChatTestCase(TestCase):
+    """Chat of a student and a teacher with a few messages."""
+
+    def setUp(self) -> None:
+        self.student: Student = Student.objects.create(
+            user=self.create_user("student@test.local")
+        )
+        self.teacher: Teacher = Teacher.objects.create(
+            user=self.create_user("teacher@test.local")
+        )
+        self.chat: PersonalChat = PersonalChat.objects.create(
+            student=self.student,
+            teacher=self.teacher
+        )
+        Message.objects.bulk_create(
+            Message(
+                content=f"Сообщение {number}",
+                owner=self.student.user,
+                to_chat=self.chat
+            )
+            for number in range(3)
+        )
+
+    def create_user(self, email: str) -> CustomUser:
+        return CustomUser.objects.create(
+            email=email,
+            first_name="Тест",
+            last_name="Тестов"
+        )
+
+
+class MessageHistoryTests(ChatTestCase):
+    """MessageHistory slices over the hot and the archived messages."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.archived_ids: list[int] = list(
+            Message.objects.order_by("id").values_list("id", flat=True)
+        )
+        day: int
+        message_id: int
+        for day, message_id in enumerate(self.archived_ids, start=1):
+            Message.objects.filter(id=message_id).update(
+                datetime_created=self.get_date(2020, day)
+            )
+        self.hot_ids: list[int] = [
+            Message.objects.create(
+                content=f"Новое сообщение {day}",
+                owner=self.teacher.user,
+                to_chat=self.chat
+            ).id
+            for day in range(1, 3)
+        ]
+        for day, message_id in enumerate(self.hot_ids, start=1):
+            Message.objects.filter(id=message_id).update(
+                datetime_created=self.get_date(2022, day)
+            )
+        self.moved: dict[str, int] = archive_messages(
+            before=self.get_date(2021, 1),
+            batch_size=2
+        )
+        self.chat.refresh_from_db()
+        self.history: MessageHistory = MessageHistory(self.chat)
+        # Newest first
+        self.ids: list[int] = self.hot_ids[::-1] + self.archived_ids[::-1]
+
+    def get_date(self, year: int, day: int) -> datetime:
+        return timezone.make_aware(datetime(year, 1, day))
+
+    def get_ids(self, history_slice: HistorySlice) -> list[int]:
+        return [message.id for message in history_slice]
+
+    def test_archive_moves_old_messages(self) -> None:
+        self.assertEqual(self.moved, {"2020-01": 3})
+        self.assertEqual(self.chat.archived_messages_count, 3)
+        self.assertEqual(len(self.history), 5)
+
+    def test_hot_slice_skips_archive(self) -> None:
+        history_slice: HistorySlice = self.history[0:2]
+        self.assertIsNone(history_slice.cold)
+        self.assertEqual(self.get_ids(history_slice), self.ids[0:2])
+
+    def test_slice_across_boundary(self) -> None:
+        self.assertEqual(self.get_ids(self.history[1:4]), self.ids[1:4])
+
+    def test_archived_slice(self) -> None:
+        self.assertEqual(self.get_ids(self.history[3:]), self.ids[3:])
+        self.assertEqual(self.get_ids(self.history[4:10]), self.ids[4:])
+
+
+class PersonalChatMessagesAsyncViewTests(ChatTestCase):
+    """Paginated messages of the async endpoint."""
+
+    async def get_messages(self, size: str) -> HttpResponse:
+        token: str = str(
+            RefreshToken.for_user(self.student.user).access_token
+        )
+        return await self.async_client.get(
+            f"/api/v1/async/chats/chats/{self.chat.id}/messages",
+            {"size": size},
+            AUTHORIZATION=f"JWT {token}"
+        )
+
+    async def test_invalid_size_uses_default(self) -> None:
+        response: HttpResponse = await self.get_messages("abc")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 3)
+
+    async def test_size_limits_page(self) -> None:
+        response: HttpResponse = await self.get_messages("2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 2)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+})
+class UserChatsConsumerTests(ChatTestCase):
+    """Presence of the user socket in its subscribed chats."""
+
+    async def connect(self, user: Optional[CustomUser] = None) -> None:
+        """Connect the user socket while another socket is in the chat."""
+        self.channel_layer: BaseChannelLayer = get_channel_layer()
+        # Channel of another socket of the chat
+        self.listener: str = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(
+            get_chat_group_name(self.chat.id),
+            self.listener
+        )
+        self.communicator: WebsocketCommunicator = WebsocketCommunicator(
+            UserChatsConsumer.as_asgi(),
+            "/ws/chats/"
+        )
+        self.communicator.scope["user"] = user or self.student.user
+        connected, _ = await self.communicator.connect()
+        self.assertTrue(connected)
+        self.established: dict[str, Any] = \
+            await self.communicator.receive_json_from()
+
+    async def receive_presence(self) -> dict[str, Any]:
+        return await self.channel_layer.receive(self.listener)
+
+    async def test_connect_registers_presence(self) -> None:
+        await self.connect()
+        self.assertEqual(
+            self.established["online"],
+            {str(self.chat.id): [self.student.user.id]}
+        )
+        event: dict[str, Any] = await self.receive_presence()
+        self.assertEqual(event["type"], "member_presence")
+        self.assertTrue(event["online"])
+        await self.communicator.disconnect()
+
+    async def test_connect_sends_presence_in_one_batch(self) -> None:
+        other_chat: PersonalChat = await PersonalChat.objects.acreate(
+            student=self.student,
+            teacher=await Teacher.objects.acreate(
+                user=await CustomUser.objects.acreate(
+                    email="other@test.local",
+                    first_name="Тест",
+                    last_name="Тестов"
+                )
+            )
+        )
+        batches: list[list[tuple[str, dict[str, Any]]]] = []
+
+        async def group_send_many(
+            messages: list[tuple[str, dict[str, Any]]]
+        ) -> None:
+            batches.append(messages)
+
+        channel_layer: BaseChannelLayer = get_channel_layer()
+        channel_layer.group_send_many = group_send_many
+        try:
+            await self.connect()
+        finally:
+            del channel_layer.group_send_many
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(
+            [group for group, _ in batches[0]],
+            [
+                get_chat_group_name(self.chat.id),
+                get_chat_group_name(other_chat.id),
+            ]
+        )
+        await self.communicator.disconnect()
+
+    async def test_superuser_cannot_subscribe_deleted_chat(self) -> None:
+        await self.connect(user=await CustomUser.objects.acreate(
+            email="admin@test.local",
+            first_name="Тест",
+            last_name="Тестов",
+            is_superuser=True
+        ))
+        await self.communicator.send_json_to(
+            {"type": "subscribe", "chat": self.chat.id}
+        )
+        self.assertEqual(
+            (await self.communicator.receive_json_from())["type"],
+            "subscribed"
+        )
+        await self.communicator.send_json_to(
+            {"type": "unsubscribe", "chat": self.chat.id}
+        )
+        await self.communicator.receive_json_from()
+        await PersonalChat.objects.filter(id=self.chat.id).aupdate(
+            datetime_deleted=timezone.now()
+        )
+        await self.communicator.send_json_to(
+            {"type": "subscribe", "chat": self.chat.id}
+        )
+        self.assertEqual(
+            (await self.communicator.receive_json_from())["code"],
+            "chat_not_found"
+        )
+        await self.communicator.disconnect()
+
+    async def test_unsubscribe_broadcasts_offline(self) -> None:
+        await self.connect()
+        await self.receive_presence()
+        await self.communicator.send_json_to(
+            {"type": "unsubscribe", "chat": self.chat.id}
+        )
+        await self.communicator.receive_json_from()
+        event: dict[str, Any] = await self.receive_presence()
+        self.assertFalse(event["online"])
+        self.assertEqual(chat_presence.get_online(self.chat.id), [])
+        await self.communicator.send_json_to(
+            {"type": "subscribe", "chat": self.chat.id}
+        )
+        await self.communicator.receive_json_from()
+        self.assertTrue((await self.receive_presence())["online"])
+        await self.communicator.disconnect()
+
+    async def test_disconnect_broadcasts_offline(self) -> None:
+        await self.connect()
+        await self.receive_presence()
+        await self.communicator.disconnect()
+        event: dict[str, Any] = await self.receive_presence()
+        self.assertFalse(event["online"])
+        self.assertEqual(chat_presence.get_online(self.chat.id), [])
+
+
+class BroadcastTests(ChatTestCase):
+    """Chats and announcements of a teacher with a class subject cohort."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.class_subject: ClassSubject = ClassSubject.objects.create(
+            name="Математика",
+            general_subject=GeneralSubject.objects.create(name="Математика"),
+            attached_class=Class.objects.create(number=5)
+        )
+        self.teacher.tought_subjects.add(self.class_subject)
+        self.classmate: Student = Student.objects.create(
+            user=self.create_user("classmate@test.local")
+        )
+        state: StudentSubjectState = StudentSubjectState.objects.create(
+            name=StudentSubjectState.ACTIVE
+        )
+        StudentRegisteredSubjects.objects.bulk_create(
+            StudentRegisteredSubjects(
+                student=student,
+                class_subject=self.class_subject,
+                current_state=state
+            )
+            for student in (self.student, self.classmate)
+        )
+
+    def test_provision_counts_created_chats(self) -> None:
+        # The student already has a chat with the teacher
+        self.assertEqual(
+            provision_chats(self.teacher.id, self.class_subject.id),
+            1
+        )
+        self.assertTrue(
+            PersonalChat.objects.filter(
+                student=self.classmate,
+                teacher=self.teacher
+            ).exists()
+        )
+        self.assertEqual(
+            provision_chats(self.teacher.id, self.class_subject.id),
+            0
+        )
+
+    def test_admin_broadcast_is_owned_by_teacher(self) -> None:
+        admin: CustomUser = self.create_user("admin@test.local")
+        admin.is_superuser = True
+        admin.save()
+        token: str = str(RefreshToken.for_user(admin).access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            response: HttpResponse = self.client.post(
+                "/api/v1/chats/chats/broadcast",
+                {
+                    "class_subject": self.class_subject.id,
+                    "teacher": self.teacher.id,
+                    "content": "Объявление",
+                },
+                content_type="application/json",
+                HTTP_AUTHORIZATION=f"JWT {token}"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(
+                Message.objects.filter(content="Объявление").values_list(
+                    "owner_id",
+                    flat=True
+                )
+            ),
+            [self.teacher.user_id]
+        )
+
+
+class DatabaseChannelLayerTests(SimpleTestCase):
+    """Transports and payload packing of DatabaseChannelLayer."""
+
+    def test_transport_requires_write_and_listen(self) -> None:
+        with self.assertRaises(TypeError):
+            Transport(expiry=60)
+
+    def test_events_are_packed_within_the_limit(self) -> None:
+        layer: DatabaseChannelLayer = DatabaseChannelLayer(
+            backend="sqlite",
+            path=":memory:"
+        )
+        events: list[str] = [
+            json.dumps({"g": f"chat_{number}", "m": {"text": "x" * 1000}})
+            for number in range(20)
+        ]
+        payloads: list[str] = layer.pack(origin="worker", events=events)
+        self.assertGreater(len(payloads), 1)
+        payload: str
+        for payload in payloads:
+            self.assertLessEqual(len(payload.encode()), MAX_PAYLOAD_BYTES)
+        self.assertEqual(
+            [
+                event
+                for payload in payloads
+                for event in json.loads(payload)["e"]
+            ],
+            [json.loads(event) for event in events]
+        )
+        layer.transport.close()
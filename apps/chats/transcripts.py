@@ -0,0 +1,145 @@
+"""Streaming export of chat transcripts as JSON lines or CSV.
+
+Messages are read oldest first, the archive before the messages table,
+through iterator(chunk_size) over a values() projection, which uses a
+server-side cursor on PostgreSQL. Lines are joined into parts of about
+FILE_DOWNLOADS["CHUNK_SIZE"] bytes, so memory does not depend on the
+chat length. The first line is sent on its own as soon as it is read.
+"""
+import csv
+import json
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+)
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from chats.models import (
+    ArchivedMessage,
+    Message,
+    PersonalChat,
+)
+
+TRANSCRIPT_FORMATS: dict[str, str] = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+TRANSCRIPT_FIELDS: tuple[str, ...] = (
+    "id",
+    "datetime_created",
+    "owner_id",
+    "owner__email",
+    "content",
+    "datetime_deleted",
+)
+TRANSCRIPT_COLUMNS: tuple[str, ...] = (
+    "id",
+    "datetime_created",
+    "owner_id",
+    "owner_email",
+    "content",
+    "is_deleted",
+)
+
+
+class Echo:
+    """File-like object returning what csv.writer writes."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_messages(
+    chat: PersonalChat,
+    chunk_size: int
+) -> Iterator[dict[str, Any]]:
+    """Iterate over messages of the chat, oldest first."""
+    querysets: list[QuerySet] = []
+    if chat.archived_messages_count:
+        querysets.append(
+            ArchivedMessage.objects.filter(
+                to_chat_id=chat.id
+            ).order_by("datetime_created")
+        )
+    querysets.append(
+        Message.objects.filter(to_chat_id=chat.id).order_by("id")
+    )
+    queryset: QuerySet
+    for queryset in querysets:
+        yield from queryset.values(*TRANSCRIPT_FIELDS).iterator(
+            chunk_size=chunk_size
+        )
+
+
+def get_row(message: dict[str, Any]) -> tuple[Any, ...]:
+    return (
+        message["id"],
+        message["datetime_created"].isoformat(),
+        message["owner_id"],
+        message["owner__email"],
+        message["content"],
+        message["datetime_deleted"] is not None,
+    )
+
+
+def iter_jsonl(messages: Iterable[dict[str, Any]]) -> Iterator[str]:
+    message: dict[str, Any]
+    for message in messages:
+        yield json.dumps(
+            dict(zip(TRANSCRIPT_COLUMNS, get_row(message))),
+            ensure_ascii=False
+        ) + "\n"
+
+
+def iter_csv(messages: Iterable[dict[str, Any]]) -> Iterator[str]:
+    writer: Any = csv.writer(Echo())
+    yield writer.writerow(TRANSCRIPT_COLUMNS)
+    message: dict[str, Any]
+    for message in messages:
+        yield writer.writerow(get_row(message))
+
+
+def iter_parts(lines: Iterable[str], part_size: int) -> Iterator[bytes]:
+    """Join encoded lines into parts of about part_size bytes."""
+    part: list[bytes] = []
+    size: int = 0
+    first: bool = True
+    line: str
+    for line in lines:
+        encoded: bytes = line.encode()
+        part.append(encoded)
+        size += len(encoded)
+        if size >= part_size or first:
+            first = False
+            yield b"".join(part)
+            part = []
+            size = 0
+    if part:
+        yield b"".join(part)
+
+
+def get_transcript_response(
+    chat: PersonalChat,
+    export_format: str
+) -> StreamingHttpResponse:
+    """Get response streaming the transcript in the format."""
+    messages: Iterator[dict[str, Any]] = iter_messages(
+        chat=chat,
+        chunk_size=settings.CHAT_TRANSCRIPTS.get("CHUNK_SIZE", 2000)
+    )
+    lines: Iterator[str] = iter_csv(messages) if export_format == "csv" \
+        else iter_jsonl(messages)
+    response: StreamingHttpResponse = StreamingHttpResponse(
+        iter_parts(
+            lines=lines,
+            part_size=settings.FILE_DOWNLOADS.get("CHUNK_SIZE", 64 * 1024)
+        ),
+        content_type=TRANSCRIPT_FORMATS[export_format]
+    )
+    response["Content-Disposition"] = \
+        f'attachment; filename="chat_{chat.id}.{export_format}"'
+    return response
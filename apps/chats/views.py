@@ -1,6 +1,7 @@
 # from django.shortcuts import render
 from typing import (
     Any,
+    Optional,
     Union,
 )
 
@@ -9,23 +10,47 @@ from rest_framework.response import Response as DRF_Response
 from rest_framework.viewsets import ViewSet
 from rest_framework.decorators import action
 from rest_framework.status import (
+    HTTP_200_OK,
     HTTP_403_FORBIDDEN,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
 )
 
 from django.db.models import (
+    Exists,
     Manager,
+    OuterRef,
     QuerySet,
     Q,
 )
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.views import View
 
 from abstracts.mixins import ModelInstanceMixin
-from abstracts.handlers import DRFResponseHandler
+from abstracts.handlers import (
+    AsyncResponseHandler,
+    DRFResponseHandler,
+)
 from abstracts.paginators import AbstractPageNumberPaginator
+from abstracts.tools import conver_to_int_or_none
+from chats.broadcast import (
+    MAX_CONTENT_LENGTH,
+    broadcast_message,
+    get_cohort_chats,
+    provision_chats,
+)
 from chats.models import (
     PersonalChat,
     Message,
 )
+from chats.history import (
+    MessageHistory,
+    get_page_size,
+)
 from chats.serializers import (
     PersonalChatBaseModelSerializer,
     PersonalChatListSerializer,
@@ -33,8 +58,18 @@ from chats.serializers import (
     MessageCreateModelSerializer,
     MessageBaseModelSerializer,
 )
-from chats.permissions import IsChatMember
+from chats.permissions import (
+    IsChatMember,
+    IsChatTeacher,
+)
+from chats.transcripts import (
+    TRANSCRIPT_FORMATS,
+    get_transcript_response,
+)
+from auths.models import CustomUser
 from auths.permissions import IsNonDeletedUser
+from subjectss.models import ClassSubject
+from teaching.models import Teacher
 
 
 class PersonalChatViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
@@ -208,6 +243,281 @@ class PersonalChatViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
             status=HTTP_400_BAD_REQUEST
         )
 
+    def get_cohort_or_response(
+        self,
+        request: DRF_Request
+    ) -> tuple[Union[tuple[int, int], DRF_Response], bool]:
+        """Get teacher and class subject ids of a class-wide request.
+
+        Teachers act for themselves on the subjects they teach, admins
+        pass the "teacher".
+        """
+        class_subject_id: Optional[int] = conver_to_int_or_none(
+            str(request.data.get("class_subject"))
+        )
+        teacher_id: Optional[int]
+        if request.user.is_superuser:
+            teacher_id = conver_to_int_or_none(
+                str(request.data.get("teacher"))
+            )
+        else:
+            teacher_id = Teacher.objects.filter(
+                user=request.user
+            ).values_list("id", flat=True).first()
+            if teacher_id is None:
+                return DRF_Response(
+                    data={"response": IsChatTeacher.message},
+                    status=HTTP_403_FORBIDDEN
+                ), False
+        if class_subject_id is None or teacher_id is None:
+            return DRF_Response(
+                data={"response": "Укажите class_subject и teacher"},
+                status=HTTP_400_BAD_REQUEST
+            ), False
+        taught: Optional[bool] = ClassSubject.objects.get_not_deleted(
+        ).filter(id=class_subject_id).annotate(
+            is_taught=Exists(
+                Teacher.objects.filter(
+                    id=teacher_id,
+                    tought_subjects=OuterRef("id")
+                )
+            )
+        ).values_list("is_taught", flat=True).first()
+        if taught is None:
+            return DRF_Response(
+                data={
+                    "response": "Предмет класса с ID: "
+                    f"{class_subject_id} не найден"
+                },
+                status=HTTP_404_NOT_FOUND
+            ), False
+        if not taught:
+            return DRF_Response(
+                data={"response": "Преподаватель не ведёт этот предмет"},
+                status=HTTP_403_FORBIDDEN
+            ), False
+        return (teacher_id, class_subject_id), True
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="provision",
+        permission_classes=(IsNonDeletedUser,)
+    )
+    def provision(
+        self,
+        request: DRF_Request,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> DRF_Response:
+        """Create chats of the teacher with students of the subject."""
+        res_cohort: Union[tuple[int, int], DRF_Response]
+        is_valid: bool = False
+        res_cohort, is_valid = self.get_cohort_or_response(request=request)
+        if not is_valid:
+            return res_cohort
+        teacher_id: int
+        class_subject_id: int
+        teacher_id, class_subject_id = res_cohort
+        created: int = provision_chats(
+            teacher_id=teacher_id,
+            class_subject_id=class_subject_id
+        )
+        return DRF_Response(
+            data={
+                "response": f"Создано чатов: {created}",
+                "created": created,
+            },
+            status=HTTP_200_OK
+        )
+
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="broadcast",
+        permission_classes=(IsNonDeletedUser,)
+    )
+    def broadcast(
+        self,
+        request: DRF_Request,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> DRF_Response:
+        """Send the message to chats of the teacher with the subject.
+
+        Chats are not created here, provision them first.
+        """
+        content: Any = request.data.get("content")
+        if not isinstance(content, str) or not content.strip() or \
+                len(content) > MAX_CONTENT_LENGTH:
+            return DRF_Response(
+                data={
+                    "response": "content должен быть непустой строкой "
+                    f"до {MAX_CONTENT_LENGTH} символов"
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        res_cohort: Union[tuple[int, int], DRF_Response]
+        is_valid: bool = False
+        res_cohort, is_valid = self.get_cohort_or_response(request=request)
+        if not is_valid:
+            return res_cohort
+        teacher_id: int
+        class_subject_id: int
+        teacher_id, class_subject_id = res_cohort
+        chat_ids: list[int] = list(
+            get_cohort_chats(
+                teacher_id=teacher_id,
+                class_subject_id=class_subject_id
+            ).values_list("id", flat=True)
+        )
+        owner_id: int = request.user.id
+        if request.user.is_superuser:
+            # Students get the announcement from their teacher
+            owner_id = Teacher.objects.filter(id=teacher_id).values_list(
+                "user_id", flat=True
+            ).get()
+        messages: list[Message] = broadcast_message(
+            owner_id=owner_id,
+            chat_ids=chat_ids,
+            content=content
+        )
+        return DRF_Response(
+            data={
+                "response": f"Отправлено сообщений: {len(messages)}",
+                "sent": len(messages),
+            },
+            status=HTTP_200_OK
+        )
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="transcript",
+        permission_classes=(IsNonDeletedUser, IsChatTeacher,)
+    )
+    def transcript(
+        self,
+        request: DRF_Request,
+        pk: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> Union[StreamingHttpResponse, DRF_Response]:
+        """Stream all messages of the chat as JSON lines or CSV."""
+        export_format: str = request.query_params.get("file_format", "jsonl")
+        if export_format not in TRANSCRIPT_FORMATS:
+            return DRF_Response(
+                data={
+                    "response": "Поддерживаемые форматы: {0}".format(
+                        ", ".join(TRANSCRIPT_FORMATS)
+                    )
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        res_chat: Union[PersonalChat, DRF_Response]
+        is_existed: bool = False
+        res_chat, is_existed = self.get_obj_or_response(
+            request=request,
+            pk=pk,
+            class_name=PersonalChat,
+            queryset=self.get_queryset().select_related("teacher")
+        )
+        if not is_existed:
+            return res_chat
+        self.check_object_permissions(
+            request=request,
+            obj=res_chat
+        )
+        return get_transcript_response(
+            chat=res_chat,
+            export_format=export_format
+        )
+
 
 # def index(request):
 #     return render(request=request, template_name='chat/index.html')
+
+
+# ------------------------------------------
+# Async read endpoints
+#
+class PersonalChatAsyncListView(AsyncResponseHandler, View):
+    """Async variant of PersonalChatViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to obtain non_deleted chats."""
+        user: Optional[CustomUser]
+        error_response: Optional[HttpResponse]
+        user, error_response = await self.authenticate(request)
+        if error_response:
+            return error_response
+        is_deleted: bool = bool(request.GET.get("is_deleted", False))
+        if is_deleted and not user.is_superuser:
+            return self.get_message_response(
+                "Вы не можете запрашивать удалённые чаты",
+                HTTP_403_FORBIDDEN
+            )
+        queryset: QuerySet[PersonalChat] = \
+            PersonalChat.objects.get_deleted() if is_deleted \
+            else PersonalChat.objects.get_not_deleted()
+        return await self.get_async_response(
+            request=request,
+            data=queryset.filter(
+                Q(student__user_id=user.id) | Q(teacher__user_id=user.id)
+            ).select_related(
+                "student",
+                "teacher",
+                "student__user",
+                "teacher__user"
+            ),
+            serializer_class=PersonalChatListSerializer,
+            many=True
+        )
+
+
+class PersonalChatMessagesAsyncView(AsyncResponseHandler, View):
+    """Async variant of messages of PersonalChatViewSet.retrieve."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        pk: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to obtain paginated messages of the chat."""
+        user: Optional[CustomUser]
+        error_response: Optional[HttpResponse]
+        user, error_response = await self.authenticate(request)
+        if error_response:
+            return error_response
+        chat: Optional[PersonalChat] = await PersonalChat.objects \
+            .get_not_deleted().filter(pk=pk).select_related(
+                "student",
+                "teacher"
+            ).afirst()
+        if not chat:
+            return self.get_message_response(
+                f"Объект с ID: {pk} не найден или удалён",
+                HTTP_404_NOT_FOUND
+            )
+        if user.id not in (chat.student.user_id, chat.teacher.user_id) \
+                and not user.is_superuser:
+            return self.get_message_response(
+                IsChatMember.message,
+                HTTP_403_FORBIDDEN
+            )
+        paginator: AbstractPageNumberPaginator = AbstractPageNumberPaginator()
+        paginator.page_size = get_page_size(request.GET.get("size"))
+        return await self.get_async_response(
+            request=request,
+            data=MessageHistory(chat=chat),
+            serializer_class=MessageBaseModelSerializer,
+            many=True,
+            paginator=paginator
+        )
@@ -89,7 +89,7 @@ class TopicAdmin(AbstractAdminIsDeleted, ModelAdmin):
 
     def get_short_content(self, obj: Optional[Topic] = None) -> str:
         """Get shortened content of the topic."""
-        return f"{obj.content[:50]}..." if obj else "No content"
+        return f"{obj.excerpt}..." if obj else "No content"
     get_short_content.short_description = "Контент"
 
     def get_readonly_fields(
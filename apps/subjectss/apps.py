@@ -5,3 +5,6 @@ class SubjectssConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subjectss'
     verbose_name: str = "Предметы и направления"
+
+    def ready(self) -> None:
+        import subjectss.signals  # noqa
@@ -0,0 +1,315 @@
+"""In-memory student rankings by points.
+
+Every board keeps (-points, student_id) keys in a sorted list, so a rank is
+a bisect and a points change is one removal and one insort. Boards are
+built from the database on first use, updated by this process' signals and
+rebuilt every LEADERBOARD["REBUILD_INTERVAL"] seconds to pick up changes
+made by other workers. One caller rebuilds stale boards while the others
+keep reading the current ones; only the first build is waited for.
+"""
+from bisect import (
+    bisect_left,
+    insort,
+)
+from threading import (
+    Lock,
+    RLock,
+)
+from time import monotonic
+from typing import (
+    Any,
+    Optional,
+)
+
+from django.conf import settings
+
+from subjectss.models import (
+    ClassSubject,
+    Student,
+    StudentRegisteredSubjects,
+)
+
+GLOBAL_SCOPE = "global"
+CLASS_SCOPE = "class"
+CLASS_SUBJECT_SCOPE = "class_subject"
+SCOPES: tuple[str, ...] = (GLOBAL_SCOPE, CLASS_SCOPE, CLASS_SUBJECT_SCOPE)
+
+BoardKey = tuple[str, Optional[int]]
+
+
+class SortedBoard:
+    """Ranking of students kept as a sorted list of (-points, id)."""
+
+    def __init__(self) -> None:
+        self.keys: list[tuple[int, int]] = []
+        self.points: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, student_id: int) -> bool:
+        return student_id in self.points
+
+    def set(self, student_id: int, points: int) -> None:
+        """Add the student or move them to the new points."""
+        if student_id in self.points:
+            if self.points[student_id] == points:
+                return
+            self.remove(student_id)
+        self.points[student_id] = points
+        insort(self.keys, (-points, student_id))
+
+    def remove(self, student_id: int) -> None:
+        points: Optional[int] = self.points.pop(student_id, None)
+        if points is None:
+            return
+        index: int = bisect_left(self.keys, (-points, student_id))
+        del self.keys[index]
+
+    def get_rank(self, student_id: int) -> Optional[int]:
+        """Get 1-based rank; students with equal points share it."""
+        points: Optional[int] = self.points.get(student_id)
+        if points is None:
+            return None
+        return bisect_left(self.keys, (-points,)) + 1
+
+    def get_entry(self, index: int) -> dict[str, int]:
+        points: int = -self.keys[index][0]
+        return {
+            "rank": bisect_left(self.keys, (-points,)) + 1,
+            "student_id": self.keys[index][1],
+            "points": points,
+        }
+
+    def get_top(self, limit: int) -> list[dict[str, int]]:
+        return [
+            self.get_entry(index)
+            for index in range(min(limit, len(self.keys)))
+        ]
+
+    def get_neighbors(
+        self,
+        student_id: int,
+        count: int
+    ) -> list[dict[str, int]]:
+        """Get the student's entry with count entries above and below."""
+        points: Optional[int] = self.points.get(student_id)
+        if points is None:
+            return []
+        index: int = bisect_left(self.keys, (-points, student_id))
+        return [
+            self.get_entry(position)
+            for position in range(
+                max(index - count, 0),
+                min(index + count + 1, len(self.keys))
+            )
+        ]
+
+
+class Leaderboards:
+    """Global, per class and per class subject boards of the process."""
+
+    def __init__(self, rebuild_interval: float) -> None:
+        self.rebuild_interval = rebuild_interval
+        self.lock: RLock = RLock()
+        # Held by the caller rebuilding the boards
+        self.rebuild_lock: Lock = Lock()
+        self.boards: dict[BoardKey, SortedBoard] = {}
+        self.points: dict[int, int] = {}
+        self.student_subjects: dict[int, set[int]] = {}
+        self.subject_classes: dict[int, int] = {}
+        self.built_at: Optional[float] = None
+
+    def get_board_keys(self, student_id: int) -> set[BoardKey]:
+        """Get keys of all boards the student belongs to."""
+        keys: set[BoardKey] = {(GLOBAL_SCOPE, None)}
+        class_subject_id: int
+        for class_subject_id in self.student_subjects.get(student_id, ()):
+            keys.add((CLASS_SUBJECT_SCOPE, class_subject_id))
+            class_id: Optional[int] = self.subject_classes.get(
+                class_subject_id
+            )
+            if class_id is not None:
+                keys.add((CLASS_SCOPE, class_id))
+        return keys
+
+    def rebuild(self) -> None:
+        """Load all boards from the database."""
+        points: dict[int, int] = dict(
+            Student.objects.values_list("id", "points")
+        )
+        subject_classes: dict[int, int] = dict(
+            ClassSubject.objects.values_list("id", "attached_class_id")
+        )
+        student_subjects: dict[int, set[int]] = {}
+        student_id: int
+        class_subject_id: int
+        for student_id, class_subject_id in \
+                StudentRegisteredSubjects.objects.values_list(
+                    "student_id", "class_subject_id"
+                ):
+            student_subjects.setdefault(student_id, set()).add(
+                class_subject_id
+            )
+
+        with self.lock:
+            self.points = points
+            self.subject_classes = subject_classes
+            self.student_subjects = student_subjects
+            self.boards = {}
+            student_points: int
+            for student_id, student_points in points.items():
+                key: BoardKey
+                for key in self.get_board_keys(student_id):
+                    self.boards.setdefault(key, SortedBoard()).set(
+                        student_id, student_points
+                    )
+            self.built_at = monotonic()
+
+    def is_stale(self) -> bool:
+        return self.built_at is None or \
+            monotonic() - self.built_at >= self.rebuild_interval
+
+    def ensure_built(self) -> None:
+        """Rebuild stale boards unless another caller is rebuilding them."""
+        if not self.is_stale():
+            return
+        # Without boards there is nothing to serve meanwhile
+        if not self.rebuild_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            # The boards may have been rebuilt while waiting
+            if self.is_stale():
+                self.rebuild()
+        finally:
+            self.rebuild_lock.release()
+
+    def invalidate(self) -> None:
+        """Rebuild the boards on the next access."""
+        self.built_at = None
+
+    # ------------------------------------------
+    # Incremental updates
+    #
+    def update_points(self, student_id: int, points: int) -> None:
+        with self.lock:
+            if self.built_at is None:
+                return
+            self.points[student_id] = points
+            key: BoardKey
+            for key in self.get_board_keys(student_id):
+                self.boards.setdefault(key, SortedBoard()).set(
+                    student_id, points
+                )
+
+    def remove_student(self, student_id: int) -> None:
+        with self.lock:
+            if self.built_at is None:
+                return
+            key: BoardKey
+            for key in self.get_board_keys(student_id):
+                if key in self.boards:
+                    self.boards[key].remove(student_id)
+            self.points.pop(student_id, None)
+            self.student_subjects.pop(student_id, None)
+
+    def add_registration(self, student_id: int, class_subject_id: int) -> None:
+        with self.lock:
+            self.set_registrations(
+                student_id,
+                self.student_subjects.get(student_id, set()) |
+                {class_subject_id}
+            )
+
+    def remove_registration(
+        self,
+        student_id: int,
+        class_subject_id: int
+    ) -> None:
+        with self.lock:
+            self.set_registrations(
+                student_id,
+                self.student_subjects.get(student_id, set()) -
+                {class_subject_id}
+            )
+
+    def set_registrations(
+        self,
+        student_id: int,
+        class_subject_ids: set[int]
+    ) -> None:
+        """Move the student to the boards of the registered subjects."""
+        with self.lock:
+            if self.built_at is None:
+                return
+            if any(
+                class_subject_id not in self.subject_classes
+                for class_subject_id in class_subject_ids
+            ):
+                # Unknown subject was created by another worker
+                self.invalidate()
+                return
+            points: Optional[int] = self.points.get(student_id)
+            old_keys: set[BoardKey] = self.get_board_keys(student_id)
+            self.student_subjects[student_id] = class_subject_ids
+            new_keys: set[BoardKey] = self.get_board_keys(student_id)
+            key: BoardKey
+            for key in old_keys - new_keys:
+                if key in self.boards:
+                    self.boards[key].remove(student_id)
+            if points is None:
+                return
+            for key in new_keys - old_keys:
+                self.boards.setdefault(key, SortedBoard()).set(
+                    student_id, points
+                )
+
+    # ------------------------------------------
+    # Queries
+    #
+    def get_top(
+        self,
+        scope: str,
+        scope_id: Optional[int],
+        limit: int
+    ) -> list[dict[str, int]]:
+        self.ensure_built()
+        with self.lock:
+            board: Optional[SortedBoard] = self.boards.get((scope, scope_id))
+            return board.get_top(limit) if board else []
+
+    def get_neighbors(
+        self,
+        scope: str,
+        scope_id: Optional[int],
+        student_id: int,
+        count: int
+    ) -> tuple[Optional[int], int, list[dict[str, int]]]:
+        """Get rank of the student, board size and neighbor entries."""
+        self.ensure_built()
+        with self.lock:
+            board: Optional[SortedBoard] = self.boards.get((scope, scope_id))
+            if not board:
+                return (None, 0, [])
+            return (
+                board.get_rank(student_id),
+                len(board),
+                board.get_neighbors(student_id, count),
+            )
+
+
+leaderboards: Leaderboards = Leaderboards(
+    rebuild_interval=settings.LEADERBOARD.get("REBUILD_INTERVAL", 300)
+)
+
+
+def attach_students(entries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Add student objects to the entries with one query."""
+    students: dict[int, Student] = Student.objects.select_related(
+        "user"
+    ).in_bulk([entry["student_id"] for entry in entries])
+    return [
+        {**entry, "student": students[entry["student_id"]]}
+        for entry in entries
+        if entry["student_id"] in students
+    ]
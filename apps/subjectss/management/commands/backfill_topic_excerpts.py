@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+
+from subjectss.models import Topic
+
+
+class Command(BaseCommand):
+    """Fill Topic.excerpt and Topic.content_length of existing topics."""
+
+    help = "Заполнение начала и длины текстового материала тем"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Количество тем в одном запросе обновления"
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Recompute summaries batch by batch."""
+        start_time: datetime = datetime.now()
+        batch_size: int = options["batch_size"]
+        batch: list[Topic] = []
+        updated: int = 0
+        topic: Topic
+        for topic in Topic.objects.only("id", "content").iterator(
+            chunk_size=batch_size
+        ):
+            topic.update_content_summary()
+            batch.append(topic)
+            if len(batch) == batch_size:
+                updated += self.update_batch(batch)
+                batch = []
+        updated += self.update_batch(batch)
+
+        print(
+            "Обновлено тем: {}, за {} секунд".format(
+                updated,
+                (datetime.now()-start_time).total_seconds()
+            )
+        )
+
+    def update_batch(self, batch: list[Topic]) -> int:
+        if not batch:
+            return 0
+        return Topic.objects.bulk_update(
+            batch,
+            fields=("excerpt", "content_length")
+        )
@@ -6,6 +6,7 @@ from typing import (
 from django.db.models import (
     CharField,
     IntegerField,
+    PositiveIntegerField,
     ManyToManyField,
     Model,
     ForeignKey,
@@ -32,6 +33,8 @@ from apps.subjectss.validators import validate_negative_class_number
 
 class StudentSubjectState(AbstractDateTime):
     STATE_NAME_LIM = 200
+    # Natural key of the state of new registrations
+    ACTIVE = "Активный"
 
     name: CharField = CharField(
         max_length=STATE_NAME_LIM,
@@ -144,6 +147,7 @@ class ClassSubject(AbstractDateTime):
 class Topic(AbstractDateTime):
     TOPIC_NAME_LIMIT = 240
     VIDEO_LINK_URL = 250
+    EXCERPT_LENGTH = 50
 
     name: CharField = CharField(
         max_length=TOPIC_NAME_LIMIT,
@@ -152,6 +156,18 @@ class Topic(AbstractDateTime):
     content: TextField = TextField(
         verbose_name="Текстовый материал"
     )
+    excerpt: CharField = CharField(
+        max_length=EXCERPT_LENGTH,
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name="Начало текстового материала"
+    )
+    content_length: PositiveIntegerField = PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Длина текстового материала"
+    )
     content_file: FileField = FileField(
         upload_to="documents/topic_files/%Y/%m/%d",
         null=True,
@@ -178,6 +194,23 @@ class Topic(AbstractDateTime):
     def __str__(self) -> str:
         return self.name
 
+    def update_content_summary(self) -> None:
+        """Fill excerpt and content_length from the content."""
+        self.excerpt = self.content[:self.EXCERPT_LENGTH]
+        self.content_length = len(self.content)
+
+    def save(self, *args: tuple[Any], **kwargs: dict[str, Any]) -> None:
+        update_fields: Optional[Any] = kwargs.get("update_fields")
+        if "content" not in self.get_deferred_fields() and (
+            update_fields is None or "content" in update_fields
+        ):
+            self.update_content_summary()
+            if update_fields is not None:
+                kwargs["update_fields"] = {
+                    *update_fields, "excerpt", "content_length"
+                }
+        super().save(*args, **kwargs)
+
 
 class TrackWay(AbstractDateTime):
     TRACKWAY_NAME_LIMIT = 200
@@ -213,6 +246,7 @@ class Student(Model):
     )
     points: IntegerField = IntegerField(
         default=0,
+        db_index=True,
         validators=[validate_negative_int],
         verbose_name="Баллы"
     )
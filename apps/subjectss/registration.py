@@ -0,0 +1,137 @@
+"""Registration of students for class subjects without check-then-insert.
+
+Rows are inserted with conflicts ignored on the unique_student_class_subject
+constraint, so concurrent registrations for the same subject cannot fail
+and a batch takes one validating query and one insert. Registrations
+inserted by a concurrent request between the two are reported as
+registered, which is what the student asked for.
+"""
+from functools import partial
+from typing import Iterable
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import (
+    Exists,
+    OuterRef,
+)
+
+from abstracts.reference import reference_data
+from auths.models import CustomUser
+from subjectss.leaderboard import leaderboards
+from subjectss.models import (
+    ClassSubject,
+    Student,
+    StudentRegisteredSubjects,
+    StudentSubjectState,
+)
+
+MAX_SUBJECTS_PER_REQUEST = 50
+
+REGISTERED = "registered"
+ALREADY_REGISTERED = "already_registered"
+NOT_FOUND = "not_found"
+
+
+def register_subjects(
+    student_id: int,
+    class_subject_ids: Iterable[int]
+) -> dict[int, str]:
+    """Register the student for the subjects, get outcome by subject id."""
+    class_subject_ids = list(dict.fromkeys(class_subject_ids))
+    found: dict[int, bool] = dict(
+        ClassSubject.objects.get_not_deleted().filter(
+            id__in=class_subject_ids
+        ).annotate(
+            is_registered=Exists(
+                StudentRegisteredSubjects.objects.filter(
+                    student_id=student_id,
+                    class_subject_id=OuterRef("id")
+                )
+            )
+        ).values_list("id", "is_registered")
+    )
+    outcomes: dict[int, str] = {
+        class_subject_id: NOT_FOUND if class_subject_id not in found
+        else ALREADY_REGISTERED if found[class_subject_id]
+        else REGISTERED
+        for class_subject_id in class_subject_ids
+    }
+    state_id: int = reference_data.get_id(
+        StudentSubjectState,
+        StudentSubjectState.ACTIVE
+    )
+    new_registrations: list[StudentRegisteredSubjects] = [
+        StudentRegisteredSubjects(
+            student_id=student_id,
+            class_subject_id=class_subject_id,
+            current_state_id=state_id
+        )
+        for class_subject_id, outcome in outcomes.items()
+        if outcome == REGISTERED
+    ]
+    if new_registrations:
+        StudentRegisteredSubjects.objects.bulk_create(
+            new_registrations,
+            ignore_conflicts=True
+        )
+        # bulk_create sends no post_save for post_save_registration
+        transaction.on_commit(
+            partial(
+                add_registrations,
+                student_id,
+                [
+                    registration.class_subject_id
+                    for registration in new_registrations
+                ]
+            )
+        )
+    return outcomes
+
+
+def add_registrations(student_id: int, class_subject_ids: list[int]) -> None:
+    """Add the student to the boards of the registered subjects."""
+    class_subject_id: int
+    for class_subject_id in class_subject_ids:
+        leaderboards.add_registration(student_id, class_subject_id)
+
+
+def enroll_class(class_subject_id: int, class_id: int) -> int:
+    """Register the class cohort for the subject, get new registrations.
+
+    The cohort is active students registered for any non-deleted subject of
+    the class. One INSERT ... SELECT, existing registrations are skipped.
+    """
+    registrations: str = StudentRegisteredSubjects._meta.db_table
+    class_subjects: str = ClassSubject._meta.db_table
+    students: str = Student._meta.db_table
+    users: str = CustomUser._meta.db_table
+    with connection.cursor() as cursor:
+        # SQLite needs the WHERE clause to parse ON CONFLICT after SELECT
+        cursor.execute(
+            f"INSERT INTO {registrations} "
+            f"(student_id, class_subject_id, current_state_id) "
+            f"SELECT DISTINCT r.student_id, %s, %s FROM {registrations} r "
+            f"JOIN {class_subjects} cs ON cs.id = r.class_subject_id "
+            f"JOIN {students} s ON s.id = r.student_id "
+            f"JOIN {users} u ON u.id = s.user_id "
+            f"WHERE cs.attached_class_id = %s "
+            f"AND cs.datetime_deleted IS NULL "
+            f"AND u.datetime_deleted IS NULL AND u.is_active "
+            f"ON CONFLICT (student_id, class_subject_id) DO NOTHING",
+            [
+                class_subject_id,
+                reference_data.get_id(
+                    StudentSubjectState,
+                    StudentSubjectState.ACTIVE
+                ),
+                class_id,
+            ]
+        )
+        enrolled: int = cursor.rowcount
+    if enrolled:
+        # The boards learn about rows inserted by SQL only from a rebuild
+        transaction.on_commit(leaderboards.invalidate)
+    return enrolled
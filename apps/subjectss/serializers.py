@@ -7,8 +7,11 @@ from typing import (
 
 from rest_framework.serializers import (
     ModelSerializer,
+    Serializer,
     SerializerMethodField,
     DateTimeField,
+    CharField,
+    IntegerField,
 )
 
 
@@ -20,7 +23,10 @@ from subjectss.models import (
     Topic,
     Student,
 )
-from abstracts.serializers import AbstractDateTimeSerializer
+from abstracts.serializers import (
+    AbstractDateTimeSerializer,
+    ReferenceField,
+)
 from abstracts.paginators import AbstractPageNumberPaginator
 
 
@@ -87,7 +93,7 @@ class TopicBaseSerializer(AbstractDateTimeSerializer, ModelSerializer):
 
     def get_short_content(self, obj: Topic) -> str:
         """Get shoted content."""
-        return f"{obj.content[:50]}..." if obj else ""
+        return f"{obj.excerpt}..." if obj else ""
 
 
 class TopicListSerializer(AbstractDateTimeSerializer, ModelSerializer):
@@ -173,7 +179,9 @@ class ClassSubjectBaseSerializer(AbstractDateTimeSerializer, ModelSerializer):
     is_deleted: SerializerMethodField = AbstractDateTimeSerializer.is_deleted
     datetime_created: DateTimeField = \
         AbstractDateTimeSerializer.datetime_created
-    attached_class: ClassBaseSerializer = ClassBaseSerializer()
+    attached_class: ReferenceField = ReferenceField(
+        serializer_class=ClassBaseSerializer
+    )
     general_subject: GeneralSubjectBaseSerializer = \
         GeneralSubjectBaseSerializer()
 
@@ -215,7 +223,9 @@ class ClassSubjectDetailSerializer(ClassSubjectBaseSerializer):
             'size'
         ) or 15
         objects: list = paginator.paginate_queryset(
-            queryset=obj.topics.get_not_deleted().order_by("datetime_created"),
+            queryset=obj.topics.get_not_deleted().defer(
+                "content"
+            ).order_by("datetime_created"),
             request=self.context['request']
         )
         serializer: TopicBaseSerializer = TopicBaseSerializer(
@@ -241,3 +251,26 @@ class StudentForeignSerializer(ModelSerializer):
             "points",
             "registered_subjects",
         )
+
+
+class StudentLeaderboardSerializer(ModelSerializer):
+    """StudentLeaderboardSerializer."""
+
+    first_name: CharField = CharField(source="user.first_name")
+    last_name: CharField = CharField(source="user.last_name")
+
+    class Meta:
+        model: Student = Student
+        fields: Union[str, tuple[str]] = (
+            "id",
+            "first_name",
+            "last_name",
+        )
+
+
+class LeaderboardEntrySerializer(Serializer):
+    """LeaderboardEntrySerializer."""
+
+    rank: IntegerField = IntegerField()
+    points: IntegerField = IntegerField()
+    student: StudentLeaderboardSerializer = StudentLeaderboardSerializer()
@@ -0,0 +1,107 @@
+from typing import Any
+
+from django.db import transaction
+from django.db.models.base import ModelBase
+from django.db.models.signals import (
+    post_save,
+    post_delete,
+)
+from django.dispatch import receiver
+
+from subjectss.leaderboard import leaderboards
+from subjectss.models import (
+    ClassSubject,
+    Student,
+    StudentRegisteredSubjects,
+)
+
+
+@receiver(
+    signal=post_save,
+    sender=Student
+)
+def post_save_student(
+    sender: ModelBase,
+    instance: Student,
+    update_fields: Any = None,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Move the student on the leaderboards after points change."""
+    if update_fields is not None and "points" not in update_fields:
+        return
+    student_id: int = instance.id
+    points: int = instance.points
+    transaction.on_commit(
+        lambda: leaderboards.update_points(student_id, points)
+    )
+
+
+@receiver(
+    signal=post_delete,
+    sender=Student
+)
+def post_delete_student(
+    sender: ModelBase,
+    instance: Student,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Remove the student from the leaderboards."""
+    student_id: int = instance.id
+    transaction.on_commit(lambda: leaderboards.remove_student(student_id))
+
+
+@receiver(
+    signal=post_save,
+    sender=StudentRegisteredSubjects
+)
+def post_save_registration(
+    sender: ModelBase,
+    instance: StudentRegisteredSubjects,
+    created: bool,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Add the student to the boards of the registered subject."""
+    if not created:
+        return
+    student_id: int = instance.student_id
+    class_subject_id: int = instance.class_subject_id
+    transaction.on_commit(
+        lambda: leaderboards.add_registration(student_id, class_subject_id)
+    )
+
+
+@receiver(
+    signal=post_delete,
+    sender=StudentRegisteredSubjects
+)
+def post_delete_registration(
+    sender: ModelBase,
+    instance: StudentRegisteredSubjects,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Remove the student from the boards of the subject."""
+    student_id: int = instance.student_id
+    class_subject_id: int = instance.class_subject_id
+    transaction.on_commit(
+        lambda: leaderboards.remove_registration(
+            student_id, class_subject_id
+        )
+    )
+
+
+@receiver(
+    signal=post_save,
+    sender=ClassSubject
+)
+def post_save_class_subject(
+    sender: ModelBase,
+    instance: ClassSubject,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Rebuild the leaderboards once a subject changes its class."""
+    transaction.on_commit(leaderboards.invalidate)
@@ -1,3 +1,394 @@
-from django.test import TestCase
+import re
+from contextlib import redirect_stdout
+from io import StringIO
+from threading import (
+    Event,
+    Thread,
+)
+from typing import Any
 
-# Create your tests here.
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+)
+from django.test.utils import CaptureQueriesContext
+
+from abstracts.reference import reference_data
+from auths.models import CustomUser
+from subjectss.leaderboard import (
+    CLASS_SUBJECT_SCOPE,
+    Leaderboards,
+    SortedBoard,
+    leaderboards,
+)
+from subjectss.models import (
+    Class,
+    ClassSubject,
+    GeneralSubject,
+    Student,
+    StudentRegisteredSubjects,
+    StudentSubjectState,
+    Topic,
+)
+from subjectss.registration import (
+    ALREADY_REGISTERED,
+    NOT_FOUND,
+    REGISTERED,
+    enroll_class,
+    register_subjects,
+)
+from subjectss.serializers import TopicBaseSerializer
+
+
+class RegistrationTestCase(TestCase):
+    """Subjects of one class with a student registered for none."""
+
+    def setUp(self) -> None:
+        StudentSubjectState.objects.create(name=StudentSubjectState.ACTIVE)
+        general_subject: GeneralSubject = GeneralSubject.objects.create(
+            name="Математика"
+        )
+        self.school_class: Class = Class.objects.create(number=5)
+        self.class_subjects: list[ClassSubject] = [
+            ClassSubject.objects.create(
+                name=f"Математика {number}",
+                general_subject=general_subject,
+                attached_class=self.school_class
+            )
+            for number in range(3)
+        ]
+        self.student: Student = self.create_student("student@test.local")
+        # Rows of other tests were rolled back without on_commit bumps
+        reference_data.invalidate()
+        leaderboards.rebuild()
+
+    def tearDown(self) -> None:
+        reference_data.invalidate()
+        leaderboards.invalidate()
+
+    def create_student(self, email: str) -> Student:
+        return Student.objects.create(
+            user=CustomUser.objects.create(
+                email=email,
+                first_name="Тест",
+                last_name="Тестов"
+            )
+        )
+
+    def is_on_board(self, student: Student, class_subject_id: int) -> bool:
+        return any(
+            entry["student_id"] == student.id
+            for entry in leaderboards.get_top(
+                CLASS_SUBJECT_SCOPE,
+                class_subject_id,
+                100
+            )
+        )
+
+
+class RegisterSubjectsTests(RegistrationTestCase):
+    """register_subjects outcomes and their side effects."""
+
+    def test_outcomes(self) -> None:
+        StudentRegisteredSubjects.objects.create(
+            student=self.student,
+            class_subject=self.class_subjects[0],
+            current_state=StudentSubjectState.objects.get()
+        )
+        self.class_subjects[2].delete()
+        ids: list[int] = [
+            self.class_subjects[0].id,
+            self.class_subjects[1].id,
+            self.class_subjects[1].id,
+            self.class_subjects[2].id,
+            0,
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            outcomes: dict[int, str] = register_subjects(
+                self.student.id,
+                ids
+            )
+        self.assertEqual(
+            outcomes,
+            {
+                self.class_subjects[0].id: ALREADY_REGISTERED,
+                self.class_subjects[1].id: REGISTERED,
+                self.class_subjects[2].id: NOT_FOUND,
+                0: NOT_FOUND,
+            }
+        )
+        self.assertEqual(
+            StudentRegisteredSubjects.objects.filter(
+                student=self.student
+            ).count(),
+            2
+        )
+
+    def test_registration_is_idempotent(self) -> None:
+        class_subject_id: int = self.class_subjects[0].id
+        with self.captureOnCommitCallbacks(execute=True):
+            register_subjects(self.student.id, [class_subject_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            outcomes: dict[int, str] = register_subjects(
+                self.student.id,
+                [class_subject_id]
+            )
+        self.assertEqual(outcomes, {class_subject_id: ALREADY_REGISTERED})
+        self.assertEqual(
+            StudentRegisteredSubjects.objects.filter(
+                student=self.student
+            ).count(),
+            1
+        )
+
+    def test_registered_student_is_on_the_board(self) -> None:
+        class_subject_id: int = self.class_subjects[1].id
+        self.assertFalse(self.is_on_board(self.student, class_subject_id))
+        with self.captureOnCommitCallbacks(execute=True):
+            register_subjects(self.student.id, [class_subject_id])
+        self.assertTrue(self.is_on_board(self.student, class_subject_id))
+
+    def test_enrolled_class_is_on_the_board(self) -> None:
+        classmate: Student = self.create_student("classmate@test.local")
+        with self.captureOnCommitCallbacks(execute=True):
+            register_subjects(self.student.id, [self.class_subjects[0].id])
+            register_subjects(classmate.id, [self.class_subjects[1].id])
+        class_subject_id: int = self.class_subjects[2].id
+        with self.captureOnCommitCallbacks(execute=True):
+            enrolled: int = enroll_class(
+                class_subject_id,
+                self.school_class.id
+            )
+        self.assertEqual(enrolled, 2)
+        self.assertTrue(self.is_on_board(self.student, class_subject_id))
+        self.assertTrue(self.is_on_board(classmate, class_subject_id))
+        self.assertEqual(
+            enroll_class(class_subject_id, self.school_class.id),
+            0
+        )
+
+
+class RegistrationViewTests(RegistrationTestCase):
+    """Request bodies of the registration endpoints."""
+
+    def post(self, user: CustomUser, path: str, data: Any) -> HttpResponse:
+        token: str = str(RefreshToken.for_user(user).access_token)
+        return self.client.post(
+            f"/api/v1/subjects/class_subjects/{path}",
+            data=data,
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"JWT {token}"
+        )
+
+    def test_bulk_register_requires_object(self) -> None:
+        response: HttpResponse = self.post(
+            self.student.user,
+            "bulk_register",
+            [self.class_subjects[0].id]
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_enroll_class_requires_object(self) -> None:
+        admin: CustomUser = CustomUser.objects.create(
+            email="admin@test.local",
+            first_name="Тест",
+            last_name="Тестов",
+            is_superuser=True
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            register_subjects(self.student.id, [self.class_subjects[1].id])
+        path: str = f"{self.class_subjects[0].id}/enroll_class"
+        self.assertEqual(self.post(admin, path, []).status_code, 400)
+        with self.captureOnCommitCallbacks(execute=True):
+            response: HttpResponse = self.post(admin, path, {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["enrolled"], 1)
+
+
+class EnsureBuiltTests(SimpleTestCase):
+    """Leaderboards.ensure_built with concurrent callers."""
+
+    def setUp(self) -> None:
+        self.boards: Leaderboards = Leaderboards(rebuild_interval=60)
+        self.rebuilds: list[bool] = []
+        self.started: Event = Event()
+        self.release: Event = Event()
+        self.boards.rebuild = self.rebuild
+
+    def rebuild(self) -> None:
+        """Record a rebuild finishing once released."""
+        self.rebuilds.append(True)
+        self.started.set()
+        self.release.wait(timeout=5)
+        self.boards.built_at = float("inf")
+
+    def start_rebuild(self) -> Thread:
+        thread: Thread = Thread(target=self.boards.ensure_built)
+        thread.start()
+        self.assertTrue(self.started.wait(timeout=5))
+        return thread
+
+    def test_stale_boards_are_served_during_rebuild(self) -> None:
+        self.boards.built_at = float("-inf")
+        thread: Thread = self.start_rebuild()
+        # Returns at once with the current boards
+        self.boards.ensure_built()
+        self.release.set()
+        thread.join(timeout=5)
+        self.assertEqual(self.rebuilds, [True])
+
+    def test_first_build_is_waited_for_once(self) -> None:
+        thread: Thread = self.start_rebuild()
+        waiter: Thread = Thread(target=self.boards.ensure_built)
+        waiter.start()
+        waiter.join(timeout=0.05)
+        self.assertTrue(waiter.is_alive())
+        self.release.set()
+        thread.join(timeout=5)
+        waiter.join(timeout=5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(self.rebuilds, [True])
+
+
+class SortedBoardTests(SimpleTestCase):
+    """Ranks and entries of SortedBoard."""
+
+    def setUp(self) -> None:
+        self.board: SortedBoard = SortedBoard()
+        student_id: int
+        points: int
+        for student_id, points in ((1, 50), (2, 80), (3, 50), (4, 10)):
+            self.board.set(student_id, points)
+
+    def get_ids(self, entries: list[dict[str, int]]) -> list[int]:
+        return [entry["student_id"] for entry in entries]
+
+    def test_ties_share_rank(self) -> None:
+        self.assertEqual(
+            [self.board.get_rank(student_id) for student_id in (2, 1, 3, 4)],
+            [1, 2, 2, 4]
+        )
+        self.assertIsNone(self.board.get_rank(5))
+
+    def test_top(self) -> None:
+        self.assertEqual(
+            self.board.get_top(3),
+            [
+                {"rank": 1, "student_id": 2, "points": 80},
+                {"rank": 2, "student_id": 1, "points": 50},
+                {"rank": 2, "student_id": 3, "points": 50},
+            ]
+        )
+        self.assertEqual(len(self.board.get_top(10)), 4)
+
+    def test_set_moves_student(self) -> None:
+        self.board.set(4, 100)
+        self.board.set(4, 100)
+        self.assertEqual(len(self.board), 4)
+        self.assertEqual(self.get_ids(self.board.get_top(4)), [4, 2, 1, 3])
+        self.assertEqual(self.board.get_rank(2), 2)
+
+    def test_remove(self) -> None:
+        self.board.remove(2)
+        self.board.remove(5)
+        self.assertNotIn(2, self.board)
+        self.assertEqual(len(self.board), 3)
+        self.assertEqual(self.board.get_rank(1), 1)
+
+    def test_neighbors(self) -> None:
+        student_id: int
+        count: int
+        expected: list[int]
+        for student_id, count, expected in (
+            (1, 1, [2, 1, 3]),
+            (2, 2, [2, 1, 3]),
+            (4, 1, [3, 4]),
+        ):
+            self.assertEqual(
+                self.get_ids(self.board.get_neighbors(student_id, count)),
+                expected
+            )
+        self.assertEqual(self.board.get_neighbors(5, 1), [])
+
+
+class TopicSummaryTests(TestCase):
+    """Excerpt and content length kept instead of loading the content."""
+
+    CONTENT: str = "Текст темы. " * 20
+
+    def setUp(self) -> None:
+        self.topic: Topic = Topic.objects.create(
+            name="Тема",
+            content=self.CONTENT,
+            video_url="https://example.com/video",
+            attached_subect_class=ClassSubject.objects.create(
+                name="Математика",
+                general_subject=GeneralSubject.objects.create(
+                    name="Математика"
+                ),
+                attached_class=Class.objects.create(number=5)
+            )
+        )
+
+    def assert_summary(self, topic: Topic, content: str) -> None:
+        topic.refresh_from_db(fields=("excerpt", "content_length"))
+        self.assertEqual(topic.excerpt, content[:Topic.EXCERPT_LENGTH])
+        self.assertEqual(topic.content_length, len(content))
+
+    def test_save_fills_summary(self) -> None:
+        self.assert_summary(self.topic, self.CONTENT)
+        self.topic.content = "Новый текст"
+        self.topic.save(update_fields=["content"])
+        self.assert_summary(self.topic, "Новый текст")
+
+    def test_save_without_content_keeps_summary(self) -> None:
+        topic: Topic = Topic.objects.defer("content").get(id=self.topic.id)
+        topic.name = "Новое название"
+        topic.save()
+        self.assert_summary(topic, self.CONTENT)
+
+    def test_short_content_needs_no_content(self) -> None:
+        topic: Topic = Topic.objects.defer("content").get(id=self.topic.id)
+        with self.assertNumQueries(0):
+            data: dict = TopicBaseSerializer(topic).data
+        self.assertEqual(
+            data["content"],
+            f"{self.CONTENT[:Topic.EXCERPT_LENGTH]}..."
+        )
+
+    def test_list_does_not_load_content(self) -> None:
+        admin: CustomUser = CustomUser.objects.create(
+            email="admin@test.local",
+            first_name="Тест",
+            last_name="Тестов",
+            is_superuser=True
+        )
+        token: str = str(RefreshToken.for_user(admin).access_token)
+        with CaptureQueriesContext(connection) as queries:
+            response: HttpResponse = self.client.get(
+                "/api/v1/subjects/topics",
+                HTTP_AUTHORIZATION=f"JWT {token}"
+            )
+        self.assertEqual(response.status_code, 200)
+        topic: dict = response.json()["data"][0]
+        self.assertNotIn("content", topic)
+        self.assertEqual(topic["content_length"], len(self.CONTENT))
+        self.assertFalse(any(
+            re.search(r'\."content"', query["sql"])
+            for query in queries.captured_queries
+        ))
+
+    def test_backfill_updates_old_rows(self) -> None:
+        Topic.objects.filter(id=self.topic.id).update(
+            excerpt="",
+            content_length=0
+        )
+        with redirect_stdout(StringIO()) as out:
+            call_command("backfill_topic_excerpts", batch_size=1)
+        self.assertIn("Обновлено тем: 1", out.getvalue())
+        self.assert_summary(self.topic, self.CONTENT)
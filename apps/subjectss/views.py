@@ -18,8 +18,16 @@ from rest_framework.status import (
     HTTP_200_OK,
     HTTP_403_FORBIDDEN,
     HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
 )
 
+from django.conf import settings
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseBase,
+)
+from django.views import View
 from django.db.models import (
     Manager,
     QuerySet,
@@ -49,12 +57,34 @@ from subjectss.serializers import (
     TopicBaseSerializer,
     TopicListSerializer,
     TopicDetailSerializer,
+    LeaderboardEntrySerializer,
 )
 from subjectss.permissions import IsStudent
-from abstracts.handlers import DRFResponseHandler
-from abstracts.mixins import ModelInstanceMixin
+from subjectss.registration import (
+    ALREADY_REGISTERED,
+    MAX_SUBJECTS_PER_REQUEST,
+    REGISTERED,
+    enroll_class,
+    register_subjects,
+)
+from subjectss.leaderboard import (
+    SCOPES,
+    GLOBAL_SCOPE,
+    leaderboards,
+    attach_students,
+)
+from abstracts.handlers import (
+    AsyncResponseHandler,
+    DRFResponseHandler,
+)
+from abstracts.files import get_file_response
+from abstracts.mixins import (
+    ModelInstanceMixin,
+    ReplicaReadMixin,
+)
 from abstracts.paginators import AbstractPageNumberPaginator
 from abstracts.models import AbstractDateTimeQuerySet
+from abstracts.reference import reference_data
 from auths.permissions import (
     IsNonDeletedUser,
     IsCustomAdminUser,
@@ -63,7 +93,12 @@ from auths.serializers import TeacherListModelSerializer
 from abstracts.tools import conver_to_int_or_none
 
 
-class GeneralSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
+class GeneralSubjectViewSet(
+    ReplicaReadMixin,
+    ModelInstanceMixin,
+    DRFResponseHandler,
+    ViewSet
+):
     """GeneralSubjectViewSet."""
 
     queryset: Manager = GeneralSubject.objects
@@ -136,7 +171,12 @@ class GeneralSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
         return obj_response
 
 
-class TrackWayViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
+class TrackWayViewSet(
+    ReplicaReadMixin,
+    ModelInstanceMixin,
+    DRFResponseHandler,
+    ViewSet
+):
     """TrackWayViewSet."""
 
     queryset: Manager = TrackWay.objects
@@ -242,11 +282,21 @@ class ClassViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
         return response
 
 
-class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
+class ClassSubjectViewSet(
+    ReplicaReadMixin,
+    ModelInstanceMixin,
+    DRFResponseHandler,
+    ViewSet
+):
     """ClassSubjectViewSet."""
 
     queryset: Manager = ClassSubject.objects
     permission_classes: tuple[Any] = (AllowAny,)
+    replica_actions: tuple[str, ...] = (
+        "list",
+        "retrieve",
+        "get_class_subj_teachers",
+    )
     class_serializer: ClassSubjectBaseSerializer = ClassSubjectBaseSerializer
 
     def get_queryset(self, is_deleted: bool = False) -> QuerySet[ClassSubject]:
@@ -286,7 +336,6 @@ class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
         response: DRF_Response = self.get_drf_response(
             request=request,
             data=search_queryset.select_related(
-                "attached_class",
                 "general_subject"
             ),
             serializer_class=self.class_serializer,
@@ -313,8 +362,7 @@ class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
             queryset=self.get_queryset(
                 is_deleted=is_deleted
             ).select_related(
-                "general_subject",
-                "attached_class"
+                "general_subject"
             ),
             is_deleted=is_deleted
         )
@@ -358,23 +406,17 @@ class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
         if not is_class_subject:
             return obj_response
 
-        is_existed: bool = StudentRegisteredSubjects.objects.filter(
-            student=request.user.student,
-            class_subject=obj_response
-        ).exists()
-
-        if is_existed:
+        outcomes: dict[int, str] = register_subjects(
+            student_id=request.user.student.id,
+            class_subject_ids=(obj_response.id,)
+        )
+        if outcomes[obj_response.id] == ALREADY_REGISTERED:
             return DRF_Response(
                 data={
                     "response": "Вы уже зарегестрированы!"
                 },
                 status=HTTP_400_BAD_REQUEST
             )
-        StudentRegisteredSubjects.objects.create(
-            student=request.user.student,
-            class_subject=obj_response,
-            current_state_id=1
-        )
         return DRF_Response(
             data={
                 "response": "Вы успешно зарегестрировались на предмет"
@@ -382,7 +424,124 @@ class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
             status=HTTP_200_OK
         )
 
-    # Не оптимизирован запрос на subscription
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="bulk_register",
+        permission_classes=(
+            IsStudent,
+            IsNonDeletedUser,
+            IsAuthenticated,
+        )
+    )
+    def bulk_register_students(
+        self,
+        request: DRF_Request,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> DRF_Response:
+        """Handle POST-request to register user for several subjects."""
+        if not isinstance(request.data, dict):
+            return DRF_Response(
+                data={
+                    "response": "Тело запроса должно быть объектом"
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        raw_ids: Any = request.data.get("class_subject_ids")
+        class_subject_ids: list[Optional[int]] = [
+            conver_to_int_or_none(str(raw_id)) for raw_id in raw_ids
+        ] if isinstance(raw_ids, list) else []
+        if not class_subject_ids or None in class_subject_ids or \
+                len(class_subject_ids) > MAX_SUBJECTS_PER_REQUEST:
+            return DRF_Response(
+                data={
+                    "response": "class_subject_ids должен быть списком "
+                    f"до {MAX_SUBJECTS_PER_REQUEST} ID предметов"
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        outcomes: dict[int, str] = register_subjects(
+            student_id=request.user.student.id,
+            class_subject_ids=class_subject_ids
+        )
+        registered: int = sum(
+            outcome == REGISTERED for outcome in outcomes.values()
+        )
+        return DRF_Response(
+            data={
+                "response": f"Зарегестрировано предметов: {registered}",
+                "results": [
+                    {
+                        "class_subject_id": class_subject_id,
+                        "status": outcome,
+                    }
+                    for class_subject_id, outcome in outcomes.items()
+                ],
+            },
+            status=HTTP_200_OK
+        )
+
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="enroll_class",
+        permission_classes=(
+            IsAuthenticated,
+            IsCustomAdminUser,
+        )
+    )
+    def enroll_class_students(
+        self,
+        request: DRF_Request,
+        pk: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> DRF_Response:
+        """Handle POST-request to register a class cohort for the subject.
+
+        The cohort defaults to the class of the subject; "class_id" takes
+        students of another class.
+        """
+        if not isinstance(request.data, dict):
+            return DRF_Response(
+                data={
+                    "response": "Тело запроса должно быть объектом"
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        is_class_subject: bool = False
+        obj_response: Union[ClassSubject, DRF_Response]
+        obj_response, is_class_subject = self.get_obj_or_response(
+            request=request,
+            pk=pk,
+            class_name=ClassSubject,
+            queryset=self.get_queryset()
+        )
+        if not is_class_subject:
+            return obj_response
+        class_id: Optional[int] = conver_to_int_or_none(
+            str(request.data.get("class_id") or obj_response.attached_class_id)
+        )
+        if reference_data.get(Class, class_id) is None:
+            return DRF_Response(
+                data={
+                    "response": f"Класс с ID: {class_id} не найден"
+                },
+                status=HTTP_404_NOT_FOUND
+            )
+        enrolled: int = enroll_class(
+            class_subject_id=obj_response.id,
+            class_id=class_id
+        )
+        return DRF_Response(
+            data={
+                "response": f"Зачислено студентов: {enrolled}",
+                "enrolled": enrolled,
+            },
+            status=HTTP_200_OK
+        )
+
     @action(
         methods=["GET"],
         detail=True,
@@ -417,8 +576,6 @@ class ClassSubjectViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
             request=request,
             data=obj_response.teachers.all().select_related(
                 "user",
-                "subscription",
-                "status_subscription",
             ).prefetch_related(
                 "tought_subjects",
             ),
@@ -459,7 +616,7 @@ class TopicViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
         )
         res_queryset: AbstractDateTimeQuerySet[Topic] = self.get_queryset(
             is_deleted=is_deleted
-        ).select_related("attached_subect_class")
+        ).select_related("attached_subect_class").defer("content")
         if subject_class_id:
             res_queryset = res_queryset.filter(
                 attached_subect_class_id=subject_class_id
@@ -499,3 +656,316 @@ class TopicViewSet(ModelInstanceMixin, DRFResponseHandler, ViewSet):
                 serializer_class=TopicDetailSerializer
             )
         return obj_response
+
+    def has_content_access(self, request: DRF_Request, topic: Topic) -> bool:
+        """Get whether the user may read materials of the topic."""
+        if request.user.is_superuser:
+            return True
+        return topic.attached_subect_class.teachers.filter(
+            user=request.user
+        ).exists() or StudentRegisteredSubjects.objects.filter(
+            student__user=request.user,
+            class_subject_id=topic.attached_subect_class_id
+        ).exists()
+
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="download",
+        permission_classes=(
+            IsNonDeletedUser,
+            IsAuthenticated,
+        )
+    )
+    def download(
+        self,
+        request: DRF_Request,
+        pk: Union[int, str],
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> Union[HttpResponseBase, DRF_Response]:
+        """Handle GET-request to stream the content file of the topic."""
+        obj_response: Union[Topic, DRF_Response]
+        is_obj: bool = False
+        obj_response, is_obj = self.get_obj_or_response(
+            request=request,
+            pk=pk,
+            class_name=Topic,
+            queryset=self.get_queryset().select_related(
+                "attached_subect_class"
+            ).defer("content")
+        )
+        if not is_obj:
+            return obj_response
+        if not self.has_content_access(request=request, topic=obj_response):
+            return DRF_Response(
+                data={
+                    "response": "Вы не зарегестрированы на этот предмет"
+                },
+                status=HTTP_403_FORBIDDEN
+            )
+        if not obj_response.content_file or \
+                not obj_response.content_file.storage.exists(
+                    obj_response.content_file.name
+                ):
+            return DRF_Response(
+                data={
+                    "response": "У темы нет файла с материалом"
+                },
+                status=HTTP_404_NOT_FOUND
+            )
+        return get_file_response(
+            request=request,
+            file=obj_response.content_file
+        )
+
+
+class LeaderboardViewSet(DRFResponseHandler, ViewSet):
+    """LeaderboardViewSet."""
+
+    permission_classes: Tuple[Any] = (
+        IsNonDeletedUser,
+        IsAuthenticated,
+    )
+
+    def get_board_params(
+        self,
+        request: DRF_Request
+    ) -> Tuple[Optional[Tuple[str, Optional[int]]], Optional[DRF_Response]]:
+        """Get (scope, scope_id) of the board or an error response."""
+        scope: str = request.query_params.get("scope", GLOBAL_SCOPE)
+        if scope not in SCOPES:
+            return (None, DRF_Response(
+                data={
+                    "response": "Область рейтинга должна быть одной из: " +
+                    ", ".join(SCOPES)
+                },
+                status=HTTP_400_BAD_REQUEST
+            ))
+        if scope == GLOBAL_SCOPE:
+            return ((scope, None), None)
+        scope_id: Optional[int] = conver_to_int_or_none(
+            request.query_params.get("scope_id", "")
+        )
+        if not scope_id:
+            return (None, DRF_Response(
+                data={
+                    "response": "Не указан scope_id для рейтинга"
+                },
+                status=HTTP_400_BAD_REQUEST
+            ))
+        return ((scope, scope_id), None)
+
+    def get_bounded_param(
+        self,
+        request: DRF_Request,
+        name: str,
+        default: int,
+        maximum: int
+    ) -> int:
+        value: Optional[int] = conver_to_int_or_none(
+            request.query_params.get(name, "")
+        )
+        if value is None or value < 0:
+            return default
+        return min(value, maximum)
+
+    def list(
+        self,
+        request: DRF_Request,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> DRF_Response:
+        """Handle GET-request to view top students of the board."""
+        board: Optional[Tuple[str, Optional[int]]]
+        error_response: Optional[DRF_Response]
+        board, error_response = self.get_board_params(request=request)
+        if error_response:
+            return error_response
+        limit: int = self.get_bounded_param(
+            request=request,
+            name="limit",
+            default=settings.LEADERBOARD["DEFAULT_LIMIT"],
+            maximum=settings.LEADERBOARD["MAX_LIMIT"]
+        )
+        return self.get_drf_response(
+            request=request,
+            data=attach_students(leaderboards.get_top(*board, limit=limit)),
+            serializer_class=LeaderboardEntrySerializer,
+            many=True
+        )
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="me",
+        permission_classes=(
+            IsStudent,
+            IsNonDeletedUser,
+            IsAuthenticated,
+        )
+    )
+    def get_my_rank(
+        self,
+        request: DRF_Request,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> DRF_Response:
+        """Handle GET-request to view rank of the student and neighbors."""
+        board: Optional[Tuple[str, Optional[int]]]
+        error_response: Optional[DRF_Response]
+        board, error_response = self.get_board_params(request=request)
+        if error_response:
+            return error_response
+        neighbors: int = self.get_bounded_param(
+            request=request,
+            name="neighbors",
+            default=settings.LEADERBOARD["DEFAULT_NEIGHBORS"],
+            maximum=settings.LEADERBOARD["MAX_NEIGHBORS"]
+        )
+        rank: Optional[int]
+        total: int
+        entries: list[Dict[str, int]]
+        rank, total, entries = leaderboards.get_neighbors(
+            *board,
+            student_id=request.user.student.id,
+            count=neighbors
+        )
+        if rank is None:
+            return DRF_Response(
+                data={
+                    "response": "Вы не участвуете в этом рейтинге"
+                },
+                status=HTTP_404_NOT_FOUND
+            )
+        return DRF_Response(
+            data={
+                "data": {
+                    "rank": rank,
+                    "total": total,
+                    "neighbors": LeaderboardEntrySerializer(
+                        attach_students(entries),
+                        many=True
+                    ).data,
+                }
+            },
+            status=HTTP_200_OK
+        )
+
+
+# ------------------------------------------
+# Async read endpoints
+#
+class GeneralSubjectAsyncView(AsyncResponseHandler, View):
+    """Async variant of GeneralSubjectViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> HttpResponse:
+        """Handle GET-request for all subjects."""
+        error_response: Optional[HttpResponse] = \
+            await self.check_deleted_access(request)
+        if error_response:
+            return error_response
+        queryset: AbstractDateTimeQuerySet = GeneralSubject.objects.all()
+        return await self.get_async_response(
+            request=request,
+            data=queryset.get_deleted() if request.GET.get("is_deleted")
+            else queryset.get_not_deleted(),
+            serializer_class=GeneralSubjectBaseSerializer,
+            many=True
+        )
+
+
+class TrackWayAsyncView(AsyncResponseHandler, View):
+    """Async variant of TrackWayViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to obtain all records."""
+        error_response: Optional[HttpResponse] = \
+            await self.check_deleted_access(request)
+        if error_response:
+            return error_response
+        queryset: AbstractDateTimeQuerySet = TrackWay.objects.all()
+        return await self.get_async_response(
+            request=request,
+            data=queryset.get_deleted() if request.GET.get("is_deleted")
+            else queryset.get_not_deleted(),
+            serializer_class=TrackWayBaseSerializer,
+            many=True,
+            paginator=AbstractPageNumberPaginator()
+        )
+
+
+class ClassAsyncView(AsyncResponseHandler, View):
+    """Async variant of ClassViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to get the list of classes."""
+        error_response: Optional[HttpResponse] = \
+            await self.check_deleted_access(request)
+        if error_response:
+            return error_response
+        queryset: AbstractDateTimeQuerySet = Class.objects.all()
+        return await self.get_async_response(
+            request=request,
+            data=(
+                queryset.get_deleted() if request.GET.get("is_deleted")
+                else queryset.get_not_deleted()
+            ).order_by("number"),
+            serializer_class=ClassBaseSerializer,
+            many=True
+        )
+
+
+class ClassSubjectAsyncView(AsyncResponseHandler, View):
+    """Async variant of ClassSubjectViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: Tuple[Any],
+        **kwargs: Dict[str, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to obtain the list of ClassSubjects."""
+        error_response: Optional[HttpResponse] = \
+            await self.check_deleted_access(request)
+        if error_response:
+            return error_response
+        general_subject_id: Optional[int] = conver_to_int_or_none(
+            number=request.GET.get("subject_id", "")
+        )
+        attached_class_id: Optional[int] = conver_to_int_or_none(
+            number=request.GET.get("class_id", "")
+        )
+        queryset: ClassSubjectQuerySet[ClassSubject] = \
+            ClassSubject.objects.get_deleted() \
+            if request.GET.get("is_deleted") \
+            else ClassSubject.objects.get_not_deleted()
+        if general_subject_id or attached_class_id:
+            queryset = queryset.get_class_subject(
+                attached_class_id=attached_class_id,
+                general_subject_id=general_subject_id
+            )
+        return await self.get_async_response(
+            request=request,
+            data=queryset.select_related(
+                "general_subject"
+            ),
+            serializer_class=ClassSubjectBaseSerializer,
+            many=True,
+            paginator=AbstractPageNumberPaginator()
+        )
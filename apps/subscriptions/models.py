@@ -40,6 +40,8 @@ class Subscription(AbstractDateTime):
 
 
 class Status(AbstractDateTime):
+    # Natural key of the status of new subscriptions
+    ACTIVE = "Активен"
     name: CharField = CharField(
         max_length=150,
         unique=True,
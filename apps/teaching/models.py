@@ -10,6 +10,7 @@ from django.db.models import (
     CASCADE,
 )
 
+from abstracts.reference import reference_data
 from auths.models import CustomUser
 from subscriptions.models import Subscription, Status
 from subjectss.models import ClassSubject
@@ -50,7 +51,7 @@ class Teacher(Model):
         verbose_name="Время и дата получения подписки"
     )
 
-    __old_subscription: Optional[Subscription] = None
+    __old_subscription_id: Optional[int] = None
 
     class Meta:
         verbose_name: str = "Преподаватель"
@@ -59,7 +60,8 @@ class Teacher(Model):
 
     def __init__(self, *args: tuple[Any], **kwargs: dict[str, Any]) -> None:
         super().__init__(*args, **kwargs)
-        self.__old_subscription = self.subscription
+        # Ids only, reading the subscription would query every teacher
+        self.__old_subscription_id = self.subscription_id
 
     def __str__(self) -> str:
         return f"Преподаватель {self.user}"
@@ -74,12 +76,15 @@ class Teacher(Model):
         return super().full_clean(*args, **kwargs)
 
     def save(self, *args: tuple[Any], **kwargs: dict[str, Any]) -> None:
-        if self._state.adding and self.subscription:
+        if self._state.adding and self.subscription_id:
             self.datetime_created = datetime.now()
-            self.status_subscription_id = 1
-        if self.subscription != self.__old_subscription:
+            self.status_subscription_id = reference_data.get_id(
+                Status,
+                Status.ACTIVE
+            )
+        if self.subscription_id != self.__old_subscription_id:
             print("Subscription Changed")
             # Do some code
         print("save")
-        self.__old_subscription = self.subscription
+        self.__old_subscription_id = self.subscription_id
         return super().save(*args, **kwargs)
@@ -1,4 +1,5 @@
 from typing import (
+    Optional,
     Tuple,
     Union,
 )
@@ -12,6 +13,9 @@ from rest_framework.serializers import (
     SerializerMethodField,
 )
 
+from abstracts.reference import reference_data
+from abstracts.serializers import ReferenceField
+from subscriptions.models import Subscription
 from subscriptions.serializers import (
     SubscriptionForeignSerializer,
     StatusForeignSerializer,
@@ -32,9 +36,12 @@ class TeacherForeignModelSerializer(ModelSerializer):
     is_expired_subscrs: SerializerMethodField = SerializerMethodField(
         method_name="get_is_expired_subscription"
     )
-    subscription: SubscriptionForeignSerializer = \
-        SubscriptionForeignSerializer()
-    status_subscription: StatusForeignSerializer = StatusForeignSerializer()
+    subscription: ReferenceField = ReferenceField(
+        serializer_class=SubscriptionForeignSerializer
+    )
+    status_subscription: ReferenceField = ReferenceField(
+        serializer_class=StatusForeignSerializer
+    )
     tought_subjects: ClassSubjectShortSerializer = ClassSubjectShortSerializer(
         read_only=True,
         many=True
@@ -56,11 +63,15 @@ class TeacherForeignModelSerializer(ModelSerializer):
 
     def get_is_expired_subscription(self, obj: Teacher) -> bool:
         """Get if the subscription is expired or not."""
-        if not obj.subscription or not obj.datetime_created:
+        subscription: Optional[Subscription] = reference_data.get(
+            Subscription,
+            obj.subscription_id
+        )
+        if not subscription or not obj.datetime_created:
             return None
         cur_datetime: datetime = datetime.now(tz=utc)
         expired_datetime: datetime = (obj.datetime_created + relativedelta(
-            months=obj.subscription.duration
+            months=subscription.duration
         ))
         # expired_datetime = expired_datetime.replace(tzinfo=utc)
 
@@ -20,6 +20,9 @@ from tests.models import (
     Quiz,
     QuizType,
     QuizQuestionAnswer,
+    PointsLedgerEntry,
+    StudentTopicStats,
+    QuestionStats,
 )
 
 
@@ -271,3 +274,105 @@ class QuizQuestionAnswerAdmin(ModelAdmin):
     ) -> str:
         """Get short answer of the question."""
         return f"{obj.question.name[:20]}..." if obj else ""
+
+
+@register(PointsLedgerEntry)
+class PointsLedgerEntryAdmin(ModelAdmin):
+    list_display: tuple[str] = (
+        "id",
+        "student",
+        "delta",
+        "reason",
+        "quiz",
+        "datetime_created",
+    )
+    list_select_related: tuple[str] = (
+        "student__user",
+        "quiz",
+        "quiz__student__user",
+        "quiz__quiz_type",
+    )
+    list_filter: tuple[str] = ("reason",)
+    search_fields: tuple[str] = (
+        "student__user__first_name",
+        "student__user__last_name",
+    )
+    readonly_fields: tuple[str] = (
+        "student",
+        "delta",
+        "reason",
+        "quiz",
+        "datetime_created",
+    )
+    list_per_page: int = 25
+
+    def has_add_permission(self, request: WSGIRequest) -> bool:
+        """Ledger entries are created only by points accrual."""
+        return False
+
+    def has_delete_permission(
+        self,
+        request: WSGIRequest,
+        obj: Optional[PointsLedgerEntry] = None
+    ) -> bool:
+        return False
+
+
+@register(StudentTopicStats)
+class StudentTopicStatsAdmin(ModelAdmin):
+    list_display: tuple[str] = (
+        "id",
+        "student",
+        "topic",
+        "attempts",
+        "correct_answers",
+        "last_attempt",
+    )
+    list_select_related: tuple[str] = (
+        "student__user",
+        "topic",
+    )
+    search_fields: tuple[str] = (
+        "student__user__first_name",
+        "student__user__last_name",
+        "topic__name",
+    )
+    readonly_fields: tuple[str] = (
+        "student",
+        "topic",
+        "attempts",
+        "correct_answers",
+        "last_attempt",
+    )
+    list_per_page: int = 25
+
+    def has_add_permission(self, request: WSGIRequest) -> bool:
+        """Stats are maintained by quiz uploads and rebuild_topic_stats."""
+        return False
+
+
+@register(QuestionStats)
+class QuestionStatsAdmin(ModelAdmin):
+    list_display: tuple[str] = (
+        "id",
+        "question",
+        "attempts",
+        "correct_rate",
+        "discrimination",
+        "datetime_computed",
+    )
+    list_select_related: tuple[str] = ("question",)
+    search_fields: tuple[str] = ("question__name",)
+    readonly_fields: tuple[str] = (
+        "question",
+        "attempts",
+        "correct_rate",
+        "discrimination",
+        "answer_distribution",
+        "datetime_computed",
+    )
+    list_per_page: int = 25
+
+    def has_add_permission(self, request: WSGIRequest) -> bool:
+        """Stats are computed by compute_question_stats."""
+        return False
@@ -0,0 +1,269 @@
+"""Question difficulty statistics computed from all quiz answers.
+
+Answers are streamed from a server-side cursor in chunks of int arrays and
+reduced with np.bincount, so memory depends on the number of quizzes,
+questions and answer options, not on the number of answer rows.
+
+The discrimination index is the point-biserial correlation between answering
+the question correctly and the rest score of the quiz, i.e. the share of the
+other questions of the same quiz answered correctly.
+"""
+from itertools import islice
+from time import perf_counter
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Optional,
+)
+
+import numpy as np
+
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    Q,
+    QuerySet,
+)
+from django.utils import timezone
+
+from tests.models import (
+    Answer,
+    Question,
+    QuestionStats,
+    Quiz,
+    QuizQuestionAnswer,
+)
+from tests.sampling import question_bank
+
+# Columns of the streamed answer rows
+QUIZ, QUESTION, USER_ANSWER, IS_CORRECT, ANSWER_QUESTION = range(5)
+
+MIN_DISCRIMINATION_ATTEMPTS = 10
+
+
+def iter_arrays(
+    queryset: QuerySet,
+    chunk_size: int
+) -> Iterator[np.ndarray]:
+    """Iterate over values_list rows as 2D int64 arrays of chunk_size rows."""
+    rows: Iterator[tuple[Any, ...]] = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk: list[tuple[Any, ...]] = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield np.array(chunk, dtype=np.int64)
+
+
+def get_max_id(queryset: QuerySet) -> int:
+    return queryset.aggregate(max_id=Max("id"))["max_id"] or 0
+
+
+def get_quiz_totals(chunk_size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Get answered and correct counts indexed by quiz id."""
+    size: int = get_max_id(Quiz.objects) + 1
+    answered: np.ndarray = np.zeros(size, dtype=np.int64)
+    correct: np.ndarray = np.zeros(size, dtype=np.int64)
+    chunk: np.ndarray
+    for chunk in iter_arrays(
+        QuizQuestionAnswer.objects.order_by().values("quiz_id").annotate(
+            answered=Count("id"),
+            correct=Count(
+                "id",
+                filter=Q(
+                    user_answer__is_correct=True,
+                    user_answer__question_id=F("question_id")
+                )
+            )
+        ).values_list("quiz_id", "answered", "correct"),
+        chunk_size=chunk_size
+    ):
+        answered[chunk[:, 0]] = chunk[:, 1]
+        correct[chunk[:, 0]] = chunk[:, 2]
+    return (answered, correct)
+
+
+class QuestionStatsAccumulator:
+    """Per-question sums updated chunk by chunk."""
+
+    def __init__(
+        self,
+        questions: int,
+        answers: int,
+        quiz_answered: np.ndarray,
+        quiz_correct: np.ndarray
+    ) -> None:
+        self.questions = questions
+        self.answers = answers
+        self.quiz_answered = quiz_answered
+        self.quiz_correct = quiz_correct
+        self.attempts: np.ndarray = np.zeros(questions, dtype=np.int64)
+        self.correct: np.ndarray = np.zeros(questions, dtype=np.int64)
+        self.chosen: np.ndarray = np.zeros(answers, dtype=np.int64)
+        # Sums over attempts having a rest score
+        self.rest_count: np.ndarray = np.zeros(questions, dtype=np.int64)
+        self.rest_correct: np.ndarray = np.zeros(questions, dtype=np.int64)
+        self.rest_sum: np.ndarray = np.zeros(questions)
+        self.rest_square_sum: np.ndarray = np.zeros(questions)
+        self.rest_correct_sum: np.ndarray = np.zeros(questions)
+
+    def add(self, chunk: np.ndarray) -> None:
+        # Rows referencing objects created after the arrays were sized
+        chunk = chunk[
+            (chunk[:, QUIZ] < len(self.quiz_answered)) &
+            (chunk[:, QUESTION] < self.questions) &
+            (chunk[:, USER_ANSWER] < self.answers)
+        ]
+        question_ids: np.ndarray = chunk[:, QUESTION]
+        is_correct: np.ndarray = (chunk[:, IS_CORRECT] == 1) & \
+            (chunk[:, ANSWER_QUESTION] == question_ids)
+
+        self.attempts += np.bincount(question_ids, minlength=self.questions)
+        self.correct += np.bincount(
+            question_ids[is_correct],
+            minlength=self.questions
+        )
+        self.chosen += np.bincount(
+            chunk[:, USER_ANSWER],
+            minlength=self.answers
+        )
+
+        quiz_ids: np.ndarray = chunk[:, QUIZ]
+        others: np.ndarray = self.quiz_answered[quiz_ids] - 1
+        has_rest: np.ndarray = others > 0
+        question_ids = question_ids[has_rest]
+        is_correct = is_correct[has_rest]
+        rest: np.ndarray = (
+            self.quiz_correct[quiz_ids[has_rest]] - is_correct
+        ) / others[has_rest]
+
+        self.rest_count += np.bincount(question_ids, minlength=self.questions)
+        self.rest_correct += np.bincount(
+            question_ids[is_correct],
+            minlength=self.questions
+        )
+        self.rest_sum += np.bincount(
+            question_ids,
+            weights=rest,
+            minlength=self.questions
+        )
+        self.rest_square_sum += np.bincount(
+            question_ids,
+            weights=rest * rest,
+            minlength=self.questions
+        )
+        self.rest_correct_sum += np.bincount(
+            question_ids[is_correct],
+            weights=rest[is_correct],
+            minlength=self.questions
+        )
+
+    def get_discrimination(self) -> np.ndarray:
+        """Get point-biserial index, NaN where it is not defined."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            count: np.ndarray = self.rest_count.astype(np.float64)
+            correct: np.ndarray = self.rest_correct.astype(np.float64)
+            wrong: np.ndarray = count - correct
+            mean: np.ndarray = self.rest_sum / count
+            std: np.ndarray = np.sqrt(np.maximum(
+                self.rest_square_sum / count - mean * mean, 0.0
+            ))
+            mean_correct: np.ndarray = self.rest_correct_sum / correct
+            mean_wrong: np.ndarray = \
+                (self.rest_sum - self.rest_correct_sum) / wrong
+            share: np.ndarray = correct / count
+            index: np.ndarray = (mean_correct - mean_wrong) / std * \
+                np.sqrt(share * (1 - share))
+        index[
+            (self.rest_count < MIN_DISCRIMINATION_ATTEMPTS) |
+            (correct == 0) | (wrong == 0) | (std < 1e-12)
+        ] = np.nan
+        return index
+
+
+def compute_question_stats(
+    chunk_size: int = 50_000,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int], None]] = None
+) -> dict[str, Any]:
+    """Recompute QuestionStats of all answered questions.
+
+    Returns numbers of processed rows and stored questions with duration.
+    """
+    start: float = perf_counter()
+    computed_at = timezone.now()
+    quiz_answered: np.ndarray
+    quiz_correct: np.ndarray
+    quiz_answered, quiz_correct = get_quiz_totals(chunk_size=chunk_size)
+    accumulator: QuestionStatsAccumulator = QuestionStatsAccumulator(
+        questions=get_max_id(Question.objects) + 1,
+        answers=get_max_id(Answer.objects) + 1,
+        quiz_answered=quiz_answered,
+        quiz_correct=quiz_correct
+    )
+
+    rows: int = 0
+    chunk: np.ndarray
+    for chunk in iter_arrays(
+        QuizQuestionAnswer.objects.order_by().values_list(
+            "quiz_id",
+            "question_id",
+            "user_answer_id",
+            "user_answer__is_correct",
+            "user_answer__question_id"
+        ),
+        chunk_size=chunk_size
+    ):
+        accumulator.add(chunk)
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+
+    question_answers: dict[int, list[int]] = {}
+    answer_id: int
+    question_id: int
+    for answer_id, question_id in Answer.objects.values_list(
+        "id", "question_id"
+    ):
+        question_answers.setdefault(question_id, []).append(answer_id)
+
+    discrimination: np.ndarray = accumulator.get_discrimination()
+    stats: list[QuestionStats] = []
+    for question_id in np.flatnonzero(accumulator.attempts).tolist():
+        attempts: int = int(accumulator.attempts[question_id])
+        index: float = float(discrimination[question_id])
+        stats.append(
+            QuestionStats(
+                question_id=question_id,
+                attempts=attempts,
+                correct_rate=int(accumulator.correct[question_id]) / attempts,
+                discrimination=None if np.isnan(index) else round(index, 4),
+                answer_distribution={
+                    str(answer_id): int(accumulator.chosen[answer_id])
+                    for answer_id in question_answers.get(question_id, ())
+                },
+                datetime_computed=computed_at
+            )
+        )
+    QuestionStats.objects.bulk_create(
+        stats,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=("question_id",),
+        update_fields=(
+            "attempts",
+            "correct_rate",
+            "discrimination",
+            "answer_distribution",
+            "datetime_computed",
+        )
+    )
+    # Questions left without answers
+    QuestionStats.objects.filter(datetime_computed__lt=computed_at).delete()
+    question_bank.invalidate()
+    return {
+        "rows": rows,
+        "questions": len(stats),
+        "seconds": perf_counter() - start,
+    }
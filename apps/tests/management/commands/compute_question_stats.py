@@ -0,0 +1,53 @@
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+
+from tests.analytics import compute_question_stats
+
+
+class Command(BaseCommand):
+    """Recompute QuestionStats from all quiz answers."""
+
+    help = "Расчет статистики сложности вопросов по ответам студентов"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=50_000,
+            help="Количество строк ответов в одной порции курсора"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество вопросов в одном запросе записи"
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Compute the stats and print throughput."""
+        verbose: bool = options["verbosity"] > 1
+        result: dict[str, Any] = compute_question_stats(
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+            progress=(
+                lambda rows: print(f"Обработано ответов: {rows}")
+            ) if verbose else None
+        )
+        print(
+            "Ответов: {}, вопросов: {}, за {:.3f} секунд ({:.0f} строк/с)"
+            .format(
+                result["rows"],
+                result["questions"],
+                result["seconds"],
+                result["rows"] / result["seconds"]
+                if result["seconds"] else 0
+            )
+        )
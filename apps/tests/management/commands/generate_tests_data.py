@@ -23,9 +23,9 @@ from subjectss.models import (
 class Command(BaseCommand):
     """Custom command for filling up database."""
     QUIZ_NAME_TYPES = (
-        "предмет",
-        "тема",
-        "класс",
+        QuizType.SUBJECT,
+        QuizType.TOPIC,
+        QuizType.CLASS,
     )
     QUIZ_QUESTIONS_NUMBER = {
         "предмет": 20,
@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandParser,
+)
+
+from tests.progress import rebuild_topic_stats
+
+
+class Command(BaseCommand):
+    """Recompute StudentTopicStats from the uploaded quiz answers."""
+
+    help = "Пересчет успеваемости студентов по темам"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="student_ids",
+            help="Пересчитать только указанных студентов"
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Rebuild the stats in one statement."""
+        start_time: datetime = datetime.now()
+        rows: int = rebuild_topic_stats(student_ids=options["student_ids"])
+        print(
+            "Записей успеваемости: {}, за {} секунд".format(
+                rows,
+                (datetime.now()-start_time).total_seconds()
+            )
+        )
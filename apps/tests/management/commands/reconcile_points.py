@@ -0,0 +1,83 @@
+from typing import (
+    Any,
+    Tuple,
+    Dict,
+)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+    CommandParser,
+)
+
+from subjectss.models import Student
+from tests.models import PointsLedgerEntry
+from tests.points import (
+    compact_points,
+    get_mismatched_students,
+)
+
+
+class Command(BaseCommand):
+    """Compare Student.points with the sums of the points ledger."""
+
+    help = "Сверка баллов студентов с журналом начислений"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--fix-points",
+            action="store_true",
+            help="Установить баллы студентов равными сумме журнала"
+        )
+        parser.add_argument(
+            "--fix-ledger",
+            action="store_true",
+            help="Записать расхождения в журнал как начисления сверки"
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Количество выводимых расхождений"
+        )
+
+    def handle(self, *args: Tuple[Any], **options: Dict[str, Any]) -> None:
+        """Print mismatches and optionally fix them."""
+        if options["fix_points"] and options["fix_ledger"]:
+            raise CommandError(
+                "Укажите только один из флагов --fix-points и --fix-ledger"
+            )
+        mismatched: list[Student] = list(
+            get_mismatched_students().select_related("user").order_by("id")
+        )
+        if not mismatched:
+            print("Расхождений не найдено")
+            return
+
+        print(f"Расхождений: {len(mismatched)}")
+        student: Student
+        for student in mismatched[:options["limit"]]:
+            print(
+                f"  {student}: баллы={student.points} "
+                f"журнал={student.ledger_points}"
+            )
+
+        if options["fix_points"]:
+            updated: int = compact_points(
+                Student.objects.filter(
+                    id__in=[student.id for student in mismatched]
+                )
+            )
+            print(f"Обновлено студентов: {updated}")
+        elif options["fix_ledger"]:
+            PointsLedgerEntry.objects.bulk_create(
+                [
+                    PointsLedgerEntry(
+                        student=student,
+                        delta=student.points - student.ledger_points,
+                        reason=PointsLedgerEntry.REASON_RECONCILIATION
+                    )
+                    for student in mismatched
+                ]
+            )
+            print(f"Добавлено записей сверки: {len(mismatched)}")
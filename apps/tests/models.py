@@ -5,10 +5,17 @@ from django.db.models import (
     CharField,
     ForeignKey,
     BooleanField,
+    IntegerField,
+    FloatField,
+    JSONField,
+    OneToOneField,
+    PositiveIntegerField,
     ManyToManyField,
     UniqueConstraint,
     DateTimeField,
+    Q,
     CASCADE,
+    SET_NULL,
 )
 
 from abstracts.models import AbstractDateTime
@@ -17,9 +24,10 @@ from subjectss.models import Student
 
 
 class QuizType(AbstractDateTime):
-    SUBJECT_QUIZ_TYPE = 1
-    TOPIC_QUIZ_TYPE = 2
-    CLASS_QUIZ_TYPE = 3
+    # Natural keys, see abstracts.reference
+    SUBJECT = "предмет"
+    TOPIC = "тема"
+    CLASS = "класс"
     QUIZ_NAME_LIMIT = 100
     name: CharField = CharField(
         max_length=QUIZ_NAME_LIMIT,
@@ -168,3 +176,141 @@ class QuizQuestionAnswer(Model):
 
     def __str__(self) -> str:
         return f"{self.quiz} {self.question} {self.user_answer}"
+
+
+class PointsLedgerEntry(Model):
+    """Append-only record of every change of Student.points."""
+
+    POINTS_PER_CORRECT_ANSWER = 10
+    REASON_QUIZ_GRADED = "quiz_graded"
+    REASON_RECONCILIATION = "reconciliation"
+    REASONS = (
+        (REASON_QUIZ_GRADED, "Проверка теста"),
+        (REASON_RECONCILIATION, "Сверка баллов"),
+    )
+    REASON_MAX_LENGTH = 50
+
+    student: Student = ForeignKey(
+        to=Student,
+        on_delete=CASCADE,
+        related_name="points_ledger",
+        verbose_name="Студент"
+    )
+    delta: IntegerField = IntegerField(
+        verbose_name="Изменение баллов"
+    )
+    reason: CharField = CharField(
+        max_length=REASON_MAX_LENGTH,
+        choices=REASONS,
+        verbose_name="Причина"
+    )
+    quiz: Quiz = ForeignKey(
+        to=Quiz,
+        on_delete=SET_NULL,
+        null=True,
+        blank=True,
+        related_name="points_ledger",
+        verbose_name="Тест"
+    )
+    datetime_created: DateTimeField = DateTimeField(
+        verbose_name="время и дата создания",
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name: str = "Начисление баллов"
+        verbose_name_plural: str = "Начисления баллов"
+        ordering: tuple[str] = ("-id",)
+        constraints: tuple[Any] = (
+            UniqueConstraint(
+                fields=['quiz', 'reason'],
+                condition=Q(quiz__isnull=False),
+                name="unique_points_ledger_quiz_reason"
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.student}: {self.delta:+d} ({self.reason})"
+
+
+class StudentTopicStats(Model):
+    """Answers of the student on the topic, maintained by quiz uploads."""
+
+    student: Student = ForeignKey(
+        to=Student,
+        on_delete=CASCADE,
+        related_name="topic_stats",
+        verbose_name="Студент"
+    )
+    topic: Topic = ForeignKey(
+        to=Topic,
+        on_delete=CASCADE,
+        related_name="student_stats",
+        verbose_name="Тема"
+    )
+    attempts: PositiveIntegerField = PositiveIntegerField(
+        default=0,
+        verbose_name="Количество ответов"
+    )
+    correct_answers: PositiveIntegerField = PositiveIntegerField(
+        default=0,
+        verbose_name="Количество правильных ответов"
+    )
+    last_attempt: DateTimeField = DateTimeField(
+        verbose_name="Время и дата последнего теста"
+    )
+
+    class Meta:
+        verbose_name: str = "Успеваемость по теме"
+        verbose_name_plural: str = "Успеваемость по темам"
+        ordering: tuple[str] = ("topic_id",)
+        constraints: tuple[Any] = (
+            UniqueConstraint(
+                fields=['student', 'topic'],
+                name="unique_student_topic_stats"
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f"{self.student} {self.topic}: \
+{self.correct_answers}/{self.attempts}"
+
+
+class QuestionStats(Model):
+    """Answer statistics of the question computed by compute_question_stats."""
+
+    question: Question = OneToOneField(
+        to=Question,
+        on_delete=CASCADE,
+        related_name="stats",
+        verbose_name="Вопрос"
+    )
+    attempts: PositiveIntegerField = PositiveIntegerField(
+        default=0,
+        verbose_name="Количество ответов"
+    )
+    correct_rate: FloatField = FloatField(
+        default=0.0,
+        db_index=True,
+        verbose_name="Доля правильных ответов"
+    )
+    discrimination: FloatField = FloatField(
+        null=True,
+        blank=True,
+        verbose_name="Индекс дискриминации"
+    )
+    answer_distribution: JSONField = JSONField(
+        default=dict,
+        verbose_name="Распределение ответов"
+    )
+    datetime_computed: DateTimeField = DateTimeField(
+        verbose_name="Время и дата расчета"
+    )
+
+    class Meta:
+        verbose_name: str = "Статистика вопроса"
+        verbose_name_plural: str = "Статистика вопросов"
+        ordering: tuple[str] = ("correct_rate",)
+
+    def __str__(self) -> str:
+        return f"{self.question}: {self.correct_rate:.0%} ({self.attempts})"
@@ -0,0 +1,116 @@
+"""Points accrual through the append-only ledger.
+
+Student.points is changed only together with a PointsLedgerEntry insert and
+always with an F() expression, so concurrent submissions never overwrite
+each other's points and the ledger sum stays equal to the column.
+"""
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import (
+    F,
+    IntegerField,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from subjectss.leaderboard import leaderboards
+from subjectss.models import Student
+from tests.models import (
+    PointsLedgerEntry,
+    Quiz,
+    QuizQuestionAnswer,
+)
+
+
+def get_correct_answers_number(quiz: Quiz) -> int:
+    """Get number of correct answers of the quiz with one query."""
+    return QuizQuestionAnswer.objects.filter(
+        quiz=quiz,
+        user_answer__is_correct=True,
+        user_answer__question_id=F("question_id")
+    ).count()
+
+
+def refresh_leaderboards(student_id: int) -> None:
+    points: Optional[int] = Student.objects.filter(
+        id=student_id
+    ).values_list("points", flat=True).first()
+    if points is not None:
+        leaderboards.update_points(student_id, points)
+
+
+def add_points(
+    student_id: int,
+    delta: int,
+    reason: str,
+    quiz: Optional[Quiz] = None
+) -> PointsLedgerEntry:
+    """Insert ledger entry and apply it to Student.points atomically."""
+    # The caller's transaction is enough, a savepoint would only cost
+    # two more statements per submission
+    with transaction.atomic(savepoint=False):
+        entry: PointsLedgerEntry = PointsLedgerEntry.objects.create(
+            student_id=student_id,
+            delta=delta,
+            reason=reason,
+            quiz=quiz
+        )
+        if delta:
+            Student.objects.filter(id=student_id).update(
+                points=F("points") + delta
+            )
+            transaction.on_commit(lambda: refresh_leaderboards(student_id))
+    return entry
+
+
+def award_quiz_points(quiz: Quiz) -> int:
+    """Grade the answered quiz and award points for correct answers.
+
+    Must be called in the transaction storing the answers; the ledger
+    constraint makes a second award for the same quiz fail.
+    """
+    delta: int = get_correct_answers_number(quiz=quiz) * \
+        PointsLedgerEntry.POINTS_PER_CORRECT_ANSWER
+    add_points(
+        student_id=quiz.student_id,
+        delta=delta,
+        reason=PointsLedgerEntry.REASON_QUIZ_GRADED,
+        quiz=quiz
+    )
+    return delta
+
+
+def get_ledger_points() -> Subquery:
+    """Get ledger sum of the student as a subquery on Student."""
+    return Coalesce(
+        Subquery(
+            PointsLedgerEntry.objects.filter(
+                student_id=OuterRef("pk")
+            ).order_by().values("student_id").annotate(
+                total=Sum("delta")
+            ).values("total")[:1],
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def get_mismatched_students() -> QuerySet[Student]:
+    """Get students whose points differ from their ledger sum."""
+    return Student.objects.annotate(
+        ledger_points=get_ledger_points()
+    ).exclude(points=F("ledger_points"))
+
+
+def compact_points(queryset: Optional[QuerySet[Student]] = None) -> int:
+    """Set points of the students to their ledger sums in one UPDATE."""
+    queryset = queryset if queryset is not None else Student.objects.all()
+    with transaction.atomic():
+        updated: int = queryset.update(points=get_ledger_points())
+        transaction.on_commit(leaderboards.invalidate)
+    return updated
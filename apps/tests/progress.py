@@ -0,0 +1,96 @@
+"""Per-topic answer statistics of students.
+
+StudentTopicStats rows are aggregated from QuizQuestionAnswer by one
+INSERT ... SELECT ... GROUP BY statement. An uploaded quiz adds its counts to
+the existing rows with ON CONFLICT DO UPDATE, a rebuild recomputes the rows
+from the whole quiz history.
+"""
+from typing import (
+    Any,
+    Iterable,
+    Optional,
+)
+
+from django.db import (
+    connection,
+    transaction,
+)
+from django.db.models import QuerySet
+
+from tests.models import (
+    Answer,
+    Question,
+    Quiz,
+    QuizQuestionAnswer,
+    StudentTopicStats,
+)
+
+
+def get_upsert_sql(where: str) -> str:
+    """Get statement adding answers matching the condition to the stats."""
+    qn = connection.ops.quote_name
+    stats: str = qn(StudentTopicStats._meta.db_table)
+    return f"""
+        INSERT INTO {stats} (
+            student_id, topic_id, attempts, correct_answers, last_attempt
+        )
+        SELECT
+            quiz.student_id,
+            question.attached_subject_class_id,
+            COUNT(*),
+            SUM(
+                CASE WHEN answer.is_correct
+                    AND answer.question_id = quiz_answer.question_id
+                THEN 1 ELSE 0 END
+            ),
+            MAX(quiz.datetime_created)
+        FROM {qn(QuizQuestionAnswer._meta.db_table)} quiz_answer
+        INNER JOIN {qn(Quiz._meta.db_table)} quiz
+            ON quiz.id = quiz_answer.quiz_id
+        INNER JOIN {qn(Question._meta.db_table)} question
+            ON question.id = quiz_answer.question_id
+        INNER JOIN {qn(Answer._meta.db_table)} answer
+            ON answer.id = quiz_answer.user_answer_id
+        WHERE {where}
+        GROUP BY quiz.student_id, question.attached_subject_class_id
+        ON CONFLICT (student_id, topic_id) DO UPDATE SET
+            attempts = {stats}.attempts + excluded.attempts,
+            correct_answers =
+                {stats}.correct_answers + excluded.correct_answers,
+            last_attempt = CASE
+                WHEN excluded.last_attempt > {stats}.last_attempt
+                THEN excluded.last_attempt
+                ELSE {stats}.last_attempt
+            END
+    """
+
+
+def update_topic_stats(quiz: Quiz) -> None:
+    """Add answers of the uploaded quiz to the stats of its student.
+
+    Must be called once per quiz, in the transaction storing the answers.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(get_upsert_sql("quiz_answer.quiz_id = %s"), [quiz.id])
+
+
+def rebuild_topic_stats(
+    student_ids: Optional[Iterable[int]] = None
+) -> int:
+    """Recompute the stats of the students, all of them by default."""
+    where: str = "1 = 1"
+    params: list[Any] = []
+    queryset: QuerySet[StudentTopicStats] = StudentTopicStats.objects.all()
+    if student_ids is not None:
+        params = list(student_ids)
+        if not params:
+            return 0
+        where = "quiz.student_id IN ({})".format(
+            ", ".join(["%s"] * len(params))
+        )
+        queryset = queryset.filter(student_id__in=params)
+    with transaction.atomic():
+        queryset.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(get_upsert_sql(where), params)
+            return cursor.rowcount
@@ -0,0 +1,270 @@
+"""Weighted sampling of quiz questions from an in-memory question bank.
+
+The bank keeps ids and weights of all questions grouped by topic with
+cumulative weights per topic, so a quiz is drawn without touching the
+questions table. A question is drawn in two steps: a topic by its remaining
+weight, scaled by the student's mastery factor, and then a question of the
+topic by bisecting its cumulative weights. Already drawn questions are
+rejected and their weight is taken out of the topic, which gives the same
+distribution as weighted sampling without replacement over the whole pool.
+The cost depends on the quiz size and the number of topics, not on the bank
+size.
+
+The bank is loaded on first use and reloaded every
+QUIZ_SAMPLING["REBUILD_INTERVAL"] seconds or after questions are changed.
+"""
+from random import random
+from threading import RLock
+from time import monotonic
+from typing import (
+    Collection,
+    Iterable,
+    Optional,
+)
+
+import numpy as np
+
+from django.conf import settings
+
+from subjectss.models import (
+    ClassSubject,
+    Topic,
+)
+from tests.models import (
+    Question,
+    StudentTopicStats,
+)
+
+# Weight of questions nobody or everybody answers correctly; questions
+# answered correctly by half of the students weigh 1 + DIFFICULTY_FLOOR
+DIFFICULTY_FLOOR = 0.25
+MAX_REJECTIONS = 16
+
+
+def get_difficulty_weights(correct_rates: np.ndarray) -> np.ndarray:
+    """Get weights preferring questions of medium difficulty.
+
+    Questions without statistics (NaN) are treated as medium ones.
+    """
+    rates: np.ndarray = np.where(np.isnan(correct_rates), 0.5, correct_rates)
+    return DIFFICULTY_FLOOR + 4 * rates * (1 - rates)
+
+
+class TopicPool:
+    """Questions of one topic with cumulative weights."""
+
+    def __init__(self, ids: np.ndarray, weights: np.ndarray) -> None:
+        self.ids = ids
+        self.weights = weights
+        self.cumulative: np.ndarray = np.cumsum(weights)
+        self.total: float = float(self.cumulative[-1])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def draw(self, excluded: Collection[int]) -> int:
+        """Get index of a weighted random question not in excluded."""
+        attempt: int
+        for attempt in range(MAX_REJECTIONS):
+            index: int = min(
+                int(np.searchsorted(
+                    self.cumulative, random() * self.total, side="right"
+                )),
+                len(self.ids) - 1
+            )
+            if int(self.ids[index]) not in excluded:
+                return index
+        # Most of the weight is drawn already, choose among the rest
+        available: np.ndarray = np.flatnonzero(
+            ~np.isin(self.ids, list(excluded))
+        )
+        cumulative: np.ndarray = np.cumsum(self.weights[available])
+        return int(available[min(
+            int(np.searchsorted(
+                cumulative, random() * cumulative[-1], side="right"
+            )),
+            len(available) - 1
+        )])
+
+
+class QuestionBank:
+    """Non-deleted questions of the process grouped by topic."""
+
+    def __init__(self, rebuild_interval: float) -> None:
+        self.rebuild_interval = rebuild_interval
+        self.lock: RLock = RLock()
+        self.topics: dict[int, TopicPool] = {}
+        self.subject_topics: dict[int, list[int]] = {}
+        self.class_subjects: dict[int, list[int]] = {}
+        self.built_at: Optional[float] = None
+
+    def rebuild(self) -> None:
+        """Load questions and their statistics from the database."""
+        rows: list[tuple[int, int, Optional[float]]] = list(
+            Question.objects.get_not_deleted().filter(
+                attached_subject_class__datetime_deleted__isnull=True
+            ).order_by(
+                "attached_subject_class_id", "id"
+            ).values_list(
+                "id", "attached_subject_class_id", "stats__correct_rate"
+            )
+        )
+        topics: dict[int, TopicPool] = {}
+        if rows:
+            ids: np.ndarray = np.array(
+                [row[0] for row in rows], dtype=np.int64
+            )
+            topic_ids: np.ndarray = np.array(
+                [row[1] for row in rows], dtype=np.int64
+            )
+            weights: np.ndarray = get_difficulty_weights(np.array(
+                [np.nan if row[2] is None else row[2] for row in rows],
+                dtype=np.float64
+            ))
+            starts: np.ndarray
+            unique_topic_ids: np.ndarray
+            unique_topic_ids, starts = np.unique(topic_ids, return_index=True)
+            ends: list[int] = starts[1:].tolist() + [len(ids)]
+            topic_id: int
+            start: int
+            end: int
+            for topic_id, start, end in zip(
+                unique_topic_ids.tolist(), starts.tolist(), ends
+            ):
+                topics[topic_id] = TopicPool(
+                    ids=ids[start:end],
+                    weights=weights[start:end]
+                )
+
+        subject_topics: dict[int, list[int]] = {}
+        class_subject_id: int
+        for topic_id, class_subject_id in Topic.objects.get_not_deleted() \
+                .values_list("id", "attached_subect_class_id"):
+            if topic_id in topics:
+                subject_topics.setdefault(class_subject_id, []).append(
+                    topic_id
+                )
+        class_subjects: dict[int, list[int]] = {}
+        class_id: int
+        for class_subject_id, class_id in ClassSubject.objects \
+                .get_not_deleted().values_list("id", "attached_class_id"):
+            class_subjects.setdefault(class_id, []).append(class_subject_id)
+
+        with self.lock:
+            self.topics = topics
+            self.subject_topics = subject_topics
+            self.class_subjects = class_subjects
+            self.built_at = monotonic()
+
+    def ensure_built(self) -> None:
+        if self.built_at is None or \
+                monotonic() - self.built_at >= self.rebuild_interval:
+            self.rebuild()
+
+    def invalidate(self) -> None:
+        """Reload the bank on the next access."""
+        self.built_at = None
+
+    def get_subject_topic_ids(self, class_subject_id: int) -> list[int]:
+        self.ensure_built()
+        return list(self.subject_topics.get(class_subject_id, ()))
+
+    def get_class_topic_ids(self, class_id: int) -> list[int]:
+        self.ensure_built()
+        return [
+            topic_id
+            for class_subject_id in self.class_subjects.get(class_id, ())
+            for topic_id in self.subject_topics.get(class_subject_id, ())
+        ]
+
+    def sample(
+        self,
+        topic_ids: Iterable[int],
+        size: int,
+        max_per_topic: Optional[int] = None,
+        topic_factors: Optional[dict[int, float]] = None
+    ) -> list[int]:
+        """Get up to size distinct question ids of the topics.
+
+        Questions are weighted by difficulty, topics additionally by
+        topic_factors; at most max_per_topic questions come from one topic.
+        """
+        self.ensure_built()
+        with self.lock:
+            pools: list[TopicPool] = []
+            factors: list[float] = []
+            topic_id: int
+            for topic_id in dict.fromkeys(topic_ids):
+                if topic_id in self.topics:
+                    pools.append(self.topics[topic_id])
+                    factors.append(
+                        (topic_factors or {}).get(topic_id, 1.0)
+                    )
+        if not pools:
+            return []
+        remaining: np.ndarray = np.array(
+            [pool.total * factor for pool, factor in zip(pools, factors)]
+        )
+        limits: list[int] = [
+            min(len(pool), max_per_topic or len(pool)) for pool in pools
+        ]
+        drawn: list[int] = [0] * len(pools)
+        chosen: dict[int, None] = {}
+        while len(chosen) < size:
+            cumulative: np.ndarray = np.cumsum(remaining)
+            if cumulative[-1] <= 0:
+                break
+            pool_index: int = min(
+                int(np.searchsorted(
+                    cumulative, random() * cumulative[-1], side="right"
+                )),
+                len(pools) - 1
+            )
+            pool: TopicPool = pools[pool_index]
+            index: int = pool.draw(excluded=chosen.keys())
+            chosen[int(pool.ids[index])] = None
+            drawn[pool_index] += 1
+            if drawn[pool_index] >= limits[pool_index]:
+                remaining[pool_index] = 0.0
+            else:
+                remaining[pool_index] = max(
+                    remaining[pool_index] -
+                    pool.weights[index] * factors[pool_index],
+                    0.0
+                )
+        return list(chosen)
+
+
+question_bank: QuestionBank = QuestionBank(
+    rebuild_interval=settings.QUIZ_SAMPLING.get("REBUILD_INTERVAL", 300)
+)
+
+
+def get_mastery_factors(
+    student_id: int,
+    topic_ids: Iterable[int]
+) -> dict[int, float]:
+    """Get topic weights favouring topics the student answers badly.
+
+    Accuracy is smoothed with one correct and one wrong answer, so topics
+    without answers get the factor of a 50% accuracy.
+    """
+    mastery_weight: float = settings.QUIZ_SAMPLING.get("MASTERY_WEIGHT", 0.0)
+    topic_ids = list(topic_ids)
+    factors: dict[int, float] = dict.fromkeys(
+        topic_ids, 1 + mastery_weight * 0.5
+    )
+    if not mastery_weight:
+        return factors
+    topic_id: int
+    attempts: int
+    correct_answers: int
+    for topic_id, attempts, correct_answers in \
+            StudentTopicStats.objects.filter(
+                student_id=student_id,
+                topic_id__in=topic_ids
+            ).values_list("topic_id", "attempts", "correct_answers"):
+        factors[topic_id] = 1 + mastery_weight * (
+            1 - (correct_answers + 1) / (attempts + 2)
+        )
+    return factors
@@ -5,18 +5,23 @@ from typing import (
 
 from rest_framework.serializers import (
     ModelSerializer,
+    CharField,
     DateTimeField,
     SerializerMethodField,
     HiddenField,
 )
 
-from abstracts.serializers import AbstractDateTimeSerializer
+from abstracts.serializers import (
+    AbstractDateTimeSerializer,
+    ReferenceField,
+)
 from tests.models import (
     QuizType,
     Quiz,
     Question,
     QuizQuestionAnswer,
     Answer,
+    StudentTopicStats,
 )
 
 
@@ -139,7 +144,9 @@ class QuizQuestionAnswerForeignSerializer(ModelSerializer):
 class QuizListModelSerializer(QuizBaseModelSerializer):
     """QuizListModelSerializer."""
 
-    quiz_type: QuizTypeBaseSerializer = QuizTypeBaseSerializer()
+    quiz_type: ReferenceField = ReferenceField(
+        serializer_class=QuizTypeBaseSerializer
+    )
 
     class Meta:
         """Customization of the Serializer."""
@@ -157,7 +164,9 @@ class QuizListModelSerializer(QuizBaseModelSerializer):
 class QuizDetailModelSerializer(QuizBaseModelSerializer):
     """QuizDetailModelSerializer."""
 
-    quiz_type: QuizTypeBaseSerializer = QuizTypeBaseSerializer()
+    quiz_type: ReferenceField = ReferenceField(
+        serializer_class=QuizTypeBaseSerializer
+    )
     quiz_questions: QuizQuestionAnswerForeignSerializer = \
         QuizQuestionAnswerForeignSerializer(
             many=True
@@ -186,10 +195,11 @@ class QuizDetailModelSerializer(QuizBaseModelSerializer):
         *args: tuple[Any],
         **kwargs: dict[Any, Any]
     ) -> int:
-        """Get correct number of questions."""
-        return obj.quiz_questions.filter(
-            user_answer__is_correct=True
-        ).count()
+        """Get correct number of prefetched questions."""
+        return sum(
+            quiz_question.user_answer.is_correct
+            for quiz_question in obj.quiz_questions.all()
+        )
 
 
 class QuizCreateModelSeriazizer(ModelSerializer):
@@ -214,7 +224,9 @@ class QuizCreateModelSeriazizer(ModelSerializer):
 class QuizQuestionViewModelSerializer(QuizBaseModelSerializer):
     """QuizQuestionViewModelSerializer."""
 
-    quiz_type: QuizTypeBaseSerializer = QuizTypeBaseSerializer()
+    quiz_type: ReferenceField = ReferenceField(
+        serializer_class=QuizTypeBaseSerializer
+    )
     attached_questions: QuestionForeignModelSerializer = \
         QuestionForeignModelSerializer(
             many=True
@@ -248,3 +260,36 @@ class QuizQuestionAnswerCreateModelSerializer(
             "question",
             "user_answer",
         )
+
+
+class StudentTopicStatsSerializer(ModelSerializer):
+    """StudentTopicStatsSerializer."""
+
+    topic_name: CharField = CharField(source="topic.name")
+    last_attempt: DateTimeField = DateTimeField(
+        format="%Y-%m-%d %H:%M",
+        read_only=True
+    )
+    accuracy: SerializerMethodField = SerializerMethodField(
+        method_name="get_accuracy"
+    )
+
+    class Meta:
+        """Customization of the Serializer."""
+
+        model: StudentTopicStats = StudentTopicStats
+        fields: Union[tuple[str], str] = (
+            "id",
+            "student",
+            "topic",
+            "topic_name",
+            "attempts",
+            "correct_answers",
+            "accuracy",
+            "last_attempt",
+        )
+
+    def get_accuracy(self, obj: StudentTopicStats) -> float:
+        """Get share of correct answers on the topic."""
+        return round(obj.correct_answers / obj.attempts, 4) \
+            if obj.attempts else 0.0
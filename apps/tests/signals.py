@@ -1,11 +1,16 @@
 from typing import (
     Any,
+    Optional,
     Union,
 )
-from random import choices
 
+from django.conf import settings
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+)
 from django.db.models.base import ModelBase
 
 from tests.models import (
@@ -13,6 +18,11 @@ from tests.models import (
     Quiz,
     QuizType,
 )
+from tests.sampling import (
+    get_mastery_factors,
+    question_bank,
+)
+from abstracts.reference import reference_data
 from abstracts.tools import conver_to_int_or_none
 from subjectss.models import (
     Topic,
@@ -35,68 +45,66 @@ def post_save_quiz(
     quiz_type_id: Union[int, None] = conver_to_int_or_none(
         instance.quiz_type_id
     )
-    if created and quiz_type_id == QuizType.TOPIC_QUIZ_TYPE and \
+    if not created:
+        return
+    topic_ids: list[int] = []
+    size: int = 0
+    max_per_topic: Optional[int] = settings.QUIZ_SAMPLING["MAX_PER_TOPIC"]
+    if quiz_type_id == reference_data.get_id(QuizType, QuizType.TOPIC) and \
             hasattr(instance, "_topic_id"):
-        question_quantity: int = Question.objects.filter(
-            attached_subject_class_id=instance._topic_id
-        ).count()
-        questions: list[Question] = choices(
-            Question.objects.filter(attached_subject_class=instance._topic_id),
-            k=min(5, question_quantity)
-        )
-        question: Question
-        for question in questions:
-            instance.attached_questions.add(question)
-    elif created and quiz_type_id == QuizType.CLASS_QUIZ_TYPE and \
+        topic_ids = [conver_to_int_or_none(instance._topic_id)]
+        size = settings.QUIZ_SAMPLING["TOPIC_QUIZ_SIZE"]
+        max_per_topic = None
+    elif quiz_type_id == reference_data.get_id(QuizType, QuizType.CLASS) and \
             hasattr(instance, "_class_number"):
-        class_subject_ids: tuple[int] = tuple(
-            ClassSubject.objects.filter(
-                attached_class_id=instance._class_number
-            ).get_not_deleted().values_list(
-                "id",
-                flat=True
-            )
+        topic_ids = question_bank.get_class_topic_ids(
+            conver_to_int_or_none(instance._class_number)
         )
-        topic_ids: tuple[int] = tuple(
-            Topic.objects.filter(
-                attached_subect_class__in=class_subject_ids
-            ).get_not_deleted().values_list(
-                "id",
-                flat=True
-            )
-        )
-        existed_questions: int = Question.objects.filter(
-            attached_subject_class__in=topic_ids
-        ).get_not_deleted().count()
-        questions: list[Question] = choices(
-            Question.objects.filter(
-                attached_subject_class__in=topic_ids
-            ).get_not_deleted(),
-            k=min(10, existed_questions)
-        )
-        q: Question
-        for q in questions:
-            instance.attached_questions.add(q)
-    elif created and \
-        quiz_type_id == QuizType.SUBJECT_QUIZ_TYPE and \
+        size = settings.QUIZ_SAMPLING["CLASS_QUIZ_SIZE"]
+    elif quiz_type_id == reference_data.get_id(
+        QuizType,
+        QuizType.SUBJECT
+    ) and \
             hasattr(instance, "_subject_id"):
-        topic_ids: tuple[int] = tuple(
-            Topic.objects.filter(
-                attached_subect_class_id=instance._subject_id
-            ).get_not_deleted().values_list(
-                "id",
-                flat=True
-            )
-        )
-        existed_questions: int = Question.objects.filter(
-            attached_subject_class__in=topic_ids
-        ).get_not_deleted().count()
-        questions: list[Question] = choices(
-            Question.objects.filter(
-                attached_subject_class__in=topic_ids
-            ).get_not_deleted(),
-            k=min(20, existed_questions)
+        topic_ids = question_bank.get_subject_topic_ids(
+            conver_to_int_or_none(instance._subject_id)
         )
-        q: Question
-        for q in questions:
-            instance.attached_questions.add(q)
+        size = settings.QUIZ_SAMPLING["SUBJECT_QUIZ_SIZE"]
+    if not topic_ids:
+        return
+    question_ids: list[int] = question_bank.sample(
+        topic_ids=topic_ids,
+        size=size,
+        max_per_topic=max_per_topic,
+        topic_factors=get_mastery_factors(
+            student_id=instance.student_id,
+            topic_ids=topic_ids
+        ) if len(topic_ids) > 1 else None
+    )
+    if question_ids:
+        instance.attached_questions.add(*question_ids)
+
+
+@receiver(
+    signal=post_save,
+    sender=Question
+)
+@receiver(
+    signal=post_delete,
+    sender=Question
+)
+@receiver(
+    signal=post_save,
+    sender=Topic
+)
+@receiver(
+    signal=post_save,
+    sender=ClassSubject
+)
+def invalidate_question_bank(
+    sender: ModelBase,
+    *args: tuple[Any],
+    **kwargs: dict[Any, Any]
+) -> None:
+    """Reload the question bank after questions or their topics change."""
+    transaction.on_commit(question_bank.invalidate)
@@ -1,3 +1,447 @@
-from django.test import TestCase
+from statistics import correlation
+from time import monotonic
 
-# Create your tests here.
+import numpy as np
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from django.db import (
+    IntegrityError,
+    transaction,
+)
+from django.http import HttpResponse
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+)
+
+from abstracts.reference import reference_data
+from auths.models import CustomUser
+from subjectss.models import (
+    Class,
+    ClassSubject,
+    GeneralSubject,
+    Student,
+    Topic,
+)
+from teaching.models import Teacher
+from tests.analytics import compute_question_stats
+from tests.models import (
+    Answer,
+    PointsLedgerEntry,
+    Question,
+    QuestionStats,
+    Quiz,
+    QuizQuestionAnswer,
+    QuizType,
+    StudentTopicStats,
+)
+from tests.points import (
+    add_points,
+    award_quiz_points,
+    compact_points,
+    get_mismatched_students,
+)
+from tests.progress import (
+    rebuild_topic_stats,
+    update_topic_stats,
+)
+from tests.sampling import (
+    QuestionBank,
+    TopicPool,
+)
+
+
+class PointsLedgerTests(TestCase):
+    """Points of a student changed only through the ledger."""
+
+    def setUp(self) -> None:
+        self.student: Student = Student.objects.create(
+            user=CustomUser.objects.create(
+                email="student@test.local",
+                first_name="Тест",
+                last_name="Тестов"
+            )
+        )
+        QuizType.objects.bulk_create(
+            QuizType(name=name)
+            for name in (QuizType.SUBJECT, QuizType.TOPIC, QuizType.CLASS)
+        )
+        # Rows of other tests were rolled back without on_commit bumps
+        reference_data.invalidate()
+        self.quiz: Quiz = Quiz.objects.create(
+            name="Тест",
+            student=self.student,
+            quiz_type_id=reference_data.get_id(QuizType, QuizType.TOPIC)
+        )
+
+    def tearDown(self) -> None:
+        reference_data.invalidate()
+
+    def get_points(self) -> int:
+        self.student.refresh_from_db(fields=("points",))
+        return self.student.points
+
+    def add_quiz_points(self, delta: int) -> None:
+        add_points(
+            student_id=self.student.id,
+            delta=delta,
+            reason=PointsLedgerEntry.REASON_QUIZ_GRADED,
+            quiz=self.quiz
+        )
+
+    def test_quiz_is_graded_once(self) -> None:
+        self.add_quiz_points(20)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.add_quiz_points(20)
+        self.assertEqual(self.get_points(), 20)
+        self.assertEqual(
+            PointsLedgerEntry.objects.filter(quiz=self.quiz).count(),
+            1
+        )
+
+    def test_second_award_fails(self) -> None:
+        award_quiz_points(self.quiz)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            award_quiz_points(self.quiz)
+
+    def test_entries_without_quiz_are_not_unique(self) -> None:
+        reason: str = PointsLedgerEntry.REASON_RECONCILIATION
+        add_points(student_id=self.student.id, delta=5, reason=reason)
+        add_points(student_id=self.student.id, delta=-2, reason=reason)
+        self.assertEqual(self.get_points(), 3)
+        self.assertFalse(get_mismatched_students().exists())
+
+    def test_compaction_restores_ledger_sum(self) -> None:
+        self.add_quiz_points(30)
+        Student.objects.filter(id=self.student.id).update(points=99)
+        self.assertEqual(
+            list(get_mismatched_students().values_list("id", flat=True)),
+            [self.student.id]
+        )
+        compact_points()
+        self.assertEqual(self.get_points(), 30)
+        self.assertFalse(get_mismatched_students().exists())
+
+
+class StudentTopicStatsTests(TestCase):
+    """Topic stats accumulated by uploads and shown to allowed users."""
+
+    def setUp(self) -> None:
+        QuizType.objects.bulk_create(
+            QuizType(name=name)
+            for name in (QuizType.SUBJECT, QuizType.TOPIC, QuizType.CLASS)
+        )
+        reference_data.invalidate()
+        self.student: Student = Student.objects.create(
+            user=self.create_user("student@test.local")
+        )
+        self.class_subject: ClassSubject = ClassSubject.objects.create(
+            name="Математика",
+            general_subject=GeneralSubject.objects.create(name="Математика"),
+            attached_class=Class.objects.create(number=5)
+        )
+        self.topic: Topic = Topic.objects.create(
+            name="Тема",
+            content="Текст темы",
+            video_url="https://example.com/video",
+            attached_subect_class=self.class_subject
+        )
+        self.answers: list[tuple[Answer, Answer]] = []
+        number: int
+        for number in range(2):
+            question: Question = Question.objects.create(
+                name=f"Вопрос {number}",
+                attached_subject_class=self.topic
+            )
+            self.answers.append((
+                Answer.objects.create(
+                    name="Верно",
+                    question=question,
+                    is_correct=True
+                ),
+                Answer.objects.create(name="Неверно", question=question),
+            ))
+
+    def tearDown(self) -> None:
+        reference_data.invalidate()
+
+    def create_user(self, email: str) -> CustomUser:
+        return CustomUser.objects.create(
+            email=email,
+            first_name="Тест",
+            last_name="Тестов"
+        )
+
+    def upload_quiz(self, *answers: Answer) -> Quiz:
+        quiz: Quiz = Quiz.objects.create(
+            name="Тест",
+            student=self.student,
+            quiz_type_id=reference_data.get_id(QuizType, QuizType.TOPIC)
+        )
+        QuizQuestionAnswer.objects.bulk_create(
+            QuizQuestionAnswer(
+                quiz=quiz,
+                question_id=answer.question_id,
+                user_answer=answer
+            )
+            for answer in answers
+        )
+        return quiz
+
+    def get_stats(self) -> tuple[int, int]:
+        stats: StudentTopicStats = StudentTopicStats.objects.get(
+            student=self.student,
+            topic=self.topic
+        )
+        return stats.attempts, stats.correct_answers
+
+    def get_progress(
+        self,
+        user: CustomUser,
+        query: str = ""
+    ) -> HttpResponse:
+        token: str = str(RefreshToken.for_user(user).access_token)
+        return self.client.get(
+            f"/api/v1/tests/progress{query}",
+            HTTP_AUTHORIZATION=f"JWT {token}"
+        )
+
+    def test_uploads_accumulate(self) -> None:
+        update_topic_stats(
+            self.upload_quiz(self.answers[0][0], self.answers[1][1])
+        )
+        self.assertEqual(self.get_stats(), (2, 1))
+        quiz: Quiz = self.upload_quiz(self.answers[0][0])
+        update_topic_stats(quiz)
+        self.assertEqual(self.get_stats(), (3, 2))
+        self.assertEqual(
+            StudentTopicStats.objects.get(student=self.student).last_attempt,
+            quiz.datetime_created
+        )
+
+    def test_rebuild_recomputes_from_history(self) -> None:
+        update_topic_stats(self.upload_quiz(self.answers[0][1]))
+        self.upload_quiz(self.answers[0][0], self.answers[1][0])
+        StudentTopicStats.objects.update(attempts=99, correct_answers=99)
+        self.assertEqual(rebuild_topic_stats([self.student.id]), 1)
+        self.assertEqual(self.get_stats(), (3, 2))
+        self.assertEqual(rebuild_topic_stats([]), 0)
+        self.assertEqual(self.get_stats(), (3, 2))
+
+    def test_student_sees_own_progress(self) -> None:
+        update_topic_stats(self.upload_quiz(self.answers[0][0]))
+        response: HttpResponse = self.get_progress(self.student.user)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["topic"] for row in response.json()["data"]],
+            [self.topic.id]
+        )
+
+    def test_teacher_sees_progress_on_own_subjects(self) -> None:
+        update_topic_stats(self.upload_quiz(self.answers[0][0]))
+        teacher: Teacher = Teacher.objects.create(
+            user=self.create_user("teacher@test.local")
+        )
+        query: str = f"?student={self.student.id}"
+        response: HttpResponse = self.get_progress(teacher.user, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], [])
+        teacher.tought_subjects.add(self.class_subject)
+        response = self.get_progress(teacher.user, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["topic"] for row in response.json()["data"]],
+            [self.topic.id]
+        )
+
+    def test_other_student_is_forbidden(self) -> None:
+        other: Student = Student.objects.create(
+            user=self.create_user("other@test.local")
+        )
+        response: HttpResponse = self.get_progress(
+            other.user,
+            f"?student={self.student.id}"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class QuestionStatsTests(TestCase):
+    """Difficulty statistics of a fixed answer matrix."""
+
+    # Correctness of the answers of every quiz on the three questions, the
+    # last one answered correctly by everybody
+    MATRIX: tuple[tuple[int, int, int], ...] = (
+        (1, 1, 1),
+        (1, 1, 1),
+        (1, 0, 1),
+        (0, 0, 1),
+        (0, 1, 1),
+        (1, 1, 1),
+        (0, 0, 1),
+        (1, 0, 1),
+        (0, 0, 1),
+        (1, 1, 1),
+        (0, 1, 1),
+        (1, 1, 1),
+    )
+
+    def setUp(self) -> None:
+        QuizType.objects.bulk_create(
+            QuizType(name=name)
+            for name in (QuizType.SUBJECT, QuizType.TOPIC, QuizType.CLASS)
+        )
+        reference_data.invalidate()
+        student: Student = Student.objects.create(
+            user=CustomUser.objects.create(
+                email="student@test.local",
+                first_name="Тест",
+                last_name="Тестов"
+            )
+        )
+        topic: Topic = Topic.objects.create(
+            name="Тема",
+            content="Текст темы",
+            video_url="https://example.com/video",
+            attached_subect_class=ClassSubject.objects.create(
+                name="Математика",
+                general_subject=GeneralSubject.objects.create(
+                    name="Математика"
+                ),
+                attached_class=Class.objects.create(number=5)
+            )
+        )
+        self.questions: list[Question] = []
+        answers: list[tuple[Answer, Answer]] = []
+        number: int
+        for number in range(3):
+            question: Question = Question.objects.create(
+                name=f"Вопрос {number}",
+                attached_subject_class=topic
+            )
+            self.questions.append(question)
+            answers.append((
+                Answer.objects.create(name="Неверно", question=question),
+                Answer.objects.create(
+                    name="Верно",
+                    question=question,
+                    is_correct=True
+                ),
+            ))
+        row: tuple[int, int, int]
+        for row in self.MATRIX:
+            quiz: Quiz = Quiz.objects.create(
+                name="Тест",
+                student=student,
+                quiz_type_id=reference_data.get_id(QuizType, QuizType.TOPIC)
+            )
+            QuizQuestionAnswer.objects.bulk_create(
+                QuizQuestionAnswer(
+                    quiz=quiz,
+                    question=question,
+                    user_answer=answers[number][is_correct]
+                )
+                for number, (question, is_correct) in enumerate(
+                    zip(self.questions, row)
+                )
+            )
+
+    def tearDown(self) -> None:
+        reference_data.invalidate()
+
+    def get_expected_discrimination(self, number: int) -> float:
+        """Correlation of the answers with the share of the other ones."""
+        return correlation(
+            [row[number] for row in self.MATRIX],
+            [(sum(row) - row[number]) / 2 for row in self.MATRIX]
+        )
+
+    def test_stats_of_matrix(self) -> None:
+        result: dict = compute_question_stats(chunk_size=5)
+        self.assertEqual(result["rows"], 36)
+        self.assertEqual(result["questions"], 3)
+        number: int
+        question: Question
+        for number, question in enumerate(self.questions[:2]):
+            stats: QuestionStats = QuestionStats.objects.get(
+                question=question
+            )
+            correct: int = sum(row[number] for row in self.MATRIX)
+            self.assertEqual(stats.attempts, 12)
+            self.assertEqual(stats.correct_rate, correct / 12)
+            self.assertAlmostEqual(
+                stats.discrimination,
+                self.get_expected_discrimination(number),
+                places=4
+            )
+            self.assertEqual(
+                sorted(stats.answer_distribution.values()),
+                sorted((correct, 12 - correct))
+            )
+
+    def test_zero_variance_has_no_discrimination(self) -> None:
+        compute_question_stats()
+        stats: QuestionStats = QuestionStats.objects.get(
+            question=self.questions[2]
+        )
+        self.assertEqual(stats.correct_rate, 1.0)
+        self.assertIsNone(stats.discrimination)
+        self.assertEqual(
+            sorted(stats.answer_distribution.values()),
+            [0, 12]
+        )
+
+
+class QuestionBankSampleTests(SimpleTestCase):
+    """Sampling from a bank built in memory."""
+
+    RUNS = 50
+
+    def setUp(self) -> None:
+        self.bank: QuestionBank = QuestionBank(rebuild_interval=3600)
+        # Topic 1 holds questions 100..109, topic 2 questions 200..209
+        self.bank.topics = {
+            topic_id: TopicPool(
+                ids=np.arange(topic_id * 100, topic_id * 100 + 10),
+                weights=np.linspace(0.25, 1.25, 10)
+            )
+            for topic_id in (1, 2)
+        }
+        self.bank.built_at = monotonic()
+
+    def get_topic_counts(self, question_ids: list[int]) -> dict[int, int]:
+        counts: dict[int, int] = {}
+        question_id: int
+        for question_id in question_ids:
+            counts[question_id // 100] = counts.get(question_id // 100, 0) + 1
+        return counts
+
+    def test_max_per_topic(self) -> None:
+        run: int
+        for run in range(self.RUNS):
+            question_ids: list[int] = self.bank.sample(
+                topic_ids=[1, 2],
+                size=6,
+                max_per_topic=2
+            )
+            self.assertEqual(self.get_topic_counts(question_ids), {1: 2, 2: 2})
+
+    def test_no_duplicates(self) -> None:
+        run: int
+        for run in range(self.RUNS):
+            question_ids: list[int] = self.bank.sample(
+                topic_ids=[1, 2, 1],
+                size=15
+            )
+            self.assertEqual(len(question_ids), 15)
+            self.assertEqual(len(set(question_ids)), 15)
+
+    def test_bank_smaller_than_size(self) -> None:
+        question_ids: list[int] = self.bank.sample(topic_ids=[1, 2], size=30)
+        self.assertEqual(
+            sorted(question_ids),
+            list(range(100, 110)) + list(range(200, 210))
+        )
+
+    def test_unknown_topics(self) -> None:
+        self.assertEqual(self.bank.sample(topic_ids=[3], size=5), [])
@@ -14,23 +14,39 @@ from rest_framework.permissions import (
 )
 from rest_framework.status import (
     HTTP_403_FORBIDDEN,
+    HTTP_404_NOT_FOUND,
     HTTP_400_BAD_REQUEST,
     HTTP_200_OK,
 )
 
+from django.db import (
+    IntegrityError,
+    transaction,
+)
 from django.db.models import (
     Manager,
     QuerySet,
 )
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+)
+from django.views import View
 
-from abstracts.handlers import DRFResponseHandler
+from abstracts.handlers import (
+    AsyncResponseHandler,
+    DRFResponseHandler,
+)
 from abstracts.mixins import ModelInstanceMixin
 from abstracts.paginators import AbstractPageNumberPaginator
 from abstracts.tools import conver_to_int_or_none
+from auths.models import CustomUser
 from auths.permissions import IsNonDeletedUser
 from subjectss.permissions import IsStudent
 from subjectss.models import Student
 from tests.permissions import IsQuizStudent
+from tests.points import award_quiz_points
+from tests.progress import update_topic_stats
 from tests.serializers import (
     QuizTypeBaseSerializer,
     QuizBaseModelSerializer,
@@ -39,12 +55,15 @@ from tests.serializers import (
     QuizCreateModelSeriazizer,
     QuizQuestionViewModelSerializer,
     QuizQuestionAnswerCreateModelSerializer,
+    StudentTopicStatsSerializer,
 )
 from tests.models import (
     QuizType,
     Quiz,
     QuizQuestionAnswer,
+    StudentTopicStats,
 )
+from teaching.models import Teacher
 
 
 class QuizTypeViewSet(
@@ -128,8 +147,6 @@ class QuizViewSet(
             request=request,
             data=self.get_queryset(
                 student_id=student_id
-            ).select_related(
-                "quiz_type"
             ),
             serializer_class=QuizListModelSerializer,
             many=True,
@@ -151,9 +168,7 @@ class QuizViewSet(
             request=request,
             pk=pk,
             class_name=Quiz,
-            queryset=self.get_queryset().select_related(
-                "quiz_type"
-            ).prefetch_related(
+            queryset=self.get_queryset().prefetch_related(
                 "quiz_questions__question",
                 "quiz_questions__user_answer",
                 "quiz_questions__question__answers",
@@ -238,9 +253,7 @@ class QuizViewSet(
             request=request,
             pk=pk,
             class_name=Quiz,
-            queryset=self.get_queryset().select_related(
-                "quiz_type"
-            ).prefetch_related(
+            queryset=self.get_queryset().prefetch_related(
                 "quiz_questions__question",
                 "quiz_questions__user_answer",
                 "quiz_questions__question__answers",
@@ -284,7 +297,6 @@ id: {0} не совпадает с запрошенным тестом {1}".form
                         user_answ['question'],
                         quiz_resp.id
                     )
-                breakpoint()
                 return DRF_Response(
                     data={
                         "response": message
@@ -317,10 +329,172 @@ id: {0} не совпадает с запрошенным тестом {1}".form
                     user_answer_id=user_answ["user_answer"]
                 )
             )
-        QuizQuestionAnswer.objects.bulk_create(objs=quiz_question_answers_list)
+        points: int = 0
+        try:
+            with transaction.atomic():
+                QuizQuestionAnswer.objects.bulk_create(
+                    objs=quiz_question_answers_list
+                )
+                points = award_quiz_points(quiz=quiz_resp)
+                update_topic_stats(quiz=quiz_resp)
+        except IntegrityError:
+            # Concurrent submission of the same quiz won the race
+            return DRF_Response(
+                data={
+                    "response": "Тест завершен. Загружать ответы нельзя."
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
         return DRF_Response(
             data={
-                "response": "Данные успешно сохранены"
+                "response": "Данные успешно сохранены",
+                "points": points,
             },
             status=HTTP_200_OK
         )
+
+
+class StudentTopicStatsViewSet(DRFResponseHandler, ViewSet):
+    """StudentTopicStatsViewSet."""
+
+    queryset: Manager = StudentTopicStats.objects
+    permission_classes: tuple[Any] = (
+        IsAuthenticated,
+        IsNonDeletedUser,
+    )
+    pagination_class: AbstractPageNumberPaginator = AbstractPageNumberPaginator
+
+    def list(
+        self,
+        request: DRF_Request,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> DRF_Response:
+        """Handle GET-request to view topic progress of the student.
+
+        Students see their own progress, teachers see progress of any
+        student on topics of the subjects they teach.
+        """
+        own_student_id: Optional[int] = Student.objects.filter(
+            user_id=request.user.id
+        ).values_list("id", flat=True).first()
+        student_id: Optional[int] = conver_to_int_or_none(
+            request.query_params.get("student", "")
+        ) or own_student_id
+        if not student_id:
+            return DRF_Response(
+                data={
+                    "response": "Не указан студент"
+                },
+                status=HTTP_400_BAD_REQUEST
+            )
+        queryset: QuerySet[StudentTopicStats] = self.queryset.filter(
+            student_id=student_id
+        )
+        if student_id != own_student_id and not request.user.is_superuser:
+            if not Teacher.objects.filter(user_id=request.user.id).exists():
+                return DRF_Response(
+                    data={
+                        "response": "Вы не можете просматривать \
+успеваемость этого студента"
+                    },
+                    status=HTTP_403_FORBIDDEN
+                )
+            queryset = queryset.filter(
+                topic__attached_subect_class__teachers__user_id=request.user.id
+            )
+        class_subject_id: Optional[int] = conver_to_int_or_none(
+            request.query_params.get("class_subject", "")
+        )
+        if class_subject_id:
+            queryset = queryset.filter(
+                topic__attached_subect_class_id=class_subject_id
+            )
+        return self.get_drf_response(
+            request=request,
+            data=queryset.select_related("topic").defer("topic__content"),
+            serializer_class=StudentTopicStatsSerializer,
+            many=True,
+            paginator=self.pagination_class()
+        )
+
+
+# ------------------------------------------
+# Async read endpoints
+#
+class QuizAsyncListView(AsyncResponseHandler, View):
+    """Async variant of QuizViewSet.list."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> HttpResponse:
+        """Handle GET-request to obtain user's quizes."""
+        user: Optional[CustomUser]
+        error_response: Optional[HttpResponse]
+        user, error_response = await self.authenticate(request)
+        if error_response:
+            return error_response
+        student_id: Optional[int] = await Student.objects.filter(
+            user_id=user.id
+        ).values_list("id", flat=True).afirst()
+        if not student_id:
+            return self.get_message_response(
+                "Вы не являетесь студентом.",
+                HTTP_403_FORBIDDEN
+            )
+        return await self.get_async_response(
+            request=request,
+            data=Quiz.objects.filter(
+                student_id=student_id
+            ),
+            serializer_class=QuizListModelSerializer,
+            many=True,
+            paginator=AbstractPageNumberPaginator()
+        )
+
+
+class QuizAsyncDetailView(AsyncResponseHandler, View):
+    """Async variant of QuizViewSet.retrieve."""
+
+    async def get(
+        self,
+        request: HttpRequest,
+        pk: int,
+        *args: tuple[Any],
+        **kwargs: dict[Any, Any]
+    ) -> HttpResponse:
+        """Handle GET-request with specified id."""
+        user: Optional[CustomUser]
+        error_response: Optional[HttpResponse]
+        user, error_response = await self.authenticate(request)
+        if error_response:
+            return error_response
+        quiz: Optional[Quiz] = await Quiz.objects.filter(
+            pk=pk
+        ).select_related(
+            "student"
+        ).prefetch_related(
+            "quiz_questions__question",
+            "quiz_questions__user_answer",
+            "quiz_questions__question__answers",
+            "attached_questions",
+            "attached_questions__answers"
+        ).afirst()
+        if not quiz:
+            return self.get_message_response(
+                f"Объект с ID: {pk} не найден или удалён",
+                HTTP_404_NOT_FOUND
+            )
+        if quiz.student.user_id != user.id:
+            return self.get_message_response(
+                IsQuizStudent.message,
+                HTTP_403_FORBIDDEN
+            )
+        return await self.get_async_response(
+            request=request,
+            data=quiz,
+            serializer_class=QuizDetailModelSerializer
+        )
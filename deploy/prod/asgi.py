@@ -1,10 +1,15 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault(
     'DJANGO_SETTINGS_MODULE',
     'settings.env.prod'
 )
 
-application = get_asgi_application()
+# Sets Django up, so the project modules are importable below
+django.setup(set_prefix=False)
+
+from abstracts.asgi import get_project_application  # noqa: E402
+
+application = get_project_application()
@@ -1,26 +1,15 @@
 import os
-from channels.auth import AuthMiddlewareStack
-from channels.routing import (
-    ProtocolTypeRouter,
-    URLRouter,
-)
-
-from django.core.asgi import get_asgi_application
 
-from urls.urls import websocket_urlpatterns
+import django
 
 os.environ.setdefault(
     'DJANGO_SETTINGS_MODULE',
     'settings.env.local'
 )
 
-application = ProtocolTypeRouter(
-    {
-        "http": get_asgi_application(),
-        "websocket": AuthMiddlewareStack(
-            URLRouter(
-                routes=websocket_urlpatterns
-            )
-        )
-    }
-)
+# Sets Django up, so the project modules are importable below
+django.setup(set_prefix=False)
+
+from abstracts.asgi import get_project_application  # noqa: E402
+
+application = get_project_application()
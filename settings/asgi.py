@@ -2,6 +2,8 @@
 ASGI config for edu_site_back project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP, WebSocket and lifespan are served by the same application, see
+``abstracts.asgi``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -9,8 +11,13 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edu_site_back.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings.env.prod')
 
-application = get_asgi_application()
+# Sets Django up, so the project modules are importable below
+django.setup(set_prefix=False)
+
+from abstracts.asgi import get_project_application  # noqa: E402
+
+application = get_project_application()
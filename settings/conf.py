@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 
 
@@ -50,6 +51,223 @@ DEBUG_TOOLBAR_PANELS = [
 ]
 DEBUG_TOOLBAR_PATCH_SETTINGS = False
 
+# ----------------------------------------------
+# Request timing configuration
+#
+REQUEST_TIMING = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,  # share of requests to measure
+    "SERVER_TIMING_HEADER": True,
+    "QUERY_BUDGET": 30,  # requests above budgets are logged as warnings
+    "TIME_BUDGET_MS": 500,
+}
+
+# ----------------------------------------------
+# Metrics configuration
+#
+METRICS = {
+    "ENABLED": True,
+    # Directory shared by workers of the host; None keeps metrics per process
+    "MULTIPROCESS_DIR": os.environ.get("METRICS_MULTIPROCESS_DIR"),
+    "ALLOWED_IPS": None,  # None allows scraping from any address
+}
+
+# ----------------------------------------------
+# Slow query log configuration
+#
+SLOW_QUERIES = {
+    "ENABLED": True,
+    "THRESHOLD_MS": 100,
+    "SAMPLE_RATE": 1.0,  # share of slow statements to log
+    "EXPLAIN": True,  # capture the plan once per fingerprint
+    "LOG_FILE": "logs/slow_queries.log",  # relative to BASE_DIR
+    "MAX_BYTES": 10 * 1024 * 1024,
+    "BACKUP_COUNT": 5,
+}
+
+# ----------------------------------------------
+# File downloads configuration
+#
+FILE_DOWNLOADS = {
+    "CHUNK_SIZE": 64 * 1024,
+    # None streams from the worker, "x-accel-redirect" (nginx) or
+    # "x-sendfile" (apache, lighttpd) hand the file to the front-end server
+    "OFFLOAD": None,
+    # nginx internal location aliased to MEDIA_ROOT
+    "X_ACCEL_REDIRECT_PREFIX": "/protected/",
+}
+
+# ----------------------------------------------
+# Leaderboard configuration
+#
+LEADERBOARD = {
+    # Seconds between full rebuilds picking up other workers' changes
+    "REBUILD_INTERVAL": 300,
+    "DEFAULT_LIMIT": 10,
+    "MAX_LIMIT": 100,
+    "DEFAULT_NEIGHBORS": 2,
+    "MAX_NEIGHBORS": 20,
+}
+
+# ----------------------------------------------
+# Quiz question sampling configuration
+#
+QUIZ_SAMPLING = {
+    # Seconds between reloads of the in-memory question bank
+    "REBUILD_INTERVAL": 300,
+    "TOPIC_QUIZ_SIZE": 5,
+    "CLASS_QUIZ_SIZE": 10,
+    "SUBJECT_QUIZ_SIZE": 20,
+    # Limit of questions of one topic in class and subject quizzes
+    "MAX_PER_TOPIC": 3,
+    # Extra weight of topics the student answers badly, 0 disables it
+    "MASTERY_WEIGHT": 2.0,
+}
+
+# ----------------------------------------------
+# Chat presence and typing indicators
+#
+CHAT_PRESENCE = {
+    # Seconds a member stays online after the last heartbeat
+    "TTL": 30,
+    # Minimal seconds between presence and typing broadcasts of a member
+    "BROADCAST_INTERVAL": 10,
+    "TYPING_INTERVAL": 2,
+}
+
+# ----------------------------------------------
+# Chat socket limits
+#
+CHAT_LIMITS = {
+    "MAX_FRAME_BYTES": 16384,
+    "MAX_CONTENT_LENGTH": 4000,
+    # Token buckets: frames of a socket and messages of a user per second
+    "CONNECTION_RATE": 10,
+    "CONNECTION_BURST": 20,
+    "USER_MESSAGE_RATE": 2,
+    "USER_MESSAGE_BURST": 10,
+    # Frames queued for a client reading slowly before "close" or "drop"
+    "MAX_OUTBOUND_FRAMES": 100,
+    "SLOW_CLIENT": "close",
+    # Chats of one socket at ws/chats/
+    "MAX_SUBSCRIPTIONS": 500,
+}
+
+# ----------------------------------------------
+# Chat socket sync of missed messages
+#
+CHAT_SYNC = {
+    "BATCH_SIZE": 100,
+    # Clients missing more messages page them through the API
+    "MAX_MESSAGES": 1000,
+}
+
+# ----------------------------------------------
+# Chat history archive
+#
+CHAT_ARCHIVE = {
+    # Months kept in the messages table, older ones are archived
+    "HOT_MONTHS": 6,
+    "BATCH_SIZE": 5000,
+}
+
+# ----------------------------------------------
+# Chat transcript export
+#
+CHAT_TRANSCRIPTS = {
+    # Rows fetched per round trip of the server-side cursor
+    "CHUNK_SIZE": 2000,
+}
+
+# ----------------------------------------------
+# Chat broadcasts to a class subject
+#
+CHAT_BROADCAST = {
+    # Chats and messages per bulk insert and events per channel layer send
+    "BATCH_SIZE": 500,
+}
+
+# ----------------------------------------------
+# Reference data
+#
+REFERENCE_DATA = {
+    # Tables loaded once per process, with the field of their natural key
+    "TABLES": {
+        "tests.QuizType": "name",
+        "subjectss.StudentSubjectState": "name",
+        "subjectss.Class": "number",
+        "subscriptions.Status": "name",
+        "subscriptions.Subscription": "name",
+    },
+    # Cache holding the version stamp, shared by the workers; a process
+    # local cache fails startup unless DEBUG is set
+    "CACHE": "default",
+    # Seconds between checks of the version stamp
+    "CHECK_INTERVAL": 5,
+}
+
+# ----------------------------------------------
+# ASGI server configuration
+#
+ASGI = {
+    # Per worker process; None disables the limit
+    "MAX_HTTP_IN_FLIGHT": 200,
+    "MAX_WEBSOCKETS": 2000,
+    # Seconds clients are asked to wait after a rejected request
+    "RETRY_AFTER": 1,
+    # Whether the server sends lifespan events (uvicorn does, daphne 3
+    # does not); without them the caches are warmed up on import
+    "LIFESPAN": False,
+    # In-memory caches rebuilt before traffic
+    "WARMUP_CACHES": (
+        "subjectss.leaderboard.leaderboards",
+        "tests.sampling.question_bank",
+        "abstracts.reference.reference_data",
+    ),
+}
+
+# ----------------------------------------------
+# Database routing
+#
+DATABASE_ROUTERS = [
+    'abstracts.routers.ReplicaRouter',
+]
+DATABASE_ROUTING = {
+    # Read-only replicas of the default database; reads hinted by
+    # ReplicaReadMixin views go to one of them
+    "REPLICAS": (),
+    # Seconds reads of a user stay on the primary after the user wrote
+    "STICKY_SECONDS": 10,
+    # Cache storing the sticky users, shared by the workers; a process local
+    # cache fails startup unless DEBUG is set
+    "STICKY_CACHE": "default",
+}
+
+# ----------------------------------------------
+# Logging configuration
+#
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'abstracts.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'abstracts.asgi': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # ----------------------------------------------
 # Shell plus configuration
 #
@@ -22,11 +22,25 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# ----------------------------------------------
+# Debug toolbar (local only)
+#
+INSTALLED_APPS += [  # noqa
+    'debug_toolbar',
+]
+MIDDLEWARE += [  # noqa
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+]
+
 # ----------------------------------------------
 # Channels configuration
 #
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        'BACKEND': 'chats.layers.DatabaseChannelLayer',
+        'CONFIG': {
+            'backend': 'sqlite',
+            'path': 'channel_layer.sqlite3',
+        },
     },
 }
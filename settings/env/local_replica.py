@@ -0,0 +1,20 @@
+from settings.env.local import *  # noqa
+
+# ----------------------------------------------
+# Primary and read replica in two SQLite files, the replica is refreshed
+# by the check_replica_routing command
+#
+DATABASES = {
+    **DATABASES,  # noqa
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': 'db_replica.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+DATABASE_ROUTING = {
+    **DATABASE_ROUTING,  # noqa
+    "REPLICAS": ("replica",),
+}
@@ -10,25 +10,58 @@ ASGI_APPLICATION = 'deploy.prod.asgi.application'
 #
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'abstracts.backends.postgresql_pool',
         'NAME': 'dtalpu6hl0c5j',
         'USER': 'ovfcpsfpknvmxc',
         'PASSWORD': '0dc04a3857bd803bb3d7d11480c3f6bf360daee45a21a9f21ba75c255ce29adf',  # noqa
         'HOST': 'ec2-44-195-132-31.compute-1.amazonaws.com',
-        'PORT': 5432
+        'PORT': 5432,
+        # Connections closed by Django go back to the pool of the process
+        'POOL': {
+            'MAX_SIZE': 20,
+            'MAX_LIFETIME': 1800,
+            'HEALTH_CHECK_INTERVAL': 30,
+            'TIMEOUT': 10,
+        },
+    }
+}
+# Shared by the workers: reference data version stamps and sticky users
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
     }
 }
 ALLOWED_HOSTS = []
 INTERNAL_IPS = []
 
+# ----------------------------------------------
+# Request timing
+#
+REQUEST_TIMING = {
+    **REQUEST_TIMING,  # noqa
+    "SAMPLE_RATE": 0.1,
+    "SERVER_TIMING_HEADER": False,
+}
+
+# ----------------------------------------------
+# Metrics
+#
+METRICS = {
+    **METRICS,  # noqa
+    "ALLOWED_IPS": ["127.0.0.1"],
+}
+
 # ----------------------------------------------
 # Channels configuration
 #
+# Workers exchange events through NOTIFY/LISTEN of the default database
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'chats.layers.DatabaseChannelLayer',
         'CONFIG': {
-            "hosts": [('127.0.0.1', 6379)],
+            'backend': 'postgresql',
+            'alias': 'default',
         },
     },
 }
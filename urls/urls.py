@@ -20,16 +20,30 @@ from apps.subjectss.views import (
     ClassViewSet,
     ClassSubjectViewSet,
     TopicViewSet,
+    LeaderboardViewSet,
+    GeneralSubjectAsyncView,
+    TrackWayAsyncView,
+    ClassAsyncView,
+    ClassSubjectAsyncView,
+)
+from apps.chats.views import (
+    PersonalChatViewSet,
+    PersonalChatAsyncListView,
+    PersonalChatMessagesAsyncView,
 )
-from apps.chats.views import PersonalChatViewSet
 from apps.tests.views import (
     QuizTypeViewSet,
     QuizViewSet,
+    StudentTopicStatsViewSet,
+    QuizAsyncListView,
+    QuizAsyncDetailView,
 )
 from apps.chats import consumers
+from apps.abstracts.views import metrics_view
 
 
 websocket_urlpatterns = [
+    path('ws/chats/', consumers.UserChatsConsumer.as_asgi()),
     path('ws/chats/<int:chat_id>/', consumers.ChatConsumer.as_asgi()),
 ]
 
@@ -50,6 +64,11 @@ urlpatterns = [
         TokenVerifyView.as_view(),
         name='token_verify'
     ),
+    path(
+        'metrics',
+        metrics_view,
+        name='metrics'
+    ),
 
 
     # MVC routes
@@ -75,9 +94,15 @@ router.register('subjects/trackways', TrackWayViewSet)
 router.register('subjects/classes', ClassViewSet)
 router.register('subjects/class_subjects', ClassSubjectViewSet)
 router.register('subjects/topics', TopicViewSet)
+router.register(
+    'subjects/leaderboard',
+    LeaderboardViewSet,
+    basename='leaderboard'
+)
 router.register('chats/chats', PersonalChatViewSet)
 router.register('tests/quiz_types', QuizTypeViewSet)
 router.register('tests/quiz', QuizViewSet)
+router.register('tests/progress', StudentTopicStatsViewSet)
 
 urlpatterns += [
     path(
@@ -85,3 +110,30 @@ urlpatterns += [
         include(router.urls)
     ),
 ]
+
+# ------------------------------------------
+# Async API Endpoints
+#
+async_urlpatterns = [
+    path(
+        'subjects/general_subjects',
+        GeneralSubjectAsyncView.as_view()
+    ),
+    path('subjects/trackways', TrackWayAsyncView.as_view()),
+    path('subjects/classes', ClassAsyncView.as_view()),
+    path('subjects/class_subjects', ClassSubjectAsyncView.as_view()),
+    path('tests/quiz', QuizAsyncListView.as_view()),
+    path('tests/quiz/<int:pk>', QuizAsyncDetailView.as_view()),
+    path('chats/chats', PersonalChatAsyncListView.as_view()),
+    path(
+        'chats/chats/<int:pk>/messages',
+        PersonalChatMessagesAsyncView.as_view()
+    ),
+]
+
+urlpatterns += [
+    path(
+        "api/v1/async/",
+        include(async_urlpatterns)
+    ),
+]